@@ -31,6 +31,28 @@ if config.config_file_name is not None:
 # Métadonnées pour autogenerate
 target_metadata = Base.metadata
 
+# Search index objects maintained outside the ORM models (see src/app/database/search.py)
+UNMANAGED_OBJECTS = {"search_vector", "ix_image_metadata_search_vector", "image_metadata_fts"}
+
+
+def _created_on_other_dialect(object, type_) -> bool:
+    """Whether `object` is an index declared with .ddl_if(dialect=...) for another database"""
+    ddl_if = getattr(object, "_ddl_if", None) if type_ == "index" else None
+    if ddl_if is None or ddl_if.dialect is None:
+        return False
+    dialects = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else tuple(ddl_if.dialect)
+    return context.get_context().dialect.name not in dialects
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Keep autogenerate from proposing to drop the full-text search index, or to create the
+    PostgreSQL-only indexes (pg_trgm, JSONB) on the databases where they are skipped
+    """
+    if name in UNMANAGED_OBJECTS or (name or "").startswith("image_metadata_fts_"):
+        return False
+    return not _created_on_other_dialect(object, type_)
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
@@ -38,6 +60,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,7 +80,8 @@ def run_migrations_online() -> None:
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,75 @@
+"""Add parsed sky position columns for cone search
+
+Revision ID: 0b6e3d8a4c17
+Revises: f2d7b9c3e184
+Create Date: 2026-10-16 16:34:47.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.app.services import sky
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6e3d8a4c17'
+down_revision: Union[str, Sequence[str], None] = 'f2d7b9c3e184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.add_column(sa.Column('ra', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('dec', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('sky_cell', sa.Integer(), nullable=True))
+
+    # Parse the existing free-text coordinates with the same parser as crud, in id order
+    bind = op.get_bind()
+    table = sa.table(
+        'image_metadata',
+        sa.column('id', sa.Integer),
+        sa.column('coordinates', sa.String),
+        sa.column('ra', sa.Float),
+        sa.column('dec', sa.Float),
+        sa.column('sky_cell', sa.Integer),
+    )
+    update = (
+        table.update()
+        .where(table.c.id == sa.bindparam('row_id'))
+        .values(ra=sa.bindparam('ra'), dec=sa.bindparam('dec'), sky_cell=sa.bindparam('sky_cell'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.coordinates)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        positions = []
+        for row in rows:
+            position = sky.parse_coordinates(row.coordinates)
+            if position is not None:
+                positions.append({'row_id': row.id, 'ra': position[0], 'dec': position[1], 'sky_cell': sky.sky_cell(position[1])})
+        if positions:
+            bind.execute(update, positions)
+
+    op.create_index('ix_image_metadata_sky_cell_ra', 'image_metadata', ['sky_cell', 'ra'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_image_metadata_sky_cell_ra', table_name='image_metadata')
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.drop_column('sky_cell')
+        batch_op.drop_column('dec')
+        batch_op.drop_column('ra')
@@ -0,0 +1,28 @@
+"""Add (upload_date, id) index for keyset pagination
+
+Revision ID: 3f1c9a7d2b64
+Revises: ecda9930aefa
+Create Date: 2026-10-16 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = 'ecda9930aefa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_image_metadata_upload_date_id', 'image_metadata', ['upload_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_image_metadata_upload_date_id', table_name='image_metadata')
@@ -0,0 +1,52 @@
+"""Add pg_trgm GIN indexes for metadata substring filters
+
+Revision ID: 8b2e4d61c0f5
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-16 10:03:54.118320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d61c0f5'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXED_COLUMNS = (
+    'source',
+    'copyright',
+    'dataset_release',
+    'description',
+    'data_processing_stages',
+    'coordinates',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Trigram indexes only exist on PostgreSQL; SQLite keeps scanning with LIKE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_INDEXED_COLUMNS:
+        op.create_index(
+            f'ix_image_metadata_{column}_trgm',
+            'image_metadata',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in TRIGRAM_INDEXED_COLUMNS:
+        op.drop_index(f'ix_image_metadata_{column}_trgm', table_name='image_metadata')
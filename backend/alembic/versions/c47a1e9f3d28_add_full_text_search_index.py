@@ -0,0 +1,62 @@
+"""Add full-text search index over image metadata
+
+Revision ID: c47a1e9f3d28
+Revises: 8b2e4d61c0f5
+Create Date: 2026-10-16 11:27:08.553901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a1e9f3d28'
+down_revision: Union[str, Sequence[str], None] = '8b2e4d61c0f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (column, setweight class), kept in sync with src/app/database/search.py
+SEARCH_FIELDS = (
+    ('source', 'A'),
+    ('dataset_release', 'A'),
+    ('data_processing_stages', 'B'),
+    ('coordinates', 'B'),
+    ('description', 'C'),
+    ('copyright', 'D'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+            for column, weight in SEARCH_FIELDS
+        )
+        op.execute('ALTER TABLE image_metadata ADD COLUMN search_vector tsvector')
+        # One-time backfill; from here on crud maintains the vector row by row
+        op.execute(f'UPDATE image_metadata SET search_vector = {vector}')
+        op.create_index(
+            'ix_image_metadata_search_vector',
+            'image_metadata',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+        )
+    else:
+        columns = ', '.join(column for column, _ in SEARCH_FIELDS)
+        op.execute(f'CREATE VIRTUAL TABLE image_metadata_fts USING fts5({columns})')
+        op.execute(
+            f'INSERT INTO image_metadata_fts (rowid, {columns}) SELECT id, {columns} FROM image_metadata'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_image_metadata_search_vector', table_name='image_metadata')
+        op.drop_column('image_metadata', 'search_vector')
+    else:
+        op.execute('DROP TABLE IF EXISTS image_metadata_fts')
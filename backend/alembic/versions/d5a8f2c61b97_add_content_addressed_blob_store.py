@@ -0,0 +1,45 @@
+"""Add content-addressed blob store for upload deduplication
+
+Revision ID: d5a8f2c61b97
+Revises: c47a1e9f3d28
+Create Date: 2026-10-16 13:04:52.219384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8f2c61b97'
+down_revision: Union[str, Sequence[str], None] = 'c47a1e9f3d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'image_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('mime', sa.String(length=100), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    # Existing uploads keep a NULL hash: they are plain files, outside the blob store
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_image_metadata_sha256'), ['sha256'], unique=False)
+        batch_op.create_foreign_key('fk_image_metadata_sha256_image_blobs', 'image_blobs', ['sha256'], ['sha256'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.drop_constraint('fk_image_metadata_sha256_image_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_image_metadata_sha256'))
+        batch_op.drop_column('sha256')
+    op.drop_table('image_blobs')
@@ -0,0 +1,33 @@
+"""Add has_derivatives flag for WebP thumbnails and previews
+
+Revision ID: e91b3c7a5f02
+Revises: d5a8f2c61b97
+Create Date: 2026-10-16 14:41:19.730552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b3c7a5f02'
+down_revision: Union[str, Sequence[str], None] = 'd5a8f2c61b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows start without derivatives: run `python -m scripts.backfill_derivatives`
+    op.add_column(
+        'image_metadata',
+        sa.Column('has_derivatives', sa.Boolean(), server_default=sa.false(), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.drop_column('has_derivatives')
@@ -0,0 +1,45 @@
+"""Add fits_header column for FITS uploads
+
+Revision ID: f2d7b9c3e184
+Revises: e91b3c7a5f02
+Create Date: 2026-10-16 15:52:08.416207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2d7b9c3e184'
+down_revision: Union[str, Sequence[str], None] = 'e91b3c7a5f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'image_metadata',
+        sa.Column('fits_header', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True)
+    )
+    # The containment index only exists on PostgreSQL; SQLite filters with json_extract
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index(
+            'ix_image_metadata_fits_header',
+            'image_metadata',
+            ['fits_header'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'fits_header': 'jsonb_path_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_image_metadata_fits_header', table_name='image_metadata')
+    with op.batch_alter_table('image_metadata') as batch_op:
+        batch_op.drop_column('fits_header')
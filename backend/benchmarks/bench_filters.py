@@ -0,0 +1,144 @@
+"""
+Filter latency benchmark for crud.get_filtered_images.
+
+Seeds the image_metadata table with synthetic rows and times every metadata filter,
+alone and combined. Run from the backend directory:
+
+    python -m benchmarks.bench_filters --rows 1000000 --database-url postgresql://...
+
+Without --database-url a throwaway SQLite file is used, which shows the LIKE-scan fallback.
+On PostgreSQL the same run shows the pg_trgm GIN indexes at work (use --explain to print plans).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+SOURCES = ["M31", "M33", "M51", "M81", "NGC 6505", "Perseus Cluster", "Horsehead Nebula", "Abell 2390"]
+RELEASES = ["Q1", "DR1", "DR2", "DR3", "ERO"]
+STAGES = ["Raw", "Raw → Calibrated", "Raw → Calibrated → Stacked", "VIS/NIR/MER"]
+WORDS = ["galaxy", "spiral", "lensing", "cluster", "nebula", "deep", "field", "mosaic", "dust", "stellar"]
+
+FILTER_CASES = [
+    {"source": "M31"},
+    {"copyright": "ESA"},
+    {"dataset_release": "DR2"},
+    {"description": "lensing"},
+    {"data_processing_stages": "Stacked"},
+    {"coordinates": "tile_5"},
+    {"source": "NGC", "dataset_release": "DR1"},
+    {"source": "Perseus", "description": "cluster", "data_processing_stages": "Calibrated"},
+    {"is_public": True, "description": "mosaic"},
+]
+
+
+def _row(rng: random.Random, i: int, start: datetime) -> dict:
+    return {
+        "filename": f"bench_{i:08d}.png",
+        "source": rng.choice(SOURCES),
+        "copyright": f"© ESA/Euclid {rng.randint(2020, 2026)}",
+        "dataset_release": rng.choice(RELEASES),
+        "description": " ".join(rng.choices(WORDS, k=12)),
+        "data_processing_stages": rng.choice(STAGES),
+        "coordinates": f"tile_{rng.randint(0, 99999):05d}",
+        "is_public": rng.random() < 0.5,
+        "upload_date": start + timedelta(seconds=i),
+    }
+
+
+def seed(engine, rows: int, batch_size: int = 10_000) -> None:
+    """Insert `rows` synthetic metadata rows unless the table already holds that many"""
+    from sqlalchemy import func, insert, select
+    from src.app.database.models import ImageMetadata
+
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(ImageMetadata)).scalar_one()
+    if existing >= rows:
+        print(f"Table already seeded with {existing} rows")
+        return
+
+    rng = random.Random(42)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    began = time.perf_counter()
+    for offset in range(existing, rows, batch_size):
+        batch = [_row(rng, i, start) for i in range(offset, min(offset + batch_size, rows))]
+        with engine.begin() as conn:
+            conn.execute(insert(ImageMetadata), batch)
+    print(f"Seeded {rows - existing} rows in {time.perf_counter() - began:.1f}s")
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE image_metadata")
+
+
+def run(engine, repeats: int, explain: bool) -> None:
+    from sqlalchemy.orm import Session
+    from src.app.database import crud
+
+    print(f"{'filters':<70} {'median ms':>10} {'p95 ms':>10} {'rows':>6}")
+    for case in FILTER_CASES:
+        timings = []
+        with Session(engine) as db:
+            for _ in range(repeats):
+                began = time.perf_counter()
+                result = crud.get_filtered_images(db, **case)
+                timings.append((time.perf_counter() - began) * 1000)
+                db.expunge_all()
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{str(case):<70} {statistics.median(timings):>10.2f} {p95:>10.2f} {len(result):>6}")
+
+        if explain and engine.dialect.name == "postgresql":
+            _print_plan(engine, case)
+
+
+def _print_plan(engine, case: dict) -> None:
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from src.app.database import crud
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session(engine) as db:
+            crud.get_filtered_images(db, **case)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    with engine.connect() as conn:
+        for (line,) in conn.exec_driver_sql(f"EXPLAIN ANALYZE {statement}", parameters):
+            print(f"    {line}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of rows to seed (default: 1M)")
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per filter combination")
+    parser.add_argument("--database-url", default=None, help="database to seed and query (default: temporary SQLite file)")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE plans (PostgreSQL only)")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'prepix_bench_filters.db')}"
+    os.environ.setdefault("DATABASE_URL", database_url)
+
+    from sqlalchemy import create_engine
+    from src.app.database.database import Base
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.rows)
+    run(engine, args.repeats, args.explain)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
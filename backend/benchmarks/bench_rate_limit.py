@@ -0,0 +1,93 @@
+"""
+Rate limiter overhead benchmark.
+
+Times a token take on each bucket store while the number of distinct clients grows, and the
+per-request cost of RateLimitMiddleware in front of an empty ASGI app. Constant cost per request
+shows as flat numbers across the client counts. Run from the backend directory:
+
+    python -m benchmarks.bench_rate_limit [--requests 200000] [--clients 1,1000,100000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+
+def bench_store(store, clients: int, requests: int) -> float:
+    """Nanoseconds per take, cycling over `clients` keys"""
+    from src.app.services.rate_limit import Budget
+
+    budget = Budget(rate=1000.0, burst=1000.0)
+    keys = [f"read:10.0.{i // 256 % 256}.{i % 256}-{i}" for i in range(clients)]
+    began = time.perf_counter()
+    for i in range(requests):
+        store.take(keys[i % clients], budget)
+    return (time.perf_counter() - began) / requests * 1e9
+
+
+async def _empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _drive(app, clients: int, requests: int) -> float:
+    """Microseconds per request through `app`, from `clients` distinct addresses"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {"type": "http", "method": "GET", "path": "/images", "headers": [], "client": (f"10.1.{i // 256 % 256}.{i % 256}", 50000 + i % 1000)}
+        for i in range(min(clients, 65536))
+    ]
+    began = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return (time.perf_counter() - began) / requests * 1e6
+
+
+def bench_middleware(store, clients: int, requests: int) -> float:
+    """Microseconds added per request by RateLimitMiddleware"""
+    from src.app.services.rate_limit import RateLimitMiddleware
+
+    limited = RateLimitMiddleware(_empty_app, store=store, budgets={"read": "1000000/second", "write": "1/second"},
+                                  trusted_proxies="")
+    bare = asyncio.run(_drive(_empty_app, clients, requests))
+    return asyncio.run(_drive(limited, clients, requests)) - bare
+
+
+def run(clients_counts, requests: int) -> list:
+    from src.app.services.rate_limit import MemoryBucketStore, SharedMemoryBucketStore
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            "memory": MemoryBucketStore,
+            "shared": lambda: SharedMemoryBucketStore(os.path.join(directory, "buckets"), slots=1 << 18),
+        }
+        for name, factory in stores.items():
+            for clients in clients_counts:
+                take_ns = bench_store(factory(), clients, requests)
+                middleware_us = bench_middleware(factory(), clients, requests // 4)
+                rows.append((name, clients, take_ns, middleware_us))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000, help="takes per measurement")
+    parser.add_argument("--clients", default="1,1000,100000", help="comma-separated distinct client counts")
+    args = parser.parse_args(argv)
+
+    print(f"{'store':<8} {'clients':>9} {'ns/take':>9} {'middleware us/request':>22}")
+    for name, clients, take_ns, middleware_us in run([int(c) for c in args.clients.split(",")], args.requests):
+        print(f"{name:<8} {clients:>9} {take_ns:>9.0f} {middleware_us:>22.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Listing serialization micro-benchmark.
+
+Compares, for N-row responses, the original listing path (ORM objects -> ImageMetadataResponse ->
+model_dump -> FastAPI's jsonable_encoder + json.dumps) with the column projection +
+serialization.encode_images path used by GET /images. Run from the backend directory:
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def _legacy_response(db, rows: int) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+    from src.app.database import crud
+    from src.app.models.schemas import ImageMetadataResponse
+
+    images = crud.get_filtered_images(db, limit=rows)
+    content = [
+        ImageMetadataResponse(
+            filename=img.filename,
+            source=img.source,
+            copyright=img.copyright,
+            dataset_release=img.dataset_release,
+            description=img.description,
+            data_processing_stages=img.data_processing_stages,
+            coordinates=img.coordinates,
+            is_public=img.is_public,
+            upload_date=img.upload_date.isoformat()
+        ).model_dump(by_alias=True)
+        for img in images
+    ]
+    db.expunge_all()
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _fast_response(db, rows: int) -> bytes:
+    from src.app.database import crud
+    from src.app.services.serialization import encode_images
+
+    return encode_images(crud.get_filtered_image_rows(db, limit=rows))
+
+
+def _time(fn, db, rows: int, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        fn(db, rows)
+        timings.append(time.perf_counter() - began)
+    return statistics.median(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="rows per response (default: 10k)")
+    parser.add_argument("--repeats", type=int, default=10, help="timed runs per path")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+    from src.app.database.database import Base
+    from benchmarks.bench_filters import seed
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.rows)
+
+    with Session(engine) as db:
+        assert json.loads(_legacy_response(db, args.rows)) == json.loads(_fast_response(db, args.rows))
+        legacy = _time(_legacy_response, db, args.rows, args.repeats)
+        fast = _time(_fast_response, db, args.rows, args.repeats)
+
+    print(f"{'path':<32} {'median ms':>10} {'rows/sec':>12}")
+    print(f"{'ORM + pydantic model_dump':<32} {legacy * 1000:>10.1f} {args.rows / legacy:>12,.0f}")
+    print(f"{'projection + encode_images':<32} {fast * 1000:>10.1f} {args.rows / fast:>12,.0f}")
+    print(f"speedup: {legacy / fast:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
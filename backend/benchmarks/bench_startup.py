@@ -0,0 +1,111 @@
+"""
+Cold start benchmark: import-to-first-request time of the API.
+
+Each run is a fresh interpreter, so nothing is cached in-process. Two modes:
+
+  - in-process (default): a child process imports src.app.main, runs the lifespan startup
+    (engine creation, pool pre-warming) and serves GET / through the ASGI app, timing each
+    phase;
+  - --server: spawns `uvicorn src.app.main:app` and polls it until the first 200, which also
+    counts the interpreter and uvicorn startup.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --runs 10 [--database-url postgresql://...] [--server]
+
+Without --database-url a throwaway SQLite file is used.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Runs in the child interpreter; prints one JSON line of phase timings in milliseconds
+CHILD = """
+import json, time
+began = time.perf_counter()
+from src.app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    started = time.perf_counter()
+    assert client.get("/").status_code == 200
+    served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - began) * 1000,
+    "startup_ms": (started - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "total_ms": (served - began) * 1000,
+}))
+"""
+
+
+def _backend_dir() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_in_process(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=_backend_dir(), env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_server(env: dict, timeout: float = 60.0) -> dict:
+    port = _free_port()
+    began = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=_backend_dir(), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - began < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited: {process.stderr.read().decode(errors='replace')}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return {"total_ms": (time.perf_counter() - began) * 1000}
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(f"No response from uvicorn within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes to time")
+    parser.add_argument("--database-url", default=None, help="database to connect to (default: temporary SQLite file)")
+    parser.add_argument("--server", action="store_true", help="time a real uvicorn process until its first response")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'prepix_bench_startup.db')}"
+    env.setdefault("SLOW_QUERY_LOG", os.path.join(tempfile.gettempdir(), "prepix_bench_startup_slow.jsonl"))
+
+    measure = measure_server if args.server else measure_in_process
+    runs = [measure(env) for _ in range(args.runs)]
+
+    print(f"{'phase':<18} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for phase in runs[0]:
+        values = [run[phase] for run in runs]
+        print(f"{phase:<18} {statistics.median(values):>10.1f} {min(values):>10.1f} {max(values):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
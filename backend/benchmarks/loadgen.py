@@ -0,0 +1,330 @@
+"""
+End-to-end load generator for a running Prepix API.
+
+Drives the full stack (uvicorn, middlewares, FastAPI, database, storage) with concurrent mixed
+traffic and reports latency percentiles, throughput and error rates per scenario:
+
+  - list:        GET /images with a random combination of metadata filters,
+  - upload:      POST /upload of a synthetic PNG or MP4 payload, picked from --png-sizes and
+                 --mp4-sizes (PNGs are real noise images, so derivatives get rendered),
+  - conditional: GET /images repeating an earlier query with its ETag in If-None-Match
+                 (a 304 counts as success).
+
+Run from the backend directory against a local instance:
+
+    python -m benchmarks.loadgen --base-url http://localhost:8000 --duration 30 --concurrency 32 \\
+        --mix list=70,upload=10,conditional=20 --bypass-token "$RATE_LIMIT_BYPASS_TOKEN"
+
+The API rate-limits by client address, so a single load generator is mostly answered with 429s
+unless the instance has RATE_LIMIT_BYPASS_TOKEN set and the same value is passed as
+--bypass-token (sent as X-RateLimit-Bypass). 429s are counted apart from other errors.
+
+Workers run closed-loop (next request once the previous one is answered); --rate caps the total
+request rate instead. --output writes the report as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import httpx
+
+SCENARIOS = ("list", "upload", "conditional")
+DEFAULT_MIX = "list=70,upload=10,conditional=20"
+DEFAULT_PNG_SIZES = "256KiB,2MiB,8MiB"
+DEFAULT_MP4_SIZES = "4MiB,16MiB"
+BYPASS_HEADER = "X-RateLimit-Bypass"
+
+SOURCES = ["M31", "M33", "M51", "NGC", "Perseus", "Horsehead", "Abell"]
+RELEASES = ["Q1", "DR1", "DR2", "ERO"]
+WORDS = ["galaxy", "spiral", "lensing", "cluster", "nebula", "deep", "field", "mosaic"]
+STAGES = ["Raw", "Calibrated", "Stacked"]
+
+# ftyp + free boxes: enough for libmagic to identify video/mp4, the rest is an opaque mdat
+MP4_HEAD = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom\x00\x00\x00\x08free"
+
+
+def parse_size(text: str) -> int:
+    units = {"kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "kb": 1000, "mb": 1000 ** 2, "b": 1}
+    text = text.strip().lower()
+    for suffix, factor in units.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def parse_sizes(text: str) -> List[int]:
+    return [parse_size(size) for size in text.split(",") if size.strip()]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """`list=70,upload=10` -> normalized weights; unknown scenarios are an error"""
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The mix needs a positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def png_payload(size: int, seed: int = 0) -> bytes:
+    """A valid PNG of random noise, about `size` bytes (noise does not compress)"""
+    import numpy as np
+    from PIL import Image
+
+    side = max(8, int((size / 3) ** 0.5))
+    pixels = np.random.default_rng(seed).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def mp4_payload(size: int) -> bytes:
+    body = max(0, size - len(MP4_HEAD) - 8)
+    return MP4_HEAD + (body + 8).to_bytes(4, "big") + b"mdat" + os.urandom(body)
+
+
+def random_filters(rng: random.Random) -> dict:
+    """One to three metadata filters, as the frontend search form sends them"""
+    candidates = {
+        "source": lambda: rng.choice(SOURCES),
+        "datasetRelease": lambda: rng.choice(RELEASES),
+        "description": lambda: rng.choice(WORDS),
+        "dataProcessingStages": lambda: rng.choice(STAGES),
+        "isPublic": lambda: rng.choice(["true", "false"]),
+    }
+    names = rng.sample(sorted(candidates), rng.randint(1, 3))
+    params = {name: candidates[name]() for name in names}
+    params["limit"] = rng.choice([20, 50, 100])
+    return params
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.statuses: Dict[int, int] = {}
+
+    def record(self, status: Optional[int], latency_ms: float, ok: bool, sent: int = 0) -> None:
+        self.latencies.append(latency_ms)
+        self.bytes_sent += sent
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 429:
+            self.rate_limited += 1
+        elif not ok:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> dict:
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "rate_limited": self.rate_limited,
+            "p50_ms": percentile(self.latencies, 0.50),
+            "p95_ms": percentile(self.latencies, 0.95),
+            "p99_ms": percentile(self.latencies, 0.99),
+            "upload_mib_per_sec": round(self.bytes_sent / elapsed / 2**20, 2) if self.bytes_sent else None,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: Dict[str, float],
+        payloads: List[tuple],
+        seed: int = 0,
+        rate: Optional[float] = None,
+    ):
+        self.client = client
+        self.mix = mix
+        self.payloads = payloads
+        self.rng = random.Random(seed)
+        self.rate = rate
+        self.stats = {name: Stats() for name in mix}
+        # Query -> ETag seen for it, replayed by the conditional scenario
+        self.etags: Dict[str, str] = {}
+        self._next_slot = 0.0
+
+    async def _pace(self) -> None:
+        """Space request starts 1/rate apart across all workers"""
+        if not self.rate:
+            return
+        now = time.perf_counter()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def list_images(self) -> None:
+        params = random_filters(self.rng)
+        began = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.get("/images", params=params)
+            status = response.status_code
+            if status == 200 and "etag" in response.headers:
+                self.etags[str(httpx.QueryParams(params))] = response.headers["etag"]
+        except httpx.HTTPError:
+            pass
+        self.stats["list"].record(status, (time.perf_counter() - began) * 1000, status == 200)
+
+    async def conditional(self) -> None:
+        if not self.etags:
+            # Nothing to revalidate yet: prime the ETag table with a plain listing
+            params = {"limit": 50}
+            query, etag = str(httpx.QueryParams(params)), None
+        else:
+            query, etag = self.rng.choice(list(self.etags.items()))
+        headers = {"If-None-Match": etag} if etag else {}
+        began = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.get(f"/images?{query}", headers=headers)
+            status = response.status_code
+            if status == 200 and "etag" in response.headers:
+                self.etags[query] = response.headers["etag"]
+        except httpx.HTTPError:
+            pass
+        self.stats["conditional"].record(status, (time.perf_counter() - began) * 1000, status in (200, 304))
+
+    async def upload(self) -> None:
+        name, content_type, payload = self.rng.choice(self.payloads)
+        # Trailing random bytes keep every upload distinct, so content deduplication does not kick in
+        body = payload + os.urandom(16)
+        data = {
+            "source": self.rng.choice(SOURCES),
+            "copyright": "© ESA/Euclid 2026",
+            "datasetRelease": self.rng.choice(RELEASES),
+            "description": " ".join(self.rng.choices(WORDS, k=6)),
+            "dataProcessingStages": self.rng.choice(STAGES),
+            "coordinates": f"{self.rng.uniform(0, 360):.4f}, {self.rng.uniform(-90, 90):.4f}",
+            "isPublic": self.rng.choice(["true", "false"]),
+        }
+        began = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.post("/upload", data=data, files={"file": (name, body, content_type)})
+            status = response.status_code
+        except httpx.HTTPError:
+            pass
+        self.stats["upload"].record(status, (time.perf_counter() - began) * 1000, status == 200, len(body))
+
+    async def worker(self, deadline: float) -> None:
+        scenarios, weights = zip(*self.mix.items())
+        while time.perf_counter() < deadline:
+            await self._pace()
+            if time.perf_counter() >= deadline:
+                break
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, "list_images" if scenario == "list" else scenario)()
+
+    async def run(self, duration: float, concurrency: int) -> dict:
+        deadline = time.perf_counter() + duration
+        began = time.perf_counter()
+        await asyncio.gather(*(self.worker(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+        scenarios = {name: stats.report(elapsed) for name, stats in self.stats.items()}
+        total = sum(report["requests"] for report in scenarios.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "concurrency": concurrency,
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "scenarios": scenarios,
+        }
+
+
+def build_payloads(png_sizes: List[int], mp4_sizes: List[int]) -> List[tuple]:
+    payloads = [(f"load_{size}.png", "image/png", png_payload(size, seed=size)) for size in png_sizes]
+    payloads += [(f"load_{size}.mp4", "video/mp4", mp4_payload(size)) for size in mp4_sizes]
+    return payloads
+
+
+async def run_load(
+    base_url: str,
+    duration: float,
+    concurrency: int,
+    mix: Dict[str, float],
+    payloads: List[tuple],
+    bypass_token: Optional[str] = None,
+    rate: Optional[float] = None,
+    seed: int = 0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> dict:
+    headers = {BYPASS_HEADER: bypass_token} if bypass_token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=httpx.Timeout(120.0), transport=transport
+    ) as client:
+        return await LoadGenerator(client, mix, payloads, seed, rate).run(duration, concurrency)
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['requests']} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} req/s, concurrency {report['concurrency']})")
+    print(f"{'scenario':<12} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>8} {'429':>6} {'MiB/s':>7}")
+    for name, stats in report["scenarios"].items():
+        def ms(value):
+            return f"{value:.1f}" if value is not None else "-"
+
+        print(f"{name:<12} {stats['requests']:>9} {stats['throughput_rps']:>8} {ms(stats['p50_ms']):>9} "
+              f"{ms(stats['p95_ms']):>9} {ms(stats['p99_ms']):>9} {stats['error_rate'] * 100:>7.1f}% "
+              f"{stats['rate_limited']:>6} {stats['upload_mib_per_sec'] or '-':>7}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API root (default: http://localhost:8000)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent workers")
+    parser.add_argument("--rate", type=float, default=None, help="cap on total requests per second")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--png-sizes", default=DEFAULT_PNG_SIZES, help=f"PNG upload sizes (default: {DEFAULT_PNG_SIZES})")
+    parser.add_argument("--mp4-sizes", default=DEFAULT_MP4_SIZES, help=f"MP4 upload sizes (default: {DEFAULT_MP4_SIZES}); empty for none")
+    parser.add_argument("--bypass-token", default=os.environ.get("RATE_LIMIT_BYPASS_TOKEN"),
+                        help="value of the instance's RATE_LIMIT_BYPASS_TOKEN (default: from the environment)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the traffic")
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    payloads = build_payloads(parse_sizes(args.png_sizes), parse_sizes(args.mp4_sizes)) if "upload" in mix else []
+    if "upload" in mix and not payloads:
+        parser.error("the upload scenario needs --png-sizes or --mp4-sizes")
+
+    report = asyncio.run(run_load(
+        args.base_url, args.duration, args.concurrency, mix, payloads, args.bypass_token, args.rate, args.seed
+    ))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
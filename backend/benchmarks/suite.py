@@ -0,0 +1,322 @@
+"""
+Benchmark suite for the crud and serialization hot paths, with JSON baselines.
+
+For each catalog size it seeds image_metadata (reusing bench_filters.seed) and times:
+
+  - crud.get_filtered_images for every bench_filters.FILTER_CASES combination, plus no filter,
+  - the GET /images response serialization (serialization.encode_images on a listing page, and
+    encode_image per row as in the NDJSON stream),
+  - crud.create_image_metadata throughput (the rows are deleted afterwards),
+
+and, once per run, storage.write_upload throughput across file sizes. Run from the backend
+directory:
+
+    python -m benchmarks.suite run [--sizes 10000,100000,1000000] [--database-url postgresql://...]
+    python -m benchmarks.suite run --sizes 10000 --baseline benchmarks/results/<commit>.json
+    python -m benchmarks.suite compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Without --database-url each size gets its own SQLite file in the temp directory, kept between
+runs so seeding happens once. With --database-url the sizes are seeded in ascending order into
+that database; sizes below its current row count are skipped.
+
+Results go to benchmarks/results/<commit>.json (or --output). `compare`, and `run --baseline`,
+print the median change of every benchmark found in both files and exit with status 1 when one
+is slower than the baseline by more than --threshold (default 20%). Timings only compare
+between runs on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+FILE_SIZES = (64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+WRITE_COUNT = 500
+DEFAULT_THRESHOLD = 0.2
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _stats(timings_ms: list, units: int = 1, unit: str = "ops") -> dict:
+    """Median/p95 of per-run timings; `units` items (rows, bytes) are processed per run"""
+    timings_ms = sorted(timings_ms)
+    median = statistics.median(timings_ms)
+    return {
+        "median_ms": round(median, 4),
+        "p95_ms": round(timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))], 4),
+        "runs": len(timings_ms),
+        f"{unit}_per_sec": round(units / (median / 1000), 1) if median else None,
+    }
+
+
+def _time(fn, repeats: int) -> list:
+    fn()  # warm-up: statement cache, page cache
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - began) * 1000)
+    return timings
+
+
+def _case_name(case: dict) -> str:
+    return ",".join(f"{key}={value}" for key, value in case.items()) or "none"
+
+
+def bench_filters(engine, repeats: int) -> dict:
+    from sqlalchemy.orm import Session
+    from src.app.database import crud
+    from benchmarks.bench_filters import FILTER_CASES
+
+    results = {}
+    with Session(engine) as db:
+        for case in [{}] + FILTER_CASES:
+            def query():
+                crud.get_filtered_images(db, **case)
+                db.expunge_all()
+
+            results[f"get_filtered_images/{_case_name(case)}"] = _stats(_time(query, repeats))
+    return results
+
+
+def bench_serialization(engine, repeats: int, size: int) -> dict:
+    from sqlalchemy.orm import Session
+    from src.app.database import crud
+    from src.app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+    from src.app.services.serialization import encode_image, encode_images
+
+    results = {}
+    with Session(engine) as db:
+        for limit in (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE):
+            rows = crud.get_filtered_image_rows(db, limit=limit)
+            results[f"encode_images/page={limit}"] = _stats(
+                _time(lambda: encode_images(rows), repeats), len(rows), "rows"
+            )
+        rows = crud.get_filtered_image_rows(db, limit=min(size, 10_000))
+        results[f"encode_image_ndjson/rows={len(rows)}"] = _stats(
+            _time(lambda: b"".join(encode_image(row) + b"\n" for row in rows), repeats), len(rows), "rows"
+        )
+    return results
+
+
+def bench_create(engine, count: int) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+    from src.app.database import crud
+    from src.app.database.models import ImageMetadata
+    from src.app.models.schemas import ImageMetadataCreate
+
+    metadata = ImageMetadataCreate(
+        source="Bench", copyright="© ESA 2026", datasetRelease="DR1", description="Benchmark write",
+        dataProcessingStages="Raw", coordinates="RA: 10h00m00s, DEC: +02°00'00\"", isPublic=True,
+    )
+    timings = []
+    with Session(engine) as db:
+        try:
+            for i in range(count):
+                began = time.perf_counter()
+                crud.create_image_metadata(db, f"bench_write_{i:06d}.png", metadata)
+                timings.append((time.perf_counter() - began) * 1000)
+                db.expunge_all()
+        finally:
+            names = db.execute(select(ImageMetadata.filename).where(ImageMetadata.filename.like("bench_write_%"))).scalars().all()
+            for filename in names:
+                crud.delete_image_metadata(db, filename)
+    return {"create_image_metadata": _stats(timings)}
+
+
+def _png_payload(size: int) -> bytes:
+    """A real PNG header, so the MIME sniffing passes, padded with incompressible bytes"""
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, format="PNG")
+    head = buffer.getvalue()
+    return head + os.urandom(max(0, size - len(head)))
+
+
+def bench_write_upload(file_sizes, repeats: int) -> dict:
+    from fastapi import UploadFile
+    from src.app.services import storage
+
+    results = {}
+    for size in file_sizes:
+        payload = _png_payload(size)
+
+        def write():
+            writer = storage.write_upload(UploadFile(BytesIO(payload), filename="bench.png", size=len(payload)))
+            writer.abort()
+
+        label = f"{size // (1024 * 1024)}MiB" if size >= 1024 * 1024 else f"{size // 1024}KiB"
+        results[f"write_upload/{label}"] = _stats(_time(write, repeats), len(payload), "bytes")
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _size_targets(sizes, database_url):
+    """(size, database URL) pairs to benchmark"""
+    if database_url:
+        return [(size, database_url) for size in sorted(sizes)]
+    return [
+        (size, f"sqlite:///{os.path.join(tempfile.gettempdir(), f'prepix_bench_suite_{size}.db')}")
+        for size in sorted(sizes)
+    ]
+
+
+def run_suite(sizes, database_url=None, repeats: int = 20, writes: int = WRITE_COUNT, file_sizes=FILE_SIZES) -> dict:
+    from sqlalchemy import create_engine, func, select
+    from src.app.database.database import Base
+    from src.app.database.models import ImageMetadata
+    from benchmarks.bench_filters import seed
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeats": repeats,
+        },
+        "results": {},
+    }
+    # Files written by the benchmarks (write_upload temp files) go to a throwaway directory
+    upload_dir = tempfile.mkdtemp(prefix="prepix_bench_uploads_")
+    previous_upload_path = os.environ.get("UPLOAD_PATH")
+    os.environ["UPLOAD_PATH"] = upload_dir
+    try:
+        for size, url in _size_targets(sizes, database_url):
+            engine = create_engine(url)
+            try:
+                Base.metadata.create_all(bind=engine)
+                with engine.connect() as conn:
+                    existing = conn.execute(select(func.count()).select_from(ImageMetadata)).scalar_one()
+                if existing > size:
+                    print(f"Skipping {size} rows: {url} already holds {existing}")
+                    continue
+                seed(engine, size)
+                prefix = f"{engine.dialect.name}/{size}"
+                print(f"Benchmarking {prefix}")
+                results = {}
+                results.update(bench_filters(engine, repeats))
+                results.update(bench_serialization(engine, repeats, size))
+                results.update(bench_create(engine, writes))
+                report["results"].update({f"{prefix}/{name}": value for name, value in results.items()})
+            finally:
+                engine.dispose()
+
+        print("Benchmarking storage")
+        report["results"].update({
+            f"storage/{name}": value for name, value in bench_write_upload(file_sizes, max(3, repeats // 4)).items()
+        })
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        if previous_upload_path is None:
+            os.environ.pop("UPLOAD_PATH", None)
+        else:
+            os.environ["UPLOAD_PATH"] = previous_upload_path
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """(name, baseline ms, current ms, ratio, regressed) for every benchmark present in both"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["median_ms"]:
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        rows.append((name, base["median_ms"], result["median_ms"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _throughput(result: dict) -> str:
+    if result.get("bytes_per_sec"):
+        return f"{result['bytes_per_sec'] / 2**20:,.1f} MiB/s"
+    for unit in ("rows", "ops"):
+        if result.get(f"{unit}_per_sec"):
+            return f"{result[f'{unit}_per_sec']:,.0f} {unit}/s"
+    return ""
+
+
+def print_results(report: dict) -> None:
+    width = max((len(name) for name in report["results"]), default=10)
+    print(f"{'benchmark':<{width}} {'median ms':>10} {'p95 ms':>10} {'throughput':>16}")
+    for name, result in report["results"].items():
+        print(f"{name:<{width}} {result['median_ms']:>10.3f} {result['p95_ms']:>10.3f} {_throughput(result):>16}")
+
+
+def print_comparison(rows: list, baseline: dict, current: dict) -> int:
+    print(f"baseline {baseline['meta']['commit']} -> current {current['meta']['commit']}")
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"{'benchmark':<{width}} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for name, base, now, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}} {base:>10.3f} {now:>10.3f} {(ratio - 1) * 100:>+7.1f}%{flag}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f"{len(rows)} compared, {regressions} regressed")
+    return 1 if regressions else 0
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and write a results file")
+    run.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated catalog sizes")
+    run.add_argument("--database-url", default=None, help="database to seed (default: one SQLite file per size)")
+    run.add_argument("--repeats", type=int, default=20, help="timed runs per benchmark")
+    run.add_argument("--writes", type=int, default=WRITE_COUNT, help="rows created by the create_image_metadata benchmark")
+    run.add_argument("--output", default=None, help="results file (default: benchmarks/results/<commit>.json)")
+    run.add_argument("--baseline", default=None, help="results file to compare against")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown ratio (default: 0.2)")
+
+    diff = commands.add_parser("compare", help="compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown ratio (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        baseline, current = _load(args.baseline), _load(args.current)
+        return print_comparison(compare(baseline, current, args.threshold), baseline, current)
+
+    os.environ.setdefault("DATABASE_URL", args.database_url or "sqlite://")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    report = run_suite(sizes, args.database_url, args.repeats, args.writes)
+    print_results(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        baseline = _load(args.baseline)
+        return print_comparison(compare(baseline, report, args.threshold), baseline, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Render WebP thumbnails and previews for images stored before derivatives existed.
+
+Walks image_metadata by id in batches, renders each batch on the derivative process pool and
+marks the rows that succeeded, so the command can be interrupted and simply run again. Run
+from the backend directory, with the same DATABASE_URL and UPLOAD_PATH as the API:
+
+    python -m scripts.backfill_derivatives [--force] [--batch-size 200] [--workers 4]
+
+--force re-renders every image, for instance after changing the widths in services/derivatives.py.
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import wait
+from typing import Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("backfill_derivatives")
+
+
+def backfill(db: Session, force: bool = False, batch_size: int = 200) -> Tuple[int, int]:
+    """Render missing derivatives for the whole catalog; returns (rendered, failed) counts"""
+    from src.app.database import crud
+    from src.app.database.models import ImageMetadata
+    from src.app.services import derivatives
+    from src.app.services.storage import get_upload_dir, get_upload_path
+
+    upload_dir = get_upload_dir()
+    executor = derivatives.get_executor()
+    rendered = failed = 0
+    last_id = 0
+
+    while True:
+        query = (
+            select(ImageMetadata.id, ImageMetadata.filename)
+            .where(ImageMetadata.id > last_id)
+            .order_by(ImageMetadata.id)
+            .limit(batch_size)
+        )
+        if not force:
+            query = query.where(ImageMetadata.has_derivatives == False)
+        rows = db.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        futures = {
+            executor.submit(
+                derivatives.render_derivatives, str(get_upload_path(row.filename)), upload_dir, row.filename
+            ): row.filename
+            for row in rows
+            if derivatives.supports_derivatives(row.filename)
+        }
+        wait(futures)
+
+        done = []
+        for future, filename in futures.items():
+            if future.exception() is None:
+                done.append(filename)
+            else:
+                logger.warning("Could not render derivatives of %s: %s", filename, future.exception())
+                derivatives.remove_derivatives(filename)
+        if done:
+            crud.set_has_derivatives(db, done)
+        rendered += len(done)
+        failed += len(futures) - len(done)
+        logger.info("Rendered %d images so far (%d failed), up to id %d", rendered, failed, last_id)
+
+    return rendered, failed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="re-render images that already have derivatives")
+    parser.add_argument("--batch-size", type=int, default=200, help="images rendered and committed per batch")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: DERIVATIVE_WORKERS)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.workers:
+        os.environ["DERIVATIVE_WORKERS"] = str(args.workers)
+
+    from src.app.database import SessionLocal
+    from src.app.services.derivatives import shutdown_executor
+
+    try:
+        with SessionLocal() as db:
+            rendered, failed = backfill(db, force=args.force, batch_size=args.batch_size)
+    finally:
+        shutdown_executor()
+
+    logger.info("Done: %d images rendered, %d failed", rendered, failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,472 @@
+"""
+Export and import the image_metadata catalog as CSV, NDJSON or Parquet.
+
+Moves the metadata of a data release between environments without replaying uploads. Run from
+the backend directory, with the same DATABASE_URL and UPLOAD_PATH as the API:
+
+    python -m scripts.metadata_transfer export catalog.csv [--format csv|ndjson|parquet]
+    python -m scripts.metadata_transfer import catalog.csv [--missing skip|keep] [--chunk-size 5000]
+    python -m scripts.metadata_transfer reconcile
+
+The format follows the file extension unless --format is given. On PostgreSQL, CSV exports run
+through COPY ... TO STDOUT and every import is streamed into a staging table with COPY ... FROM
+STDIN; SQLite uses chunked executemany. Rows whose filename already exists are skipped, so an
+interrupted import can simply be run again.
+
+Imports reconcile against UPLOAD_PATH: rows whose file is missing are skipped (--missing keep
+imports them anyway), has_derivatives is set from the WebP files actually present, and blob
+references are only kept for blobs present in the blob store. `reconcile` only reports catalog
+rows without a file and files without a row. Parquet needs pyarrow (the `parquet` extra).
+
+An import bumps the listing cache generation, which lives in /dev/shm (CATALOG_CACHE_SHM_PATH):
+only API workers sharing that file, i.e. on the same host or in the same container, see it. Run
+the import there, or restart the other API instances afterwards.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, text, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("metadata_transfer")
+
+# Exported columns, in file order; id, updated_at and search indexes are rebuilt by the target
+EXPORT_COLUMNS = (
+    "filename",
+    "source",
+    "copyright",
+    "dataset_release",
+    "description",
+    "data_processing_stages",
+    "coordinates",
+    "is_public",
+    "upload_date",
+    "sha256",
+    "has_derivatives",
+    "fits_header",
+    "ra",
+    "dec",
+    "sky_cell",
+)
+
+FORMATS = ("csv", "ndjson", "parquet")
+DEFAULT_CHUNK_SIZE = 5000
+
+_BOOLEAN_COLUMNS = {"is_public", "has_derivatives"}
+_FLOAT_COLUMNS = {"ra", "dec"}
+_NULLABLE_COLUMNS = {"sha256", "fits_header", "ra", "dec", "sky_cell", "upload_date"}
+_REQUIRED_COLUMNS = EXPORT_COLUMNS[:7]
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """File format from --format or the file extension"""
+    if fmt:
+        return fmt
+    suffix = Path(path).suffix.lower().lstrip(".")
+    if suffix in ("jsonl", "ndjson"):
+        return "ndjson"
+    if suffix in ("csv", "parquet"):
+        return suffix
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Parquet support needs pyarrow: pip install 'euclid-backend[parquet]'")
+    return pyarrow
+
+
+def _parquet_schema():
+    pa = _parquet()
+    return pa.schema([
+        *((column, pa.string()) for column in EXPORT_COLUMNS[:7]),
+        ("is_public", pa.bool_()),
+        ("upload_date", pa.timestamp("us", tz="UTC")),
+        ("sha256", pa.string()),
+        ("has_derivatives", pa.bool_()),
+        # Headers have free-form keys, so they travel as JSON text
+        ("fits_header", pa.string()),
+        ("ra", pa.float64()),
+        ("dec", pa.float64()),
+        ("sky_cell", pa.int32()),
+    ])
+
+
+# Export
+
+def _to_record(row) -> Dict[str, Any]:
+    """Export representation of a row: timestamps in UTC ISO 8601, other values as stored"""
+    record = dict(zip(EXPORT_COLUMNS, row))
+    upload_date = record["upload_date"]
+    if upload_date.tzinfo is None:
+        upload_date = upload_date.replace(tzinfo=timezone.utc)
+    record["upload_date"] = upload_date
+    return record
+
+
+def _iter_rows(db: Session, chunk_size: int) -> Iterator:
+    from src.app.database.models import ImageMetadata
+
+    columns = [getattr(ImageMetadata, column) for column in EXPORT_COLUMNS]
+    query = select(*columns).order_by(ImageMetadata.id).execution_options(yield_per=chunk_size)
+    yield from db.execute(query)
+
+
+def _copy_out_csv(db: Session, out) -> None:
+    """CSV export through COPY: PostgreSQL formats the rows itself, no Python per row"""
+    columns = ", ".join(
+        f"{column}::text" if column == "fits_header" else column for column in EXPORT_COLUMNS
+    )
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY (SELECT {columns} FROM image_metadata ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)",
+        out,
+    )
+
+
+def export_catalog(db: Session, path: str, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Write every image_metadata row to `path`; returns the number of rows written (-1 when COPY does not tell)"""
+    if fmt == "parquet":
+        pa = _parquet()
+        schema = _parquet_schema()
+        count = 0
+        with pa.parquet.ParquetWriter(path, schema) as writer:
+            chunk: List[dict] = []
+            for row in _iter_rows(db, chunk_size):
+                record = _to_record(row)
+                if record["fits_header"] is not None:
+                    record["fits_header"] = json.dumps(record["fits_header"])
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+        return count
+
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        if fmt == "csv" and _is_postgresql(db):
+            _copy_out_csv(db, out)
+            return -1
+
+        count = 0
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_COLUMNS)
+        for row in _iter_rows(db, chunk_size):
+            record = _to_record(row)
+            record["upload_date"] = record["upload_date"].isoformat()
+            if writer:
+                if record["fits_header"] is not None:
+                    record["fits_header"] = json.dumps(record["fits_header"])
+                writer.writerow(["" if value is None else value for value in record.values()])
+            else:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+
+# Import
+
+def _read_records(path: str, fmt: str, chunk_size: int) -> Iterator[List[dict]]:
+    """Records of an export file, chunk_size at a time"""
+    if fmt == "parquet":
+        pa = _parquet()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    with open(path, encoding="utf-8", newline="") as f:
+        records = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        value = str(value).strip().replace(" ", "T", 1)
+        # PostgreSQL writes "+00" offsets, which fromisoformat wants as "+00:00"
+        if len(value) > 3 and value[-3] in "+-" and value[-2:].isdigit():
+            value += ":00"
+        parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a record read from any format to column values.
+
+    CSV cells are all strings (empty for NULL), and PostgreSQL writes booleans as t/f. Positions
+    missing from older exports are parsed from `coordinates`, like crud does on write.
+    """
+    from src.app.database.crud import sky_position
+
+    values = {}
+    for column in EXPORT_COLUMNS:
+        value = record.get(column)
+        if isinstance(value, str) and value == "" and column in _NULLABLE_COLUMNS | _BOOLEAN_COLUMNS:
+            value = None
+        if value is None:
+            values[column] = None
+        elif column in _BOOLEAN_COLUMNS:
+            values[column] = value if isinstance(value, bool) else str(value).lower() in ("t", "true", "1", "yes")
+        elif column in _FLOAT_COLUMNS:
+            values[column] = float(value)
+        elif column == "sky_cell":
+            values[column] = int(value)
+        elif column == "upload_date":
+            values[column] = _parse_datetime(value)
+        elif column == "fits_header":
+            values[column] = json.loads(value) if isinstance(value, str) else value
+        else:
+            values[column] = str(value)
+
+    missing = [column for column in _REQUIRED_COLUMNS if not values[column]]
+    if missing:
+        raise ValueError(f"Record {values['filename']!r} has no {', '.join(missing)}")
+    values["is_public"] = bool(values["is_public"])
+    values["has_derivatives"] = bool(values["has_derivatives"])
+    if values["upload_date"] is None:
+        values["upload_date"] = datetime.now(timezone.utc)
+    if values["ra"] is None:
+        values.update(sky_position(values["coordinates"]))
+    return values
+
+
+def _reconcile_chunk(records: List[dict], keep_missing: bool) -> Tuple[List[dict], int]:
+    """
+    Match a chunk against UPLOAD_PATH: drop rows without a file (unless keep_missing), derive
+    has_derivatives from the files present, and unlink blobs that are not in the blob store.
+    """
+    from src.app.services import derivatives, storage
+
+    present, skipped = [], 0
+    for values in records:
+        if not storage.get_upload_path(values["filename"]).exists() and not keep_missing:
+            skipped += 1
+            continue
+        values["has_derivatives"] = derivatives.supports_derivatives(values["filename"]) and all(
+            storage.get_upload_path(name).exists() for name in derivatives.derivative_filenames(values["filename"])
+        )
+        if values["sha256"] and not storage.get_blob_path(values["sha256"]).exists():
+            values["sha256"] = None
+        present.append(values)
+    return present, skipped
+
+
+def _blob_row(sha256: str) -> dict:
+    """image_blobs values of a blob found in the blob store, its MIME type sniffed like on upload"""
+    from src.app.services import storage
+
+    path = storage.get_blob_path(sha256)
+    with open(path, "rb") as f:
+        head = f.read(storage.SNIFF_SIZE)
+    try:
+        mime = storage.validate_mime(head)
+    except storage.InvalidFileTypeError:
+        mime = "application/octet-stream"
+    return {"sha256": sha256, "size": path.stat().st_size, "mime": mime, "ref_count": 0}
+
+
+def _insert_rows_postgresql(db: Session, records: List[dict]) -> List[Optional[str]]:
+    """COPY a chunk into a staging table, then move the new filenames into image_metadata"""
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS image_metadata_import "
+        "(LIKE image_metadata INCLUDING DEFAULTS)"
+    ))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values in records:
+        row = dict(values)
+        row["upload_date"] = row["upload_date"].isoformat()
+        if row["fits_header"] is not None:
+            row["fits_header"] = json.dumps(row["fits_header"])
+        writer.writerow(["" if row[column] is None else row[column] for column in EXPORT_COLUMNS])
+    buffer.seek(0)
+
+    columns = ", ".join(EXPORT_COLUMNS)
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(f"COPY image_metadata_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    from src.app.database.search import SEARCH_VECTOR_SQL
+    inserted = db.execute(text(
+        f"INSERT INTO image_metadata ({columns}, search_vector) "
+        f"SELECT {columns}, {SEARCH_VECTOR_SQL} FROM image_metadata_import "
+        "ON CONFLICT (filename) DO NOTHING RETURNING sha256"
+    )).scalars().all()
+    db.execute(text("TRUNCATE image_metadata_import"))
+    return inserted
+
+
+def _insert_rows_sqlite(db: Session, records: List[dict]) -> List[Optional[str]]:
+    """executemany INSERT ... ON CONFLICT DO NOTHING, then index the new rows in the FTS table"""
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from src.app.database.models import ImageMetadata
+    from src.app.database.search import SEARCH_FIELDS, fts_table
+
+    last_id = db.execute(select(ImageMetadata.id).order_by(ImageMetadata.id.desc()).limit(1)).scalar() or 0
+    inserted = db.execute(
+        sqlite_insert(ImageMetadata.__table__)
+        .on_conflict_do_nothing(index_elements=["filename"])
+        .returning(ImageMetadata.__table__.c.sha256),
+        records,
+    ).scalars().all()
+
+    fields = [column for column, _, _ in SEARCH_FIELDS]
+    db.execute(fts_table.insert().from_select(
+        ["rowid", *fields],
+        select(ImageMetadata.id, *(getattr(ImageMetadata, field) for field in fields)).where(ImageMetadata.id > last_id),
+    ))
+    return inserted
+
+
+def import_chunk(db: Session, records: List[dict]) -> int:
+    """
+    Insert one chunk of normalized records in a single transaction; returns the rows inserted.
+
+    Blob rows are created first with no reference, then incremented by the number of inserted
+    rows pointing at them, so rows skipped as duplicates do not count; unused ones are dropped.
+    """
+    from src.app.database.models import ImageBlob
+
+    shas = {values["sha256"] for values in records if values["sha256"]}
+    try:
+        if shas:
+            known = set(db.execute(select(ImageBlob.sha256).where(ImageBlob.sha256.in_(shas))).scalars())
+            new_blobs = [_blob_row(sha256) for sha256 in shas - known]
+            if new_blobs:
+                db.execute(insert(ImageBlob), new_blobs)
+
+        inserted = (_insert_rows_postgresql if _is_postgresql(db) else _insert_rows_sqlite)(db, records)
+
+        references = Counter(sha256 for sha256 in inserted if sha256)
+        if references:
+            blobs = ImageBlob.__table__
+            db.execute(
+                update(blobs)
+                .where(blobs.c.sha256 == bindparam("blob_sha256"))
+                .values(ref_count=blobs.c.ref_count + bindparam("added")),
+                [{"blob_sha256": sha256, "added": count} for sha256, count in references.items()],
+            )
+        if shas:
+            db.execute(delete(ImageBlob).where(ImageBlob.sha256.in_(shas), ImageBlob.ref_count == 0))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(inserted)
+
+
+def import_catalog(
+    db: Session,
+    path: str,
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    keep_missing: bool = False,
+) -> Tuple[int, int, int]:
+    """Load an export file; returns (inserted, already present, skipped for a missing file) counts"""
+    inserted = duplicates = missing = 0
+    for chunk in _read_records(path, fmt, chunk_size):
+        records, skipped = _reconcile_chunk([normalize_record(record) for record in chunk], keep_missing)
+        missing += skipped
+        if records:
+            count = import_chunk(db, records)
+            inserted += count
+            duplicates += len(records) - count
+        logger.info("Imported %d rows so far (%d already present, %d without a file)", inserted, duplicates, missing)
+    if inserted:
+        # The generation is shared with the API workers of the host: their listings are stale now
+        from src.app.services.cache import catalog_cache
+
+        catalog_cache.bump()
+    return inserted, duplicates, missing
+
+
+# Reconcile
+
+def reconcile(db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[List[str], List[str]]:
+    """
+    Compare the catalog with UPLOAD_PATH: returns (rows whose file is missing, files without a row).
+
+    Hidden entries (blob store, tile pyramids, temporary uploads) and derivatives are ignored.
+    """
+    from src.app.database.models import ImageMetadata
+    from src.app.services import derivatives, storage
+
+    on_disk = set(storage.iter_upload_names())
+    missing_files = []
+    for (filename,) in db.execute(
+        select(ImageMetadata.filename).order_by(ImageMetadata.id).execution_options(yield_per=chunk_size)
+    ):
+        if filename in on_disk:
+            on_disk.discard(filename)
+            on_disk.difference_update(derivatives.derivative_filenames(filename))
+        else:
+            missing_files.append(filename)
+    return missing_files, sorted(on_disk)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("export", "write the catalog to a file"), ("import", "load a catalog file")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path")
+        command.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+        command.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per batch and transaction")
+    commands.choices["import"].add_argument(
+        "--missing", choices=("skip", "keep"), default="skip", help="rows whose file is not in UPLOAD_PATH"
+    )
+    commands.add_parser("reconcile", help="report rows without a file and files without a row")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from src.app.database import SessionLocal
+
+    with SessionLocal() as db:
+        if args.command == "export":
+            count = export_catalog(db, args.path, detect_format(args.path, args.format), args.chunk_size)
+            logger.info("Exported %s rows to %s", "all" if count < 0 else count, args.path)
+        elif args.command == "import":
+            inserted, duplicates, missing = import_catalog(
+                db, args.path, detect_format(args.path, args.format), args.chunk_size, keep_missing=args.missing == "keep"
+            )
+            logger.info("Done: %d rows imported, %d already present, %d skipped without a file", inserted, duplicates, missing)
+        else:
+            missing_files, orphans = reconcile(db)
+            for filename in missing_files:
+                logger.warning("Missing file: %s", filename)
+            for filename in orphans:
+                logger.warning("File without metadata: %s", filename)
+            logger.info("%d rows without a file, %d files without a row", len(missing_files), len(orphans))
+            return 1 if missing_files or orphans else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
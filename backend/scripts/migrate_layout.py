@@ -0,0 +1,122 @@
+"""
+Move the upload directory from the flat layout to the sharded one (UPLOAD_PATH/ab/cd/<name>).
+
+Safe to run while the API is serving: every file is moved with a single rename on the same
+filesystem, and until the migration completes the API looks a name up at its old flat location
+whenever the sharded one is missing (services.storage.resolve_path). Uploads, derivatives, blobs
+(.blobs/<sha256>) and tile pyramids (.tiles/<name>) are moved; hard links between an upload and
+its blob survive, since a rename keeps the inode.
+
+The flat entries left are the only state: an interrupted run is resumed by running the command
+again. Once none is left, the LAYOUT_MARKER file is written and the API stops checking the old
+paths. Run from the backend directory, with the same UPLOAD_PATH as the API:
+
+    python -m scripts.migrate_layout [--rate 500] [--dry-run]
+
+--rate caps the moves per second, to keep the disk available to the API (0: no limit).
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+logger = logging.getLogger("migrate_layout")
+
+# Entries of the upload dir that are not part of the catalog: in-flight uploads and derivatives
+TEMPORARY_PREFIXES = (".upload-",)
+TEMPORARY_SUFFIXES = (".tmp",)
+
+
+def _is_temporary(name: str) -> bool:
+    return name.startswith(TEMPORARY_PREFIXES) or name.endswith(TEMPORARY_SUFFIXES)
+
+
+def flat_entries(upload_dir: Path) -> Iterator[Tuple[Path, Path]]:
+    """(old, new) paths of every entry still in the flat layout, scanned lazily"""
+    from src.app.services import storage, tiles
+
+    for entry in os.scandir(upload_dir):
+        if entry.is_file() and not entry.name.startswith("."):
+            yield Path(entry.path), storage.sharded_path(upload_dir, entry.name)
+
+    for store, want_dir in ((storage.BLOB_DIR_NAME, False), (tiles.TILES_DIR_NAME, True)):
+        root = upload_dir / store
+        if not root.is_dir():
+            continue
+        for entry in os.scandir(root):
+            if entry.name.startswith(".") or _is_temporary(entry.name):
+                continue
+            if want_dir and entry.is_dir() and os.path.exists(os.path.join(entry.path, tiles.PYRAMID_INFO)):
+                yield Path(entry.path), storage.sharded_path(root, entry.name)
+            elif not want_dir and entry.is_file():
+                yield Path(entry.path), storage.sharded_path(root, entry.name)
+
+
+def move(old: Path, new: Path) -> bool:
+    """Rename `old` into the sharded layout; False when something else already took its place"""
+    new.parent.mkdir(parents=True, exist_ok=True)
+    if new.exists():
+        # Same content already sharded (e.g. a blob stored again meanwhile): drop the old copy
+        if old.is_file() and new.is_file() and os.path.samefile(old, new):
+            old.unlink()
+            return True
+        logger.warning("Not moving %s: %s already exists", old, new)
+        return False
+    os.rename(old, new)
+    return True
+
+
+def migrate(upload_dir: Optional[str] = None, rate: float = 0, dry_run: bool = False) -> Tuple[int, int]:
+    """Move every flat entry; returns (moved, conflicts) and writes the marker when none is left"""
+    from src.app.services import storage
+
+    root = Path(upload_dir or storage.get_upload_dir())
+    moved = conflicts = 0
+    started = time.monotonic()
+    for old, new in flat_entries(root):
+        if dry_run:
+            logger.info("Would move %s -> %s", old, new)
+            moved += 1
+            continue
+        try:
+            if move(old, new):
+                moved += 1
+            else:
+                conflicts += 1
+        except FileNotFoundError:
+            # Deleted by the API since the scan
+            continue
+        if moved and moved % 1000 == 0:
+            logger.info("Moved %d entries so far", moved)
+        if rate > 0:
+            # Pace the moves: sleep until the schedule of `rate` per second catches up
+            delay = started + moved / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    if not dry_run and conflicts == 0:
+        (root / storage.LAYOUT_MARKER).write_text("sharded\n")
+    return moved, conflicts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=500, help="maximum moves per second (0: unlimited)")
+    parser.add_argument("--dry-run", action="store_true", help="list the moves without doing them")
+    parser.add_argument("--upload-dir", default=None, help="default: UPLOAD_PATH")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    moved, conflicts = migrate(args.upload_dir, rate=args.rate, dry_run=args.dry_run)
+    if conflicts:
+        logger.warning("Done: %d entries moved, %d conflicts left in place; run again once resolved", moved, conflicts)
+        return 1
+    logger.info("Done: %d entries %s", moved, "to move" if args.dry_run else "moved, layout migrated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from ..services import media, slow_queries
+
+router = APIRouter(prefix="/admin")
+
+
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    """Whether an X-Admin-Token header value matches ADMIN_TOKEN (never when it is unset)"""
+    token = os.environ.get("ADMIN_TOKEN")
+    return bool(token) and x_admin_token is not None and secrets.compare_digest(x_admin_token, token)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints need the X-Admin-Token header to match ADMIN_TOKEN; without it they do not exist"""
+    if not os.environ.get("ADMIN_TOKEN"):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+def get_slow_queries(
+    limit: int = Query(100, ge=1, le=1000),
+    min_duration_ms: Optional[float] = Query(None, ge=0),
+    fingerprint: Optional[str] = Query(None),
+    engine: Optional[str] = Query(None),
+    summary: bool = Query(False),
+):
+    """
+    Most recent entries of the slow statement log, newest first.
+
+    With summary=true the entries are grouped by normalized statement instead, so the slowest
+    filter combination comes first. Plain def: the log files are read on the threadpool.
+    """
+    entries = slow_queries.read_entries(limit, min_duration_ms=min_duration_ms, fingerprint=fingerprint, engine=engine)
+    if summary:
+        return slow_queries.summarize(entries)
+    return entries
+
+
+@router.get("/media/{filename}/signed-url", dependencies=[Depends(require_admin)])
+def get_signed_media_url(filename: str, ttl: int = Query(media.SIGNED_URL_TTL, ge=1, le=media.MAX_SIGNED_URL_TTL)):
+    """Short-lived URL of an upload or derivative, readable without the admin token even when private"""
+    if not media.is_media_name(filename):
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        return {"url": media.sign_media_path(filename, ttl), "expiresIn": ttl}
+    except media.InvalidSignatureError as e:
+        raise HTTPException(status_code=503, detail=str(e))
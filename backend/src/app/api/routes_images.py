@@ -1,15 +1,72 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import Optional
-from ..database.database import get_db
-from ..database import crud
-from ..models.schemas import ImageMetadataResponse
+from fastapi import APIRouter, Depends, Path, Query, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from pydantic_core import to_json
+from ..database.database import get_async_db
+from ..database import crud_async
+from ..models.schemas import ConeSearchResult, ImageMetadataResponse
+from ..services.serialization import encode_image, encode_images, image_to_dict
+from ..services.cache import catalog_cache, etag_matches, tile_cache
+from ..services import fits, media, sky, tiles
+from ..services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+    decode_cursor,
+    decode_offset_cursor,
+    encode_cursor,
+    encode_offset_cursor,
+)
+from .routes_admin import is_admin
+from .routes_media import may_read
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Tiles of a given filename never change (private images get media.PRIVATE_CACHE_CONTROL)
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _parse_header_filters(header: Optional[List[str]]) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    """Parse repeated `header=KEY=VALUE` params into sorted (KEYWORD, value) pairs, typed like FITS cards"""
+    if not header:
+        return None
+    pairs = set()
+    for item in header:
+        key, separator, value = item.partition("=")
+        if not separator or not key.strip():
+            raise HTTPException(status_code=400, detail=f"Invalid header filter {item!r}, expected KEY=VALUE")
+        pairs.add((key.strip().upper(), fits.parse_value(value)))
+    return tuple(sorted(pairs, key=repr))
+
+
+async def _stream_ndjson(rows: AsyncIterator, sign_private: bool) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield encode_image(row, sign_private) + b"\n"
+
+
+async def _stream_json_array(rows: AsyncIterator, sign_private: bool) -> AsyncIterator[bytes]:
+    yield b"["
+    separator = b""
+    async for row in rows:
+        yield separator + encode_image(row, sign_private)
+        separator = b","
+    yield b"]"
 
-@router.get("/images")
-def get_images(
+
+def _private_urls_key(is_public: Optional[bool], sign_private: bool):
+    """Cache key part for the file URLs of private rows: withheld, or signed for the current window"""
+    if is_public:
+        return None
+    return ("signed", media.listing_window()) if sign_private else "withheld"
+
+
+@router.get("/images", response_model=List[ImageMetadataResponse])
+async def get_images(
     source: Optional[str] = Query(None),
     copyright: Optional[str] = Query(None),
     dataset_release: Optional[str] = Query(None, alias="datasetRelease"),
@@ -17,37 +74,257 @@ def get_images(
     data_processing_stages: Optional[str] = Query(None, alias="dataProcessingStages"),
     coordinates: Optional[str] = Query(None),
     is_public: Optional[bool] = Query(None, alias="isPublic"),
-    db: Session = Depends(get_db)
+    header: Optional[List[str]] = Query(None, description="FITS header card to match, as KEY=VALUE; repeatable"),
+    q: Optional[str] = Query(None, max_length=500),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    stream: bool = Query(False),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get a list of all uploaded images along with their metadata, 
     with options to filter by metadata fields. The response includes metadata for each image in camelCase format.
+
+    Results are paginated newest first with an opaque keyset cursor: when more rows are available,
+    the `X-Next-Cursor` response header carries the value to send back as `cursor` for the next page.
+
+    With `q`, the listing switches to free-text search: every word must match one of the metadata
+    fields, and results are ordered by relevance instead of upload date.
+
+    With `stream=1` or `Accept: application/x-ndjson`, every matching image is streamed (no paging)
+    as a JSON array or as newline-delimited JSON, row by row, so full-catalog exports use constant memory.
+
+    `header=KEY=VALUE` (repeatable) keeps FITS uploads whose header has every given card, e.g.
+    `header=TELESCOP=Euclid&header=FILTER=VIS`; values are typed like card values (`T`, `42`, `1.5`).
+
+    Every response carries a strong ETag derived from the catalog write generation and the query:
+    a matching `If-None-Match` gets a 304 without a database round trip, and paged bodies are
+    served from an in-memory LRU until the next write. The file URLs (`url`, `thumbnails`,
+    `previews`) of private images are null, unless the X-Admin-Token header is sent: then they
+    are signed, and such listings are revalidated every MEDIA_SIGNED_URL_TTL seconds.
     
     Returns:
         A list of ImageMetadataResponse objects containing metadata for each uploaded image.
     """
-    filtered_images = crud.get_filtered_images(
-        db,
+    filters = dict(
         source=source,
         copyright=copyright,
         dataset_release=dataset_release,
         description=description,
         data_processing_stages=data_processing_stages,
         coordinates=coordinates,
-        is_public=is_public
+        is_public=is_public,
+        header=_parse_header_filters(header),
+    )
+
+    ndjson = accept is not None and NDJSON_MEDIA_TYPE in accept
+    streaming = stream or ndjson
+    if streaming and q:
+        raise HTTPException(status_code=400, detail="Streaming is not available for free-text search")
+
+    # Normalized query: parameter order, unset filters and unused paging params do not matter.
+    # Bodies that may list private images differ for admins, whose signed URLs are only reused
+    # within the signing window
+    sign_private = is_admin(x_admin_token)
+    cache_key = (
+        "ndjson" if ndjson else "stream" if stream else "page",
+        tuple(sorted((name, value) for name, value in filters.items() if value not in (None, ""))),
+        " ".join(q.split()) if q else None,
+        None if streaming else limit,
+        None if streaming else cursor,
+        _private_urls_key(is_public, sign_private),
     )
+    generation = catalog_cache.generation
+    etag = catalog_cache.etag(generation, cache_key)
+    validators = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=validators)
+
+    if streaming:
+        rows = crud_async.stream_filtered_image_rows(db, **filters)
+        if ndjson:
+            return StreamingResponse(_stream_ndjson(rows, sign_private), media_type=NDJSON_MEDIA_TYPE, headers=validators)
+        return StreamingResponse(_stream_json_array(rows, sign_private), media_type="application/json", headers=validators)
+
+    cached = catalog_cache.get(generation, cache_key)
+    if cached is not None:
+        body, headers = cached
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    try:
+        if q:
+            offset = decode_offset_cursor(cursor) if cursor else 0
+            filtered_images = await crud_async.search_images(db, q, skip=offset, limit=limit + 1, **filters)
+        else:
+            after = decode_cursor(cursor) if cursor else None
+            filtered_images = await crud_async.get_filtered_image_rows(db, limit=limit + 1, after=after, **filters)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = dict(validators)
+    if len(filtered_images) > limit:
+        filtered_images = filtered_images[:limit]
+        last = filtered_images[-1]
+        headers["X-Next-Cursor"] = (
+            encode_offset_cursor(offset + limit) if q else encode_cursor(last.upload_date, last.id)
+        )
     
-    return [
-        ImageMetadataResponse(
-            filename=img.filename,
-            source=img.source,
-            copyright=img.copyright,
-            dataset_release=img.dataset_release,
-            description=img.description,
-            data_processing_stages=img.data_processing_stages,
-            coordinates=img.coordinates,
-            is_public=img.is_public,
-            upload_date=img.upload_date.isoformat()
-        ).model_dump(by_alias=True)
-        for img in filtered_images
-    ]
\ No newline at end of file
+    # Rows are encoded straight to JSON bytes, skipping per-row pydantic models and jsonable_encoder
+    body = encode_images(filtered_images, sign_private)
+    catalog_cache.put(generation, cache_key, body, headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/images/cone", response_model=List[ConeSearchResult])
+async def cone_search(
+    ra: float = Query(..., ge=0, lt=360, description="Right ascension of the cone center, in degrees"),
+    dec: float = Query(..., ge=-90, le=90, description="Declination of the cone center, in degrees"),
+    radius: float = Query(..., gt=0, le=sky.MAX_CONE_RADIUS, description="Cone radius, in degrees"),
+    is_public: Optional[bool] = Query(None, alias="isPublic"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Find the images whose coordinates lie within `radius` degrees of (`ra`, `dec`), nearest first.
+
+    Only images whose `coordinates` parse as a sky position take part. Candidates come from the
+    declination-band index, then exact angular distances are computed in one vectorized pass;
+    each result carries its `distance` in degrees. Responses are cached and validated, and the file
+    URLs of private images withheld or signed, like /images.
+    """
+    sign_private = is_admin(x_admin_token)
+    cache_key = ("cone", ra, dec, radius, is_public, limit, _private_urls_key(is_public, sign_private))
+    generation = catalog_cache.generation
+    etag = catalog_cache.etag(generation, cache_key)
+    validators = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=validators)
+
+    cached = catalog_cache.get(generation, cache_key)
+    if cached is not None:
+        body, headers = cached
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    matches = await crud_async.cone_search(db, ra, dec, radius, limit=limit, is_public=is_public)
+    body = to_json([{**image_to_dict(row, sign_private), "distance": distance} for row, distance in matches])
+    catalog_cache.put(generation, cache_key, body, validators)
+    return Response(content=body, media_type="application/json", headers=validators)
+
+
+def _image_not_found(filename: str) -> HTTPException:
+    # Private images without credentials get the same answer as missing ones
+    return HTTPException(status_code=404, detail=f"Image {filename} not found")
+
+
+async def _authorize_image(
+    filename: str,
+    expires: Optional[str],
+    signature: Optional[str],
+    x_admin_token: Optional[str],
+    db: AsyncSession,
+) -> bool:
+    """
+    Visibility check shared with /media (see routes_media.may_read), from one indexed lookup.
+
+    Returns whether the image is public; raises 404 for unknown images and for private ones
+    without the admin token or a signature issued for `filename`.
+    """
+    row = await crud_async.get_media_row(db, [filename])
+    if row is None or not may_read(filename, row.is_public, expires, signature, x_admin_token):
+        raise _image_not_found(filename)
+    return row.is_public
+
+
+@router.get("/images/{filename}/header")
+async def get_image_header(
+    filename: str,
+    expires: Optional[str] = Query(None),
+    signature: Optional[str] = Query(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the FITS header cards stored for an image at upload, as {KEYWORD: value}"""
+    image = await crud_async.get_image_by_filename(db, filename)
+    if image is None or not may_read(filename, image.is_public, expires, signature, x_admin_token):
+        raise _image_not_found(filename)
+    if image.fits_header is None:
+        raise HTTPException(status_code=404, detail=f"{filename} has no FITS header")
+    return {"filename": filename, "header": image.fits_header}
+
+
+async def _get_pyramid(filename: str) -> dict:
+    """Pyramid description of an authorized image, built on first use; 404 for videos"""
+    info = await tiles.load_pyramid(filename)
+    if info is not None:
+        return info
+
+    if not tiles.supports_tiles(filename):
+        raise HTTPException(status_code=404, detail=f"No tiles are available for {filename}")
+    try:
+        return await tiles.ensure_pyramid(filename)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Could not build tiles for {filename}: {e}")
+
+
+@router.get("/images/{filename}/tiles")
+async def get_image_tiles_info(
+    filename: str,
+    expires: Optional[str] = Query(None),
+    signature: Optional[str] = Query(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Describe the Deep Zoom tile pyramid of an image, building it on first request.
+
+    Levels follow the DZI convention (level 0 is one pixel, `maxLevel` the full resolution) and
+    tiles are fetched from the `url` template; viewers such as OpenSeadragon can use the
+    description directly as a tile source. Private images need the admin token or a signed
+    URL of the image (see /admin/media/{filename}/signed-url), whose signature is carried over
+    to the tile template.
+    """
+    is_public = await _authorize_image(filename, expires, signature, x_admin_token, db)
+    info = await _get_pyramid(filename)
+    url = f"/images/{filename}/tiles/{{z}}/{{x}}/{{y}}"
+    if not is_public and expires and signature:
+        url += f"?{urlencode({'expires': expires, 'signature': signature})}"
+    return {**info, "url": url}
+
+
+@router.get("/images/{filename}/tiles/{z}/{x}/{y}")
+async def get_image_tile(
+    filename: str,
+    z: int = Path(..., ge=0),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    expires: Optional[str] = Query(None),
+    signature: Optional[str] = Query(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get one WebP tile of the Deep Zoom pyramid of an image: level `z`, column `x`, row `y`.
+
+    The pyramid is built once, from streamed strips, into an on-disk tile cache; hot tiles are
+    then served from an in-memory LRU, so panning a huge mosaic only transfers the visible tiles.
+    The visibility is checked before the LRU, and only tiles of public images may be kept by
+    shared caches.
+    """
+    is_public = await _authorize_image(filename, expires, signature, x_admin_token, db)
+    body = tile_cache.get((filename, z, x, y))
+    if body is None:
+        info = await _get_pyramid(filename)
+        columns, rows = tiles.tile_grid(info, z) if z <= info["maxLevel"] else (0, 0)
+        if x >= columns or y >= rows:
+            raise HTTPException(status_code=404, detail="Tile out of range")
+        body = await tiles.read_tile(filename, z, x, y)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Tile not found")
+    cache_control = TILE_CACHE_CONTROL if is_public else media.PRIVATE_CACHE_CONTROL
+    return Response(content=body, media_type="image/webp", headers={"Cache-Control": cache_control})
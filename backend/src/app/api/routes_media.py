@@ -0,0 +1,79 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import crud_async
+from ..database.database import get_async_db
+from ..services import media
+from ..services.object_storage import get_storage_backend, media_key
+from ..services.storage import get_upload_dir, get_upload_path
+from .routes_admin import is_admin
+
+router = APIRouter()
+
+
+def _not_found() -> HTTPException:
+    # Private and missing files are indistinguishable
+    return HTTPException(status_code=404, detail="File not found")
+
+
+def may_read(
+    filename: str,
+    is_public: bool,
+    expires: Optional[str],
+    signature: Optional[str],
+    x_admin_token: Optional[str],
+) -> bool:
+    """Whether a request may read `filename`: public, or the admin token, or a valid signature for that name"""
+    if is_public or is_admin(x_admin_token):
+        return True
+    try:
+        media.verify_signature(filename, expires, signature)
+    except media.InvalidSignatureError:
+        return False
+    return True
+
+
+@router.get("/media/{filename}", include_in_schema=False)
+async def get_media(
+    filename: str,
+    expires: Optional[str] = Query(None),
+    signature: Optional[str] = Query(None),
+    x_admin_token: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Serve an upload or one of its derivatives, if the requester may see it (nginx proxies /uploads/ here).
+
+    The visibility comes from a single indexed lookup on the filename. With an object storage
+    backend the answer is a redirect to a presigned URL of the object. Behind nginx
+    (MEDIA_ACCEL_PREFIX set) the response is an empty X-Accel-Redirect and nginx sends the file
+    with sendfile; otherwise the file is streamed from here, Range requests included.
+    """
+    if not media.is_media_name(filename):
+        raise _not_found()
+    row = await crud_async.get_media_row(db, media.candidate_originals(filename))
+    if row is None:
+        raise _not_found()
+    is_public = row.is_public
+    if not may_read(filename, is_public, expires, signature, x_admin_token):
+        raise _not_found()
+
+    backend = get_storage_backend()
+    if not backend.local:
+        # Object store: the client fetches the bytes itself, through a URL valid for a few minutes
+        key = media_key(filename, row.sha256, is_original=row.filename == filename)
+        url = backend.presigned_url(key, media.SIGNED_URL_TTL)
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": media.PRIVATE_CACHE_CONTROL})
+
+    headers = {"Cache-Control": media.PUBLIC_CACHE_CONTROL if is_public else media.PRIVATE_CACHE_CONTROL}
+    path = get_upload_path(filename)
+    if media.ACCEL_PREFIX:
+        headers["X-Accel-Redirect"] = media.accel_redirect_path(path.relative_to(get_upload_dir()).as_posix())
+        return Response(headers=headers)
+
+    if not path.is_file():
+        raise _not_found()
+    return FileResponse(path, headers=headers)
@@ -1,62 +1,315 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import asyncio
+import base64
+import json
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_core import to_json
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request, Response
 from fastapi.concurrency import run_in_threadpool
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from ..database import get_db
-from ..database.crud import create_image_metadata
-from ..services.storage import save_file
-from ..models.schemas import ImageMetadataCreate, ImageMetadataResponse
+from ..database import get_async_db
+from ..database.crud import PendingUpload
+from ..database.crud_async import create_image_from_upload, create_images_from_uploads
+from ..services.storage import (
+    ALLOWED_EXTENSIONS,
+    FileTooLargeError,
+    InvalidFileTypeError,
+    StreamingFileWriter,
+    get_file_extension,
+    write_upload,
+)
+from ..services import fits
+from ..services.metrics import time_upload_stage
+from ..services.derivatives import generate_derivatives, remove_derivatives
+from ..services.object_storage import get_storage_backend, publish_upload, unpublish
+from ..services.streaming_upload import MultipartStreamError, receive_streaming_upload
+from ..services.serialization import encode_image, image_to_dict
+from ..models.schemas import BatchUploadResponse, ImageMetadataCreate, ImageMetadataResponse
 router = APIRouter()
 
+# Files accepted in one /upload/batch request
+MAX_BATCH_FILES = 100
+
+
+def check_extension(filename: str) -> None:
+    """Reject client filenames whose extension is not in ALLOWED_EXTENSIONS"""
+    file_ext = get_file_extension(filename)
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {file_ext} not allowed."
+        )
+
+
+def storage_http_error(error: ValueError) -> HTTPException:
+    """Map a rejected upload body to its HTTP error"""
+    if isinstance(error, FileTooLargeError):
+        return HTTPException(status_code=413, detail=str(error))
+    if isinstance(error, InvalidFileTypeError):
+        return HTTPException(status_code=415, detail=str(error))
+    return HTTPException(status_code=400, detail=str(error))
+
+
+async def read_upload_metadata(writer: StreamingFileWriter, fields: Dict[str, str]) -> Tuple[ImageMetadataCreate, Optional[Dict[str, Any]]]:
+    """
+    Validate the metadata fields of a finished upload.
+
+    FITS files have their header parsed (in the threadpool, only the header blocks are read):
+    it is returned for storage, and its WCS fills in `coordinates` when the field was left empty.
+    """
+    fits_header = None
+    if fits.is_fits(writer.filename):
+        try:
+            fits_header, coordinates = await run_in_threadpool(fits.describe, writer.path)
+        except fits.FitsError as e:
+            raise storage_http_error(e)
+        typed = fields.get("coordinates")
+        if coordinates and not (isinstance(typed, str) and typed.strip()):
+            fields = {**fields, "coordinates": coordinates}
+    return ImageMetadataCreate.from_form_fields(**fields), fits_header
+
+
+async def publish(writer: StreamingFileWriter, has_derivatives: bool) -> None:
+    """
+    Copy the content and derivatives of an upload to a remote storage backend (in the threadpool),
+    before its row is committed: every stored image can be served. Nothing to do for local storage.
+    """
+    if get_storage_backend().local:
+        return
+    try:
+        with time_upload_stage("publish"):
+            await run_in_threadpool(
+                publish_upload, writer.path, writer.sha256, writer.mime, writer.filename if has_derivatives else None
+            )
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Storage unavailable: {e}")
+
+
+async def discard_derivatives(filename: str) -> None:
+    """Remove the derivatives of an upload that was not stored, locally and from a remote backend"""
+    remove_derivatives(filename)
+    if not get_storage_backend().local:
+        await run_in_threadpool(unpublish, filename)
+
+
+async def store_upload(
+    db: AsyncSession,
+    writer: StreamingFileWriter,
+    metadata: ImageMetadataCreate,
+    fits_header: Optional[Dict[str, Any]] = None
+):
+    """
+    Record a finished upload, deduplicated against the blob store.
+
+    WebP thumbnails and previews are rendered first, on the derivative process pool, from the
+    not yet committed file, so the response already carries their URLs.
+    """
+    with time_upload_stage("derivatives"):
+        has_derivatives = await generate_derivatives(writer.path, writer.filename)
+    try:
+        await publish(writer, has_derivatives)
+        with time_upload_stage("store"):
+            return await create_image_from_upload(
+                db=db, writer=writer, metadata=metadata, has_derivatives=has_derivatives, fits_header=fits_header
+            )
+    except IntegrityError:
+        await discard_derivatives(writer.filename)
+        # File already exists in database
+        raise HTTPException(
+            status_code=409,
+            detail=f"File {writer.filename} already exists"
+        )
+    except BaseException:
+        await discard_derivatives(writer.filename)
+        raise
+
 
 @router.post("/upload", response_model=ImageMetadataResponse)
 async def upload_image(
     file: UploadFile = File(...),
-    metadata: ImageMetadataCreate = Depends(ImageMetadataCreate.as_form),
-    db: Session = Depends(get_db)
+    form: dict = Depends(ImageMetadataCreate.upload_form),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Upload an image file along with its metadata. 
     The metadata fields are validated using Pydantic, 
     and the file type is checked against allowed extensions.
     camelCase for metadata fields in the API, while using snake_case internally in the Pydantic model. 
-    The file and metadata are saved in a thread pool to avoid blocking the event loop.
+    The file is saved in a thread pool and the metadata through the async session, so neither blocks the event loop.
+    For FITS files, the header is stored and an empty `coordinates` field is filled in from the WCS.
     """
-    allowed_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4', '.webm', '.ogg', '.mov'}
-    file_ext = '.' + file.filename.split('.')[-1].lower() if '.' in file.filename else ''
+    check_extension(file.filename)
     
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File type {file_ext} not allowed."
-        )
+    # Copy and hash the file in thread pool to avoid blocking event loop
+    try:
+        writer = await run_in_threadpool(write_upload, file)
+    except (FileTooLargeError, InvalidFileTypeError) as e:
+        raise storage_http_error(e)
     
-    # Save file in thread pool to avoid blocking event loop
-    filename = await run_in_threadpool(save_file, file)
+    # Store the content (once per SHA-256) and create the metadata entry
+    with writer:
+        metadata, fits_header = await read_upload_metadata(writer, form)
+        db_image = await store_upload(db, writer, metadata, fits_header)
     
-    # Create metadata entry in database
+    # Convert to response format with camelCase aliases
+    return image_to_dict(db_image)
+
+
+@router.post("/upload/stream", response_model=ImageMetadataResponse)
+async def upload_image_stream(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload an image file along with its metadata, in a single pass over the request body.
+
+    Takes the same multipart form as /upload, but the file part is written straight to storage as
+    it arrives instead of being spooled to a temporary file and copied again. The MIME
+    type is sniffed from the first bytes, the size limit is enforced from Content-Length and then on
+    the running byte count, and the SHA-256 computed on the way is returned in a Repr-Digest header.
+    """
     try:
-        db_image = create_image_metadata(
-            db=db,
-            filename=filename,
-            metadata=metadata
+        with time_upload_stage("receive_stream"):
+            fields, writer = await receive_streaming_upload(request)
+    except (FileTooLargeError, InvalidFileTypeError, MultipartStreamError) as e:
+        raise storage_http_error(e)
+
+    with writer:
+        check_extension(writer.original_filename)
+        try:
+            await run_in_threadpool(writer.finish)
+        except InvalidFileTypeError as e:
+            raise storage_http_error(e)
+        metadata, fits_header = await read_upload_metadata(writer, fields)
+        db_image = await store_upload(db, writer, metadata, fits_header)
+
+    digest = base64.b64encode(bytes.fromhex(writer.sha256)).decode()
+    return Response(
+        content=encode_image(db_image),
+        media_type="application/json",
+        headers={"Repr-Digest": f"sha-256=:{digest}:"}
+    )
+
+
+def _batch_item_fields(shared: dict, metadata: Optional[str], count: int) -> List[dict]:
+    """Metadata fields of every file of a batch: the per-file JSON objects merged over the shared fields"""
+    if metadata is None:
+        return [dict(shared) for _ in range(count)]
+    try:
+        items = json.loads(metadata)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="metadata must be a JSON array")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON array of objects")
+    if len(items) != count:
+        raise HTTPException(status_code=400, detail=f"metadata has {len(items)} entries for {count} files")
+    return [{**shared, **item} for item in items]
+
+
+async def _prepare_batch_item(file: UploadFile, fields: dict) -> Tuple[StreamingFileWriter, ImageMetadataCreate, Optional[Dict[str, Any]]]:
+    """Write and validate one file of a batch, like /upload does; errors are raised as HTTPException"""
+    check_extension(file.filename)
+    try:
+        writer = await run_in_threadpool(write_upload, file)
+    except (FileTooLargeError, InvalidFileTypeError) as e:
+        raise storage_http_error(e)
+    try:
+        metadata, fits_header = await read_upload_metadata(writer, fields)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer, metadata, fits_header
+
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    shared: dict = Depends(ImageMetadataCreate.batch_form),
+    metadata: Optional[str] = Form(
+        None, description="JSON array with one metadata object per file (camelCase), merged over the shared fields"
+    ),
+    atomic: bool = Form(False, description="Store every file or none of them"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload many files in one request, with shared and/or per-file metadata.
+
+    Files are written, hashed and validated concurrently in the threadpool, derivatives are
+    rendered concurrently on the process pool, and every valid file is then recorded with a
+    single bulk INSERT and one commit. Each file gets its own result, with the status and error
+    detail /upload would have returned for it.
+
+    By default a failing file does not prevent the others from being stored. With `atomic=true`
+    the batch is stored only when every file is valid; otherwise nothing is, the failing files
+    carry their error and the others status 424, and the response status is 422.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    item_fields = _batch_item_fields(shared, metadata, len(files))
+
+    results: List[dict] = [
+        {"index": index, "originalFilename": file.filename, "status": 201, "detail": None, "image": None}
+        for index, file in enumerate(files)
+    ]
+
+    with ExitStack() as stack:
+        prepared = await asyncio.gather(
+            *(_prepare_batch_item(file, fields) for file, fields in zip(files, item_fields)),
+            return_exceptions=True,
         )
-    except IntegrityError:
-        # File already exists in database
-        raise HTTPException(
-            status_code=409,
-            detail=f"File {filename} already exists"
+        # Every written file is discarded on the way out unless it was stored
+        for outcome in prepared:
+            if isinstance(outcome, tuple):
+                stack.enter_context(outcome[0])
+        valid = []
+        for index, outcome in enumerate(prepared):
+            if isinstance(outcome, HTTPException):
+                results[index].update(status=outcome.status_code, detail=outcome.detail)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                valid.append(index)
+
+        if atomic and len(valid) < len(files):
+            for index in valid:
+                results[index].update(status=424, detail="Not stored: another file of the atomic batch failed")
+            valid = []
+
+        writers = {index: prepared[index][0] for index in valid}
+        rendered = await asyncio.gather(
+            *(generate_derivatives(writers[index].path, writers[index].filename) for index in valid)
         )
-    
-    # Convert to response format with camelCase aliases
-    return ImageMetadataResponse(
-        filename=db_image.filename,
-        source=db_image.source,
-        copyright=db_image.copyright,
-        dataset_release=db_image.dataset_release,
-        description=db_image.description,
-        data_processing_stages=db_image.data_processing_stages,
-        coordinates=db_image.coordinates,
-        is_public=db_image.is_public,
-        upload_date=db_image.upload_date.isoformat()
-    ).model_dump(by_alias=True)
\ No newline at end of file
+        uploads = {
+            index: PendingUpload(writers[index], prepared[index][1], has_derivatives, prepared[index][2])
+            for index, has_derivatives in zip(valid, rendered)
+        }
+
+        stored = {}
+        try:
+            await asyncio.gather(*(publish(upload.writer, upload.has_derivatives) for upload in uploads.values()))
+            try:
+                images = await create_images_from_uploads(db, list(uploads.values())) if uploads else []
+                stored = dict(zip(uploads, images))
+            except IntegrityError:
+                if atomic:
+                    raise HTTPException(status_code=409, detail="The batch conflicts with existing files")
+                # Isolate the failing files: store the rest one by one
+                for index, upload in uploads.items():
+                    try:
+                        stored[index] = await create_image_from_upload(db, *upload)
+                    except IntegrityError:
+                        results[index].update(status=409, detail=f"File {upload.writer.filename} already exists")
+        finally:
+            for index in valid:
+                if index in stored:
+                    results[index]["image"] = image_to_dict(stored[index])
+                else:
+                    await discard_derivatives(writers[index].filename)
+
+    created = sum(result["status"] == 201 for result in results)
+    body = {"atomic": atomic, "created": created, "failed": len(results) - created, "results": results}
+    status_code = 422 if atomic and created < len(results) else 200
+    return Response(content=to_json(body), status_code=status_code, media_type="application/json")
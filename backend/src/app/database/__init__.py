@@ -1,4 +1,35 @@
-from .database import engine, SessionLocal, get_db, Base
-from .models import ImageMetadata
+from .database import (
+    SessionLocal,
+    get_db,
+    AsyncSessionLocal,
+    get_async_db,
+    get_engine,
+    get_async_engine,
+    dispose_engines,
+    prewarm_pool,
+    Base,
+)
+from .models import ImageBlob, ImageMetadata
+from . import search  # noqa: F401  registers the full-text index DDL with the image_metadata table
 
-__all__ = ["engine", "SessionLocal", "get_db", "Base", "ImageMetadata"]
\ No newline at end of file
+__all__ = [
+    "SessionLocal",
+    "get_db",
+    "AsyncSessionLocal",
+    "get_async_db",
+    "get_engine",
+    "get_async_engine",
+    "dispose_engines",
+    "prewarm_pool",
+    "Base",
+    "ImageBlob",
+    "ImageMetadata",
+]
+
+
+def __getattr__(name: str):
+    # The engines are created lazily, see database.get_engine
+    if name in ("engine", "async_engine"):
+        from . import database
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,35 +1,333 @@
+import json
+from collections import Counter
+from datetime import datetime
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from .models import ImageMetadata as ImageMetadataModel
+from sqlalchemy import Boolean, and_, delete, desc, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from .models import ImageBlob as ImageBlobModel, ImageMetadata as ImageMetadataModel
+from . import search
 from ..models.schemas import ImageMetadataCreate
+from ..services import derivatives, object_storage, sky, storage, tiles
+from ..services.cache import catalog_cache
 
+# Columns needed to serialize a listing: selected as a plain projection, so listing pages
+# skip ORM object construction and the session identity map entirely
+LISTING_COLUMNS = (
+    ImageMetadataModel.id,
+    ImageMetadataModel.filename,
+    ImageMetadataModel.source,
+    ImageMetadataModel.copyright,
+    ImageMetadataModel.dataset_release,
+    ImageMetadataModel.description,
+    ImageMetadataModel.data_processing_stages,
+    ImageMetadataModel.coordinates,
+    ImageMetadataModel.is_public,
+    ImageMetadataModel.upload_date,
+    ImageMetadataModel.has_derivatives,
+    ImageMetadataModel.ra,
+    ImageMetadataModel.dec,
+)
 
-def create_image_metadata(db: Session, filename: str, metadata: ImageMetadataCreate) -> ImageMetadataModel:
+
+# What the cone search prune reads per candidate (see cone_search)
+CONE_CANDIDATE_COLUMNS = (ImageMetadataModel.id, ImageMetadataModel.ra, ImageMetadataModel.dec)
+
+
+def sky_position(coordinates: str) -> dict:
+    """ra, dec and sky_cell column values for a `coordinates` field (all None when it is not a position)"""
+    position = sky.parse_coordinates(coordinates)
+    if position is None:
+        return {"ra": None, "dec": None, "sky_cell": None}
+    ra, dec = position
+    return {"ra": ra, "dec": dec, "sky_cell": sky.sky_cell(dec)}
+
+
+def create_image_metadata(
+    db: Session,
+    filename: str,
+    metadata: ImageMetadataCreate,
+    sha256: Optional[str] = None,
+    has_derivatives: bool = False,
+    fits_header: Optional[Dict[str, Any]] = None
+) -> ImageMetadataModel:
     """Create a new image metadata entry in the database"""
     db_image = ImageMetadataModel(
         filename=filename,
+        sha256=sha256,
+        has_derivatives=has_derivatives,
+        fits_header=fits_header,
         source=metadata.source,
         copyright=metadata.copyright,
         dataset_release=metadata.dataset_release,
         description=metadata.description,
         data_processing_stages=metadata.data_processing_stages,
         coordinates=metadata.coordinates,
+        **sky_position(metadata.coordinates),
         is_public=metadata.is_public
     )
     db.add(db_image)
+    db.flush()
+    search.index_image(db, db_image)
     db.commit()
+    catalog_cache.bump()
     db.refresh(db_image)
     return db_image
 
 
+def _acquire_blob(db: Session, sha256: str, size: int, mime: str) -> bool:
+    """
+    Take a reference on the blob with this content hash, creating its row if needed.
+
+    A single INSERT ... ON CONFLICT DO UPDATE, so concurrent uploads of the same content
+    serialize on the row instead of racing. Returns True when the blob is new.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(ImageBlobModel).values(sha256=sha256, size=size, mime=mime, ref_count=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ImageBlobModel.sha256],
+        set_={"ref_count": ImageBlobModel.ref_count + 1},
+    ).returning(ImageBlobModel.ref_count)
+    return db.execute(statement).scalar_one() == 1
+
+
+def _release_blob(db: Session, sha256: str) -> bool:
+    """Drop a reference on a blob, deleting its row with the last one. Returns True when it was freed"""
+    ref_count = db.execute(
+        update(ImageBlobModel)
+        .where(ImageBlobModel.sha256 == sha256)
+        .values(ref_count=ImageBlobModel.ref_count - 1)
+        .returning(ImageBlobModel.ref_count)
+    ).scalar_one_or_none()
+    if ref_count is not None and ref_count <= 0:
+        db.execute(delete(ImageBlobModel).where(ImageBlobModel.sha256 == sha256))
+        return True
+    return False
+
+
+def link_uploads(writers: List[storage.StreamingFileWriter], new_blobs: set) -> List[str]:
+    """
+    Move finished uploads into the blob store and give each its filename; file work only, blocking.
+
+    An upload whose content hash is in `new_blobs` (or whose blob file went missing) becomes
+    the blob, the others are discarded in favour of the existing one. All or nothing: on
+    failure the names linked so far are removed. Returns the linked filenames.
+    """
+    new_blobs = set(new_blobs)
+    linked = []
+    try:
+        for writer in writers:
+            if writer.sha256 in new_blobs or not storage.get_blob_path(writer.sha256).exists():
+                writer.commit_blob()
+                new_blobs.discard(writer.sha256)
+            else:
+                writer.abort()
+            storage.link_blob(writer.sha256, writer.filename)
+            linked.append(writer.filename)
+    except Exception:
+        remove_files(linked)
+        raise
+    return linked
+
+
+def remove_files(filenames: List[str]) -> None:
+    """Drop the names of uploads whose rows were not committed (blocking)"""
+    for filename in filenames:
+        storage.remove_file(filename)
+
+
+def acquire_upload_blob(db: Session, writer: storage.StreamingFileWriter) -> set:
+    """Take a reference on the blob of an upload; the `new_blobs` of link_uploads: its hash when it is new"""
+    return {writer.sha256} if _acquire_blob(db, writer.sha256, writer.size, writer.mime) else set()
+
+
+def create_image_from_upload(
+    db: Session,
+    writer: storage.StreamingFileWriter,
+    metadata: ImageMetadataCreate,
+    has_derivatives: bool = False,
+    fits_header: Optional[Dict[str, Any]] = None
+) -> ImageMetadataModel:
+    """
+    Store a finished upload in the content-addressed blob store and create its metadata entry.
+
+    Each distinct content is kept once, under its SHA-256. When the hash is already known the
+    uploaded copy is discarded and the new filename becomes another hard link to the existing
+    blob, whose reference count is incremented in the same transaction as the metadata row.
+
+    crud_async runs the same steps, with the file work (link_uploads, remove_files) off the
+    event loop.
+    """
+    linked = link_uploads([writer], acquire_upload_blob(db, writer))
+    try:
+        return create_image_metadata(
+            db,
+            writer.filename,
+            metadata,
+            sha256=writer.sha256,
+            has_derivatives=has_derivatives,
+            fits_header=fits_header,
+        )
+    except Exception:
+        # The blob itself may be shared already: leave it, only drop the name of this upload
+        db.rollback()
+        remove_files(linked)
+        raise
+
+
+class PendingUpload(NamedTuple):
+    """A finished, uncommitted upload and the values of its metadata row, for bulk creation"""
+
+    writer: storage.StreamingFileWriter
+    metadata: ImageMetadataCreate
+    has_derivatives: bool = False
+    fits_header: Optional[Dict[str, Any]] = None
+
+
+def _acquire_blobs(db: Session, writers: List[storage.StreamingFileWriter]) -> set:
+    """
+    Take one reference per writer on the blobs of their content hashes, in a single statement.
+
+    Writers sharing a hash are folded into one VALUES row carrying their count, since an
+    INSERT ... ON CONFLICT cannot touch the same row twice. Returns the hashes that are new.
+    """
+    counts = Counter(writer.sha256 for writer in writers)
+    first = {}
+    for writer in writers:
+        first.setdefault(writer.sha256, writer)
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(ImageBlobModel).values([
+        {"sha256": sha256, "size": writer.size, "mime": writer.mime, "ref_count": counts[sha256]}
+        for sha256, writer in first.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[ImageBlobModel.sha256],
+        set_={"ref_count": ImageBlobModel.ref_count + statement.excluded.ref_count},
+    ).returning(ImageBlobModel.sha256, ImageBlobModel.ref_count)
+    return {sha256 for sha256, ref_count in db.execute(statement) if ref_count == counts[sha256]}
+
+
+def insert_uploads(db: Session, uploads: List[PendingUpload]) -> Tuple[List[ImageMetadataModel], set]:
+    """
+    Database half of create_images_from_uploads: take the blob references and insert and index
+    the rows, without committing. Rolls back on failure. Returns the rows in order and the new
+    blob hashes (the `new_blobs` of link_uploads).
+    """
+    try:
+        new_blobs = _acquire_blobs(db, [upload.writer for upload in uploads])
+        images = db.scalars(
+            insert(ImageMetadataModel).returning(ImageMetadataModel, sort_by_parameter_order=True),
+            [
+                {
+                    "filename": upload.writer.filename,
+                    "sha256": upload.writer.sha256,
+                    "has_derivatives": upload.has_derivatives,
+                    "fits_header": upload.fits_header,
+                    "source": upload.metadata.source,
+                    "copyright": upload.metadata.copyright,
+                    "dataset_release": upload.metadata.dataset_release,
+                    "description": upload.metadata.description,
+                    "data_processing_stages": upload.metadata.data_processing_stages,
+                    "coordinates": upload.metadata.coordinates,
+                    **sky_position(upload.metadata.coordinates),
+                    "is_public": upload.metadata.is_public,
+                }
+                for upload in uploads
+            ],
+        ).all()
+        search.index_images(db, images)
+    except Exception:
+        db.rollback()
+        raise
+    return images, new_blobs
+
+
+def commit_uploads(db: Session) -> None:
+    """Commit the rows of insert_uploads; the caller removes the linked files when it fails"""
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    catalog_cache.bump()
+
+
+def create_images_from_uploads(db: Session, uploads: List[PendingUpload]) -> List[ImageMetadataModel]:
+    """
+    Store many finished uploads and create their metadata rows in one transaction.
+
+    Blob references are taken with one INSERT ... ON CONFLICT, rows are created with one
+    multi-row INSERT ... RETURNING and indexed for search in one statement, then committed
+    once. It is all or nothing: when the database rejects the batch, it is rolled back before
+    any file has moved, so the writers can still be stored one by one. Returns the rows in order.
+    """
+    images, new_blobs = insert_uploads(db, uploads)
+    try:
+        linked = link_uploads([upload.writer for upload in uploads], new_blobs)
+    except Exception:
+        db.rollback()
+        raise
+    try:
+        commit_uploads(db)
+    except Exception:
+        remove_files(linked)
+        raise
+    return images
+
+
+def _contains(column, term: str):
+    """
+    Case-insensitive substring match on a column.
+
+    LIKE wildcards in the user input are escaped so they match literally. On PostgreSQL the
+    resulting ILIKE '%term%' is served by the pg_trgm GIN index of the column; on SQLite it
+    falls back to a LIKE scan, which is fine for the test and development databases.
+    """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+class HeaderMatch(ColumnElement):
+    """
+    FITS header card equality: fits_header[key] == value.
+
+    Compiled to a JSONB containment (fits_header @> '{"KEY": value}') on PostgreSQL, which the
+    jsonb_path_ops GIN index answers directly, and to json_extract() on SQLite.
+    """
+
+    type = Boolean()
+    inherit_cache = False
+
+    def __init__(self, column, key: str, value: Any):
+        self.column = column
+        self.key = key
+        self.value = value
+
+
+@compiles(HeaderMatch)
+def _compile_header_match(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    path = compiler.process(literal(f'$."{element.key}"'), **kw)
+    return f"json_extract({column}, {path}) = {compiler.process(literal(element.value), **kw)}"
+
+
+@compiles(HeaderMatch, "postgresql")
+def _compile_header_match_postgresql(element, compiler, **kw):
+    column = compiler.process(element.column, **kw)
+    document = compiler.process(literal(json.dumps({element.key: element.value})), **kw)
+    return f"{column} @> CAST({document} AS JSONB)"
+
+
 def get_image_by_filename(db: Session, filename: str) -> Optional[ImageMetadataModel]:
     """Get image metadata by filename"""
     return db.query(ImageMetadataModel).filter(ImageMetadataModel.filename == filename).first()
 
 
-def get_filtered_images(
-    db: Session,
+def _apply_filters(
+    query,
     source: Optional[str] = None,
     copyright: Optional[str] = None,
     dataset_release: Optional[str] = None,
@@ -37,28 +335,189 @@ def get_filtered_images(
     data_processing_stages: Optional[str] = None,
     coordinates: Optional[str] = None,
     is_public: Optional[bool] = None,
-    skip: int = 0,
-    limit: int = 100
-) -> List[ImageMetadataModel]:
-    """Get filtered image metadata entries, ordered by upload date descending"""
-    query = db.query(ImageMetadataModel)
+    header: Optional[Tuple[Tuple[str, Any], ...]] = None,
+):
+    """
+    Narrow a query on ImageMetadataModel with the metadata filters shared by listing and search.
 
+    `header` holds (KEYWORD, value) pairs that must all match cards of the FITS header.
+    """
     if source:
-        query = query.filter(ImageMetadataModel.source.ilike(f"%{source}%"))
+        query = query.filter(_contains(ImageMetadataModel.source, source))
     if copyright:
-        query = query.filter(ImageMetadataModel.copyright.ilike(f"%{copyright}%"))
+        query = query.filter(_contains(ImageMetadataModel.copyright, copyright))
     if dataset_release:
-        query = query.filter(ImageMetadataModel.dataset_release.ilike(f"%{dataset_release}%"))
+        query = query.filter(_contains(ImageMetadataModel.dataset_release, dataset_release))
     if description:
-        query = query.filter(ImageMetadataModel.description.ilike(f"%{description}%"))
+        query = query.filter(_contains(ImageMetadataModel.description, description))
     if data_processing_stages:
-        query = query.filter(ImageMetadataModel.data_processing_stages.ilike(f"%{data_processing_stages}%"))
+        query = query.filter(_contains(ImageMetadataModel.data_processing_stages, data_processing_stages))
     if coordinates:
-        query = query.filter(ImageMetadataModel.coordinates.ilike(f"%{coordinates}%"))
+        query = query.filter(_contains(ImageMetadataModel.coordinates, coordinates))
     if is_public is not None:
         query = query.filter(ImageMetadataModel.is_public == is_public)
+    for key, value in header or ():
+        query = query.filter(HeaderMatch(ImageMetadataModel.fits_header, key, value))
+    return query
+
+
+def build_listing_query(entities, after: Optional[Tuple[datetime, int]] = None, **filters):
+    """Build the newest-first listing SELECT of `entities`, narrowed by filters and keyset position"""
+    query = _apply_filters(select(*entities), **filters)
+    if after is not None:
+        query = query.filter(
+            tuple_(ImageMetadataModel.upload_date, ImageMetadataModel.id) < tuple_(*after)
+        )
+    return query.order_by(desc(ImageMetadataModel.upload_date), desc(ImageMetadataModel.id))
+
+
+def get_filtered_images(
+    db: Session,
+    source: Optional[str] = None,
+    copyright: Optional[str] = None,
+    dataset_release: Optional[str] = None,
+    description: Optional[str] = None,
+    data_processing_stages: Optional[str] = None,
+    coordinates: Optional[str] = None,
+    is_public: Optional[bool] = None,
+    header: Optional[Tuple[Tuple[str, Any], ...]] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None
+) -> List[ImageMetadataModel]:
+    """
+    Get filtered image metadata entries, ordered by upload date descending.
+
+    `after` is an (upload_date, id) keyset position: only rows strictly older than it are returned,
+    so deep pages are an index range scan instead of an OFFSET over every skipped row.
+    """
+    query = build_listing_query(
+        (ImageMetadataModel,),
+        after=after,
+        source=source,
+        copyright=copyright,
+        dataset_release=dataset_release,
+        description=description,
+        data_processing_stages=data_processing_stages,
+        coordinates=coordinates,
+        is_public=is_public,
+        header=header,
+    )
+    return db.execute(query.offset(skip).limit(limit)).scalars().all()
+
+
+def get_filtered_image_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    **filters
+) -> list:
+    """Same as get_filtered_images, but returns lightweight LISTING_COLUMNS rows instead of ORM objects"""
+    query = build_listing_query(LISTING_COLUMNS, after=after, **filters)
+    return db.execute(query.offset(skip).limit(limit)).all()
+
+
+def iter_filtered_image_rows(
+    db: Session,
+    batch_size: int = 1000,
+    **filters
+) -> Iterator:
+    """
+    Stream LISTING_COLUMNS rows of every image matching the filters, newest first.
+
+    Rows are fetched `batch_size` at a time through a server-side cursor (yield_per); being a
+    column projection, nothing accumulates in the session, so whole-catalog exports use flat memory.
+    """
+    query = build_listing_query(LISTING_COLUMNS, **filters)
+    yield from db.execute(query.execution_options(yield_per=batch_size))
+
+
+def search_images(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 100,
+    **filters
+) -> List[ImageMetadataModel]:
+    """
+    Free-text search across all metadata fields, best match first.
+
+    Every word of `q` must prefix-match a word in at least one field; the usual metadata
+    filters can be passed as keyword arguments to narrow the results further.
+    """
+    tokens = search.tokenize(q)
+    if not tokens:
+        return []
+
+    join_target, condition, rank = search.search_condition_and_rank(db, tokens)
+    query = db.query(ImageMetadataModel)
+    if join_target is not None:
+        query = query.join(join_target, join_target.c.rowid == ImageMetadataModel.id)
+    query = _apply_filters(query.filter(condition), **filters)
+
+    return query.order_by(rank, desc(ImageMetadataModel.id)).offset(skip).limit(limit).all()
 
-    return query.order_by(desc(ImageMetadataModel.upload_date)).offset(skip).limit(limit).all()
+
+def build_cone_query(entities, ra: float, dec: float, radius: float, **filters):
+    """
+    SELECT the candidates of a cone search: images in the RA/Dec box around the cone.
+
+    Each declination band gets its own (sky_cell = band AND ra BETWEEN ...) condition, so the
+    (sky_cell, ra) index is read as a handful of short ranges whatever the catalog size.
+    """
+    cells, (dec_min, dec_max), intervals = sky.cone_bounds(ra, dec, radius)
+    ra_condition = or_(*(ImageMetadataModel.ra.between(low, high) for low, high in intervals))
+    query = select(*entities).filter(
+        or_(*(and_(ImageMetadataModel.sky_cell == cell, ra_condition) for cell in cells)),
+        ImageMetadataModel.dec.between(dec_min, dec_max),
+    )
+    return _apply_filters(query, **filters)
+
+
+def nearest_in_cone(candidates: list, ra: float, dec: float, radius: float, limit: int) -> List[Tuple[int, float]]:
+    """
+    (id, distance in degrees) of the `limit` candidates nearest to (ra, dec) inside the cone.
+
+    `candidates` are (id, ra, dec) rows of build_cone_query(CONE_CANDIDATE_COLUMNS): distances
+    are computed in one vectorized pass, and only the `limit` nearest are sorted (ties by id).
+    """
+    if not candidates:
+        return []
+    table = np.array(candidates, dtype=float)
+    ids, distances = table[:, 0], sky.angular_distance(ra, dec, table[:, 1], table[:, 2])
+    inside = np.flatnonzero(distances <= radius)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    nearest = inside[np.lexsort((ids[inside], distances[inside]))]
+    return [(int(ids[index]), float(distances[index])) for index in nearest]
+
+
+def listing_rows_query(ids: List[int]):
+    """SELECT the LISTING_COLUMNS rows of the given image ids (in no particular order)"""
+    return select(*LISTING_COLUMNS).filter(ImageMetadataModel.id.in_(ids))
+
+
+def attach_cone_rows(nearest: List[Tuple[int, float]], rows: list) -> List[Tuple[Any, float]]:
+    """Pair the rows of listing_rows_query with the distances of nearest_in_cone, nearest first"""
+    by_id = {row.id: row for row in rows}
+    return [(by_id[image_id], distance) for image_id, distance in nearest if image_id in by_id]
+
+
+def cone_search(db: Session, ra: float, dec: float, radius: float, limit: int = 100, **filters) -> List[Tuple[Any, float]]:
+    """
+    LISTING_COLUMNS rows of the images within `radius` degrees of (ra, dec), with their distance, nearest first.
+
+    The band prune only reads (id, ra, dec), so a wide cone over a large catalog never loads
+    descriptions of rows that will be dropped; the full columns are fetched for the `limit`
+    nearest only.
+    """
+    candidates = db.execute(build_cone_query(CONE_CANDIDATE_COLUMNS, ra, dec, radius, **filters)).all()
+    nearest = nearest_in_cone(candidates, ra, dec, radius, limit)
+    if not nearest:
+        return []
+    rows = db.execute(listing_rows_query([image_id for image_id, _ in nearest])).all()
+    return attach_cone_rows(nearest, rows)
 
 
 def get_all_images(db: Session, skip: int = 0, limit: int = 100) -> List[ImageMetadataModel]:
@@ -83,17 +542,68 @@ def update_image_metadata(db: Session, filename: str, metadata: ImageMetadataCre
         db_image.description = metadata.description
         db_image.data_processing_stages = metadata.data_processing_stages
         db_image.coordinates = metadata.coordinates
+        for column, value in sky_position(metadata.coordinates).items():
+            setattr(db_image, column, value)
         db_image.is_public = metadata.is_public
+        db.flush()
+        search.index_image(db, db_image)
         db.commit()
+        catalog_cache.bump()
         db.refresh(db_image)
     return db_image
 
 
-def delete_image_metadata(db: Session, filename: str) -> bool:
-    """Delete image metadata entry from the database"""
+def set_has_derivatives(db: Session, filenames: List[str], has_derivatives: bool = True) -> int:
+    """Record that the derivatives of these images were (re)generated; returns the number of rows updated"""
+    result = db.execute(
+        update(ImageMetadataModel)
+        .where(ImageMetadataModel.filename.in_(filenames))
+        .values(has_derivatives=has_derivatives)
+    )
+    db.commit()
+    catalog_cache.bump()
+    return result.rowcount
+
+
+def delete_image_row(db: Session, filename: str) -> Tuple[bool, Optional[str]]:
+    """
+    Database half of delete_image_metadata: delete the row and drop its blob reference.
+
+    Returns (deleted, hash of the blob freed by this deletion or None).
+    """
     db_image = get_image_by_filename(db, filename)
-    if db_image:
-        db.delete(db_image)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+    if not db_image:
+        return False, None
+    sha256 = db_image.sha256
+    search.remove_image(db, db_image.id)
+    db.delete(db_image)
+    db.flush()
+    freed = sha256 is not None and _release_blob(db, sha256)
+    db.commit()
+    catalog_cache.bump()
+    return True, sha256 if freed else None
+
+
+def remove_image_files(filename: str, freed_sha256: Optional[str] = None) -> None:
+    """
+    File half of delete_image_metadata (blocking): remove the upload, its derivatives and tiles,
+    the blob freed by the deletion, and their copies on a remote storage backend.
+    """
+    storage.remove_file(filename)
+    derivatives.remove_derivatives(filename)
+    tiles.remove_pyramid(filename)
+    if freed_sha256 is not None:
+        storage.remove_blob(freed_sha256)
+    object_storage.unpublish(filename, freed_sha256)
+
+
+def delete_image_metadata(db: Session, filename: str) -> bool:
+    """
+    Delete image metadata entry from the database, along with its file.
+
+    The blob behind the file is only freed when this was its last reference.
+    """
+    deleted, freed_sha256 = delete_image_row(db, filename)
+    if deleted:
+        remove_image_files(filename, freed_sha256)
+    return deleted
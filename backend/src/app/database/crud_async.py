@@ -0,0 +1,150 @@
+"""
+Async counterparts of the crud functions, for routes running on an AsyncSession.
+
+Reads execute the same statements as crud natively on the async connection. Writes run the
+sync crud functions through AsyncSession.run_sync, so search indexing and cache invalidation
+have a single implementation while every round trip still awaits the async driver.
+
+run_sync executes on the event loop thread, so it only gets database work: the file steps of
+a write (blob store moves and links, removals, remote storage calls) go through
+run_in_threadpool, between the database steps of the same transaction.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud
+from .models import ImageMetadata as ImageMetadataModel
+from ..models.schemas import ImageMetadataCreate
+from ..services.storage import StreamingFileWriter
+
+
+async def create_image_metadata(db: AsyncSession, filename: str, metadata: ImageMetadataCreate) -> ImageMetadataModel:
+    """Create a new image metadata entry in the database"""
+    return await db.run_sync(crud.create_image_metadata, filename, metadata)
+
+
+async def create_image_from_upload(
+    db: AsyncSession,
+    writer: StreamingFileWriter,
+    metadata: ImageMetadataCreate,
+    has_derivatives: bool = False,
+    fits_header: Optional[Dict[str, Any]] = None
+) -> ImageMetadataModel:
+    """Store a finished upload in the blob store and create its metadata entry"""
+    new_blobs = await db.run_sync(crud.acquire_upload_blob, writer)
+    linked = await run_in_threadpool(crud.link_uploads, [writer], new_blobs)
+    try:
+        return await db.run_sync(
+            crud.create_image_metadata,
+            writer.filename,
+            metadata,
+            sha256=writer.sha256,
+            has_derivatives=has_derivatives,
+            fits_header=fits_header,
+        )
+    except Exception:
+        await db.rollback()
+        await run_in_threadpool(crud.remove_files, linked)
+        raise
+
+
+async def create_images_from_uploads(db: AsyncSession, uploads: List[crud.PendingUpload]) -> List[ImageMetadataModel]:
+    """Store many finished uploads and create their metadata rows in one transaction"""
+    images, new_blobs = await db.run_sync(crud.insert_uploads, uploads)
+    try:
+        linked = await run_in_threadpool(crud.link_uploads, [upload.writer for upload in uploads], new_blobs)
+    except Exception:
+        await db.rollback()
+        raise
+    try:
+        await db.run_sync(crud.commit_uploads)
+    except Exception:
+        await run_in_threadpool(crud.remove_files, linked)
+        raise
+    return images
+
+
+async def get_image_by_filename(db: AsyncSession, filename: str) -> Optional[ImageMetadataModel]:
+    """Get image metadata by filename"""
+    result = await db.execute(select(ImageMetadataModel).filter(ImageMetadataModel.filename == filename))
+    return result.scalars().first()
+
+
+async def get_media_row(db: AsyncSession, filenames: List[str]):
+    """(filename, is_public, sha256) of the first image stored under one of `filenames`, None when there is none"""
+    if not filenames:
+        return None
+    result = await db.execute(
+        select(ImageMetadataModel.filename, ImageMetadataModel.is_public, ImageMetadataModel.sha256)
+        .filter(ImageMetadataModel.filename.in_(filenames))
+        .limit(1)
+    )
+    return result.first()
+
+
+async def get_filtered_images(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    **filters
+) -> List[ImageMetadataModel]:
+    """Get filtered image metadata entries, ordered by upload date descending"""
+    query = crud.build_listing_query((ImageMetadataModel,), after=after, **filters)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_filtered_image_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    **filters
+) -> list:
+    """Same as get_filtered_images, but returns lightweight LISTING_COLUMNS rows"""
+    query = crud.build_listing_query(crud.LISTING_COLUMNS, after=after, **filters)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.all()
+
+
+async def stream_filtered_image_rows(db: AsyncSession, batch_size: int = 1000, **filters) -> AsyncIterator:
+    """Stream LISTING_COLUMNS rows of every matching image through a server-side cursor"""
+    query = crud.build_listing_query(crud.LISTING_COLUMNS, **filters)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for row in result:
+        yield row
+
+
+async def cone_search(
+    db: AsyncSession, ra: float, dec: float, radius: float, limit: int = 100, **filters
+) -> List[Tuple[Any, float]]:
+    """Images within `radius` degrees of (ra, dec), as (LISTING_COLUMNS row, distance), nearest first"""
+    result = await db.execute(crud.build_cone_query(crud.CONE_CANDIDATE_COLUMNS, ra, dec, radius, **filters))
+    nearest = crud.nearest_in_cone(result.all(), ra, dec, radius, limit)
+    if not nearest:
+        return []
+    result = await db.execute(crud.listing_rows_query([image_id for image_id, _ in nearest]))
+    return crud.attach_cone_rows(nearest, result.all())
+
+
+async def search_images(db: AsyncSession, q: str, skip: int = 0, limit: int = 100, **filters) -> List[ImageMetadataModel]:
+    """Free-text search across all metadata fields, best match first"""
+    return await db.run_sync(crud.search_images, q, skip, limit, **filters)
+
+
+async def update_image_metadata(db: AsyncSession, filename: str, metadata: ImageMetadataCreate) -> Optional[ImageMetadataModel]:
+    """Update existing image metadata entry in the database"""
+    return await db.run_sync(crud.update_image_metadata, filename, metadata)
+
+
+async def delete_image_metadata(db: AsyncSession, filename: str) -> bool:
+    """Delete image metadata entry from the database, along with its files"""
+    deleted, freed_sha256 = await db.run_sync(crud.delete_image_row, filename)
+    if deleted:
+        await run_in_threadpool(crud.remove_image_files, filename, freed_sha256)
+    return deleted
@@ -1,20 +1,112 @@
 import os
+from typing import Optional
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Async drivers used for each backend when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Connections opened by prewarm_pool() at startup, so the first requests do not pay for the connect
+POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "5"))
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in environment variables")
+Base = declarative_base()
 
-engine = create_engine(DATABASE_URL, echo=False)  # echo=False in prod
+# Engines are created on first use (or by the app lifespan), never at import: importing the
+# models, crud or the app does not need DATABASE_URL nor touch the database.
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[sessionmaker] = None
+_async_session_factory: Optional[async_sessionmaker] = None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+def get_database_url() -> str:
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise ValueError("DATABASE_URL not found in environment variables")
+    return url
+
+
+def to_async_url(url: str) -> str:
+    """Translate a sync database URL (postgresql://, sqlite://) to its asyncio driver"""
+    parsed = make_url(url)
+    if parsed.get_dialect().is_async:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def get_engine() -> Engine:
+    """Sync engine (scripts, migrations tooling, get_db), created on first call"""
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine(get_database_url(), echo=False)  # echo=False in prod
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine of the API routes, so database round trips never block the event loop; created on first call"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        _async_engine = create_async_engine(to_async_url(get_database_url()), echo=False)
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def SessionLocal() -> Session:
+    """New sync session on the lazily created engine"""
+    get_engine()
+    return _session_factory()
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """New async session on the lazily created engine"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def prewarm_pool(connections: int = POOL_PREWARM) -> None:
+    """Open `connections` pooled connections at once and return them to the async engine's pool"""
+    engine = get_async_engine()
+    opened = []
+    try:
+        for _ in range(max(0, connections)):
+            conn = await engine.connect()
+            opened.append(conn)
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            await conn.close()
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection; the engines are recreated on next use"""
+    global _engine, _async_engine, _session_factory, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = _async_engine = _session_factory = _async_session_factory = None
+
+
+def __getattr__(name: str):
+    # `engine` and `async_engine` used to be module globals; keep them importable, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "DATABASE_URL":
+        return get_database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def get_db():
     """Dependency to obtain a session DB"""
@@ -22,4 +114,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """Dependency to obtain an async session DB"""
+    async with AsyncSessionLocal() as db:
+        yield db
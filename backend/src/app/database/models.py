@@ -1,12 +1,68 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, false, Column, String, Boolean, DateTime, Float, ForeignKey, Integer, Index, JSON, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from .database import Base
 
+# Text columns filtered with substring matches in crud.get_filtered_images
+TRIGRAM_INDEXED_COLUMNS = (
+    "source",
+    "copyright",
+    "dataset_release",
+    "description",
+    "data_processing_stages",
+    "coordinates",
+)
+
+
+def _utcnow() -> datetime:
+    """Client-side upload timestamp, so keyset cursors compare exactly on every backend"""
+    return datetime.now(timezone.utc)
+
+
+class ImageBlob(Base):
+    """SQLAlchemy model for the content-addressed blob store: one row per distinct file content."""
+
+    __tablename__ = "image_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    mime = Column(String(100), nullable=False)
+    # Number of image_metadata rows sharing this content; the blob is freed when it drops to 0
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ImageBlob(sha256='{self.sha256}', ref_count={self.ref_count})>"
+
 
 class ImageMetadata(Base):
     """SQLAlchemy model for image metadata."""
     
     __tablename__ = "image_metadata"
+    __table_args__ = (
+        # Backs the (upload_date DESC, id DESC) keyset pagination of the listing
+        Index("ix_image_metadata_upload_date_id", "upload_date", "id"),
+        # Cone search: one (sky_cell, ra) range scan per declination band (see services.sky)
+        Index("ix_image_metadata_sky_cell_ra", "sky_cell", "ra"),
+        # pg_trgm GIN indexes let PostgreSQL answer ILIKE '%term%' without a sequential scan
+        *(
+            Index(
+                f"ix_image_metadata_{column}_trgm",
+                column,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            ).ddl_if(dialect="postgresql")
+            for column in TRIGRAM_INDEXED_COLUMNS
+        ),
+        # Serves the header=KEY=VALUE containment filters (fits_header @> '{...}')
+        Index(
+            "ix_image_metadata_fits_header",
+            "fits_header",
+            postgresql_using="gin",
+            postgresql_ops={"fits_header": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -17,10 +73,27 @@ class ImageMetadata(Base):
     description = Column(String(2000), nullable=False)
     data_processing_stages = Column(String(500), nullable=False)
     coordinates = Column(String(100), nullable=False)
+    # Position parsed from `coordinates` in degrees, and its declination band; NULL for tile names
+    ra = Column(Float, nullable=True)
+    dec = Column(Float, nullable=True)
+    sky_cell = Column(Integer, nullable=True)
     is_public = Column(Boolean, default=False, nullable=False)
+    # Content hash of the file; NULL for uploads stored before the blob store existed
+    sha256 = Column(String(64), ForeignKey("image_blobs.sha256", name="fk_image_metadata_sha256_image_blobs"), nullable=True, index=True)
+    # WebP thumbnails and previews have been rendered next to the file (see services.derivatives)
+    has_derivatives = Column(Boolean, default=False, server_default=false(), nullable=False)
+    # Primary header cards of FITS uploads, as {KEYWORD: value}; NULL for other formats
+    fits_header = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     
-    upload_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    upload_date = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def __repr__(self):
-        return f"<ImageMetadata(filename='{self.filename}', source='{self.source}')>"
\ No newline at end of file
+        return f"<ImageMetadata(filename='{self.filename}', source='{self.source}')>"
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
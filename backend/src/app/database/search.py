@@ -0,0 +1,141 @@
+"""
+Full-text search index over image metadata.
+
+PostgreSQL keeps a weighted `tsvector` column on image_metadata with a GIN index; SQLite keeps
+an FTS5 virtual table keyed by the image id. Both are maintained row by row by the crud
+write functions (index_image / remove_image) rather than rebuilt.
+"""
+import re
+from typing import List
+
+from sqlalchemy import DDL, Column, Integer, MetaData, String, Table, event, func, literal_column, text
+from sqlalchemy.orm import Session
+
+from .models import ImageMetadata as ImageMetadataModel
+
+FTS_TABLE = "image_metadata_fts"
+
+# (column, PostgreSQL setweight class, SQLite bm25 weight) in ranking order of importance
+SEARCH_FIELDS = (
+    ("source", "A", 10.0),
+    ("dataset_release", "A", 10.0),
+    ("data_processing_stages", "B", 4.0),
+    ("coordinates", "B", 4.0),
+    ("description", "C", 1.0),
+    ("copyright", "D", 0.5),
+)
+
+SEARCH_VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+    for column, weight, _ in SEARCH_FIELDS
+)
+
+# Describes the SQLite FTS5 table for query building only; it is created by the DDL below
+fts_table = Table(
+    FTS_TABLE,
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    *(Column(column, String) for column, _, _ in SEARCH_FIELDS),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> List[str]:
+    """Split a user query into lowercase word tokens, dropping any search syntax characters"""
+    return [token.lower() for token in _TOKEN_RE.findall(query)]
+
+
+def _postgres_tsquery(tokens: List[str]) -> str:
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def _sqlite_match(tokens: List[str]) -> str:
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_condition_and_rank(db: Session, tokens: List[str]):
+    """
+    Return (join target or None, WHERE clause, ORDER BY expression) matching all tokens.
+
+    Every token must match (as a prefix) in at least one indexed field, and the ordering
+    expression sorts the best match first.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        vector = literal_column(f"{ImageMetadataModel.__tablename__}.search_vector")
+        tsquery = func.to_tsquery("simple", _postgres_tsquery(tokens))
+        return None, vector.op("@@")(tsquery), func.ts_rank_cd(vector, tsquery).desc()
+
+    fts = literal_column(FTS_TABLE)
+    weights = [weight for _, _, weight in SEARCH_FIELDS]
+    # bm25() is lower-is-better, so ascending order puts the best match first
+    return fts_table, fts.op("MATCH")(_sqlite_match(tokens)), func.bm25(fts, *weights).asc()
+
+
+def index_image(db: Session, image: ImageMetadataModel) -> None:
+    """(Re)index one image row; must run after the row has been flushed and has an id"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text(f"UPDATE image_metadata SET search_vector = {SEARCH_VECTOR_SQL} WHERE id = :id"),
+            {"id": image.id},
+        )
+        return
+
+    remove_image(db, image.id)
+    db.execute(
+        fts_table.insert().values(
+            rowid=image.id,
+            **{column: getattr(image, column) for column, _, _ in SEARCH_FIELDS},
+        )
+    )
+
+
+def index_images(db: Session, images: List[ImageMetadataModel]) -> None:
+    """Index freshly inserted image rows in one statement (they must not be indexed yet)"""
+    if not images:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text(f"UPDATE image_metadata SET search_vector = {SEARCH_VECTOR_SQL} WHERE id = ANY(:ids)"),
+            {"ids": [image.id for image in images]},
+        )
+        return
+
+    db.execute(
+        fts_table.insert(),
+        [
+            {"rowid": image.id, **{column: getattr(image, column) for column, _, _ in SEARCH_FIELDS}}
+            for image in images
+        ],
+    )
+
+
+def remove_image(db: Session, image_id: int) -> None:
+    """Drop one image from the index; PostgreSQL needs nothing since the vector lives on the row"""
+    if db.get_bind().dialect.name != "postgresql":
+        db.execute(fts_table.delete().where(fts_table.c.rowid == image_id))
+
+
+_fts_columns = ", ".join(column for column, _, _ in SEARCH_FIELDS)
+event.listen(
+    ImageMetadataModel.__table__,
+    "after_create",
+    DDL(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_fts_columns})").execute_if(dialect="sqlite"),
+)
+event.listen(
+    ImageMetadataModel.__table__,
+    "after_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
+event.listen(
+    ImageMetadataModel.__table__,
+    "after_create",
+    DDL("ALTER TABLE image_metadata ADD COLUMN IF NOT EXISTS search_vector tsvector").execute_if(dialect="postgresql"),
+)
+event.listen(
+    ImageMetadataModel.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_image_metadata_search_vector ON image_metadata USING gin (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
@@ -1,41 +1,87 @@
+import logging
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy.exc import SQLAlchemyError
 from .api.routes_upload import router as upload_router
 from .api.routes_images import router as images_router
-from .database.database import engine, Base
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.errors import RateLimitExceeded
+from .api.routes_admin import router as admin_router
+from .api.routes_media import router as media_router
+from .database.database import dispose_engines, get_async_engine, prewarm_pool
+from .services import metrics, slow_queries
+from .services.derivatives import shutdown_executor
+from .services.admission import UploadAdmissionMiddleware
+from .services.rate_limit import RateLimitMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create and pre-warm the database pool before the first request, release everything on shutdown.
+
+    The schema is managed by Alembic (`alembic upgrade head`), not created here.
+    """
+    engine = get_async_engine()
+    metrics.instrument_engine(engine.sync_engine, "async")
+    slow_queries.instrument_engine(engine.sync_engine, "async")
+    try:
+        await prewarm_pool()
+    except (SQLAlchemyError, OSError) as e:
+        # Serve anyway: connections are retried on demand once the database is reachable
+        logger.warning("Database pool pre-warming failed: %s", e)
+    try:
+        yield
+    finally:
+        shutdown_executor()
+        await dispose_engines()
+
+
+def create_app() -> FastAPI:
+    """Build the API; cheap and side-effect free, the database is only touched by the lifespan"""
+    app = FastAPI(title="Prepix API", lifespan=lifespan)
+
+    # Bounded upload concurrency and bytes in flight, so ingest spikes get 503s instead of
+    # starving reads; inside the rate limiter, which turns away abusive clients first
+    if os.environ.get("UPLOAD_ADMISSION_ENABLED", "1") == "1":
+        app.add_middleware(UploadAdmissionMiddleware)
 
+    # Per-client token buckets shared by the worker processes; off by default under tests
+    testing = os.environ.get("TESTING") == "1"
+    if os.environ.get("RATE_LIMIT_ENABLED", "0" if testing else "1") == "1":
+        app.add_middleware(RateLimitMiddleware)
 
-Base.metadata.create_all(bind=engine)
+    # Wraps the rate limiter, so 429 responses are timed too
+    app.add_middleware(metrics.MetricsMiddleware)
 
-TESTING = os.environ.get("TESTING") == "1"
-if TESTING:
-    limiter = Limiter(key_func=lambda: "test")
-else:
-    limiter = Limiter(key_func=get_remote_address, default_limits=["20/minute"])
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
+    )
 
-app = FastAPI(title="Prepix API")
+    app.include_router(upload_router, tags=["upload"])
+    app.include_router(images_router, tags=["images"])
+    app.include_router(media_router, tags=["media"])
+    app.include_router(admin_router, tags=["admin"])
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+    @app.get("/")
+    def read_root():
+        return {"message": "Prepix API is running"}
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        """Prometheus scrape endpoint (kept off the public nginx location)"""
+        return Response(content=metrics.render_latest(), media_type=CONTENT_TYPE_LATEST)
 
-app.include_router(upload_router, tags=["upload"])
-app.include_router(images_router, tags=["images"])
+    return app
 
 
-@app.get("/")
-def read_root():
-    return {"message": "Prepix API is running"}
\ No newline at end of file
+app = create_app()
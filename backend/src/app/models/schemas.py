@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field, field_validator, ValidationError, ConfigD
 from fastapi import HTTPException
 from fastapi import Form
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 
 class ImageMetadata(BaseModel):
@@ -83,16 +84,66 @@ class ImageMetadataCreate(BaseModel):
         coordinates: str = Form(...),
         isPublic: str = Form(...)
     ):
+        return cls.from_form_fields(
+            source=source,
+            copyright=copyright,
+            datasetRelease=datasetRelease,
+            description=description,
+            dataProcessingStages=dataProcessingStages,
+            coordinates=coordinates,
+            isPublic=isPublic
+        )
+
+    @classmethod
+    def upload_form(
+        cls,
+        source: str = Form(...),
+        copyright: str = Form(...),
+        datasetRelease: str = Form(...),
+        description: str = Form(...),
+        dataProcessingStages: str = Form(...),
+        coordinates: str = Form("", description="Filled in from the WCS keywords of FITS files when left empty"),
+        isPublic: str = Form(...)
+    ) -> dict:
+        """Raw upload form fields, validated with from_form_fields once the file has been read"""
+        return dict(
+            source=source,
+            copyright=copyright,
+            datasetRelease=datasetRelease,
+            description=description,
+            dataProcessingStages=dataProcessingStages,
+            coordinates=coordinates,
+            isPublic=isPublic
+        )
+
+    @classmethod
+    def batch_form(
+        cls,
+        source: Optional[str] = Form(None),
+        copyright: Optional[str] = Form(None),
+        datasetRelease: Optional[str] = Form(None),
+        description: Optional[str] = Form(None),
+        dataProcessingStages: Optional[str] = Form(None),
+        coordinates: Optional[str] = Form(None),
+        isPublic: Optional[str] = Form(None)
+    ) -> dict:
+        """Metadata fields shared by every file of a batch upload; unset fields are left out"""
+        fields = dict(
+            source=source,
+            copyright=copyright,
+            datasetRelease=datasetRelease,
+            description=description,
+            dataProcessingStages=dataProcessingStages,
+            coordinates=coordinates,
+            isPublic=isPublic
+        )
+        return {name: value for name, value in fields.items() if value is not None}
+
+    @classmethod
+    def from_form_fields(cls, **fields):
+        """Validate camelCase form fields, reporting errors as a 422 like the form endpoints"""
         try:
-            return cls(
-                source=source,
-                copyright=copyright,
-                datasetRelease=datasetRelease,
-                description=description,
-                dataProcessingStages=dataProcessingStages,
-                coordinates=coordinates,
-                isPublic=isPublic
-            )
+            return cls(**fields)
         except ValidationError as e:
             error_list = [{"loc": error["loc"], "msg": error["msg"]} for error in e.errors()]
             raise HTTPException(status_code=422, detail=error_list)
@@ -101,4 +152,41 @@ class ImageMetadataCreate(BaseModel):
 
 class ImageMetadataResponse(ImageMetadata):
     """Schema for image metadata response, inheriting from ImageMetadata"""
-    pass
\ No newline at end of file
+
+    url: Optional[str] = Field(
+        None, description="URL of the file; for private images null, or signed and short-lived with X-Admin-Token"
+    )
+    thumbnails: Optional[Dict[str, str]] = Field(
+        None, description="WebP thumbnail URLs keyed by width in pixels (null until rendered, or for videos), signed like `url`"
+    )
+    previews: Optional[Dict[str, str]] = Field(
+        None, description="WebP medium preview URLs keyed by width in pixels (null until rendered, or for videos)"
+    )
+    ra: Optional[float] = Field(None, description="Right ascension in degrees parsed from coordinates (null for tile names)")
+    dec: Optional[float] = Field(None, description="Declination in degrees parsed from coordinates (null for tile names)")
+
+
+class ConeSearchResult(ImageMetadataResponse):
+    """Image found by a cone search, with its distance to the cone center"""
+
+    distance: float = Field(..., description="Angular distance to the cone center in degrees")
+
+class BatchUploadItem(BaseModel):
+    """Outcome of one file of a batch upload"""
+
+    index: int = Field(..., description="Position of the file in the request")
+    original_filename: Optional[str] = Field(None, alias="originalFilename")
+    status: int = Field(..., description="HTTP status this file would have got from /upload (201 when stored)")
+    detail: Optional[Any] = Field(None, description="Error detail, as in the /upload error responses")
+    image: Optional[ImageMetadataResponse] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class BatchUploadResponse(BaseModel):
+    """Per-file results of a batch upload, in request order"""
+
+    atomic: bool
+    created: int
+    failed: int
+    results: List[BatchUploadItem]
@@ -0,0 +1,201 @@
+"""
+Admission control for the upload routes.
+
+Every upload holds a threadpool thread (write_upload, hashing, MIME sniffing), a spooled or
+partially written file and, later, a derivative job. Left unbounded, a burst of large video
+uploads takes every thread and the disk, and GET /images queues behind them. Upload requests
+therefore pass through the UploadAdmissionController before their body is read:
+
+  - at most UPLOAD_MAX_CONCURRENT of them run at once;
+  - the bytes they announce (Content-Length, or MAX_FILE_SIZE when unknown) stay within
+    UPLOAD_MAX_INFLIGHT_MB, and an upload is never admitted when it would leave less than
+    UPLOAD_MIN_FREE_MB of free space on the upload volume;
+  - up to UPLOAD_QUEUE_SIZE more wait, first come first served, for UPLOAD_QUEUE_TIMEOUT seconds.
+
+Anything beyond is answered 503 with a Retry-After right away, before the body is received.
+The limits are per process (one uvicorn worker per container); queue depth, admitted work and
+rejections are exported as prepix_upload_admission_* metrics.
+"""
+import asyncio
+import json
+import os
+import shutil
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from .storage import MAX_FILE_SIZE, get_upload_dir
+
+UPLOAD_PATH_PREFIX = "/upload"
+
+MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "4"))
+MAX_INFLIGHT_BYTES = int(os.getenv("UPLOAD_MAX_INFLIGHT_MB", "512")) * 1024 * 1024
+MIN_FREE_BYTES = int(os.getenv("UPLOAD_MIN_FREE_MB", "1024")) * 1024 * 1024
+QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "8"))
+QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "2"))
+RETRY_AFTER = int(os.getenv("UPLOAD_RETRY_AFTER", "5"))
+
+ADMISSION_ACTIVE = Gauge("prepix_upload_admission_active", "Uploads admitted and being served")
+ADMISSION_INFLIGHT_BYTES = Gauge("prepix_upload_admission_inflight_bytes", "Bytes announced by the admitted uploads")
+ADMISSION_QUEUE_DEPTH = Gauge("prepix_upload_admission_queue_depth", "Uploads waiting for admission")
+ADMISSION_REJECTIONS = Counter(
+    "prepix_upload_admission_rejections_total",
+    "Uploads answered 503 by the admission controller",
+    ["reason"],
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upload cannot be admitted; `reason` is one of queue_full, timeout, disk_full"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def upload_cost(headers) -> int:
+    """Bytes an upload request may bring in: its Content-Length, else the largest file accepted"""
+    for name, value in headers:
+        if name == b"content-length":
+            try:
+                return max(0, int(value))
+            except ValueError:
+                break
+    return MAX_FILE_SIZE
+
+
+def free_disk_bytes(path: Optional[str] = None) -> int:
+    """Free space of the upload volume; unlimited when the directory does not exist yet"""
+    try:
+        return shutil.disk_usage(path or get_upload_dir()).free
+    except OSError:
+        return 1 << 62
+
+
+class UploadAdmissionController:
+    """
+    Bounded concurrency and bytes in flight, with a short FIFO wait queue in front.
+
+    Waiters are served in arrival order: a large upload at the head of the queue is not
+    overtaken by smaller ones forever. A single upload larger than the whole byte budget is
+    charged the budget, so it still runs once it is alone.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT,
+        max_inflight_bytes: int = MAX_INFLIGHT_BYTES,
+        queue_size: int = QUEUE_SIZE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        min_free_bytes: int = MIN_FREE_BYTES,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_inflight_bytes = max_inflight_bytes
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.min_free_bytes = min_free_bytes
+        self.active = 0
+        self.inflight_bytes = 0
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _fits(self, cost: int) -> bool:
+        return self.active < self.max_concurrent and self.inflight_bytes + cost <= self.max_inflight_bytes
+
+    def _admit(self, cost: int) -> None:
+        self.active += 1
+        self.inflight_bytes += cost
+        self._publish()
+
+    def _publish(self) -> None:
+        ADMISSION_ACTIVE.set(self.active)
+        ADMISSION_INFLIGHT_BYTES.set(self.inflight_bytes)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return AdmissionRejected(reason)
+
+    async def acquire(self, cost: int) -> int:
+        """Wait for admission of an upload of `cost` bytes; returns the charged cost to release()"""
+        if free_disk_bytes() - self.inflight_bytes - cost < self.min_free_bytes:
+            raise self._reject("disk_full")
+        cost = min(cost, self.max_inflight_bytes)
+        if not self._waiters and self._fits(cost):
+            self._admit(cost)
+            return cost
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, cost)
+        self._waiters.append(entry)
+        self._publish()
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued; give the slot back if it had just been granted
+            if waiter.done():
+                self.release(cost)
+            else:
+                self._waiters.remove(entry)
+                self._publish()
+            raise
+        if waiter.done():
+            return cost
+        self._waiters.remove(entry)
+        self._publish()
+        raise self._reject("timeout")
+
+    def release(self, cost: int) -> None:
+        """End of an admitted upload: hand its room to the waiters at the head of the queue"""
+        self.active -= 1
+        self.inflight_bytes -= cost
+        while self._waiters and self._fits(self._waiters[0][1]):
+            waiter, waiter_cost = self._waiters.popleft()
+            self._admit(waiter_cost)
+            waiter.set_result(None)
+        self._publish()
+
+
+class UploadAdmissionMiddleware:
+    """Pure ASGI middleware running POST /upload* requests through an UploadAdmissionController"""
+
+    def __init__(self, app, controller: Optional[UploadAdmissionController] = None, retry_after: int = RETRY_AFTER):
+        self.app = app
+        self.controller = controller if controller is not None else UploadAdmissionController()
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(UPLOAD_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            cost = await self.controller.acquire(upload_cost(scope.get("headers", ())))
+        except AdmissionRejected as e:
+            await self._unavailable(send, e.reason)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(cost)
+
+    async def _unavailable(self, send, reason: str) -> None:
+        body = json.dumps({"detail": f"Upload capacity exhausted ({reason}), retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+                # The body was not read: do not let the client keep sending it on this connection
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
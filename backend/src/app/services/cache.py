@@ -0,0 +1,219 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TILE_CACHE_BYTES = int(os.getenv("TILE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+GENERATION = struct.Struct("<QQ")  # epoch (0 = not initialized yet), write generation
+
+
+class MemoryGeneration:
+    """Write generation of this process only: for a single worker, or as a test stand-in"""
+
+    def __init__(self):
+        self.epoch = secrets.randbits(32)
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def increment(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class SharedGeneration:
+    """
+    Write generation in a memory-mapped file, shared by every process mapping the same path.
+
+    Like the rate limiter buckets, it lives under /dev/shm by default, so a write handled by any
+    uvicorn worker of the host (or by a CLI such as the metadata import) changes the ETags of
+    all of them. The first process to map the file draws the epoch, which keeps ETags from
+    colliding with those of a previous incarnation of the file. Reads are a single aligned 8-byte
+    load; increments are serialized with flock (across processes) and a thread lock (within one).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        with self._locked():
+            if os.fstat(self._fd).st_size < GENERATION.size:
+                os.ftruncate(self._fd, GENERATION.size)
+            self._map = mmap.mmap(self._fd, GENERATION.size)
+            epoch, generation = GENERATION.unpack_from(self._map)
+            if epoch == 0:
+                epoch = secrets.randbits(32) or 1
+                GENERATION.pack_into(self._map, 0, epoch, generation)
+        self.epoch = epoch
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    @property
+    def value(self) -> int:
+        return GENERATION.unpack_from(self._map)[1]
+
+    def increment(self) -> int:
+        with self._locked():
+            epoch, generation = GENERATION.unpack_from(self._map)
+            GENERATION.pack_into(self._map, 0, epoch, generation + 1)
+            return generation + 1
+
+
+def default_generation_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "prepix-catalog-generation")
+
+
+def create_generation():
+    """Generation selected by CATALOG_CACHE_STORE: "shared" (default) or "memory" """
+    if os.getenv("CATALOG_CACHE_STORE", "shared") == "memory":
+        return MemoryGeneration()
+    return SharedGeneration(os.getenv("CATALOG_CACHE_SHM_PATH") or default_generation_path())
+
+
+class CatalogCache:
+    """
+    Write-generation cache for catalog listings.
+
+    Every write to image metadata bumps the generation, which changes every ETag and drops every
+    cached body at once. Reads derive a strong ETag from (generation, normalized query) without
+    touching the database, and serialized bodies are kept in a bounded LRU.
+
+    The generation is shared by the workers of the host (SharedGeneration, see
+    create_generation), so a write handled by one worker invalidates the ETags of all of them.
+    The bodies stay in the LRU of each process, keyed by generation: entries of an older
+    generation can no longer be hit and are dropped as soon as a newer one is seen.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, generation_store=None):
+        self.max_entries = max_entries
+        self._store = generation_store
+        self._seen = 0
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[bytes, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        # Opened on first use, so importing the module touches no file
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_generation()
+        return self._store
+
+    @property
+    def generation(self) -> int:
+        return self.store.value
+
+    def _forget_older(self, generation: int) -> None:
+        # Called with the lock held
+        if generation > self._seen:
+            self._seen = generation
+            self._entries.clear()
+
+    def bump(self) -> int:
+        """Invalidate every ETag and cached body; called after each committed catalog write"""
+        generation = self.store.increment()
+        with self._lock:
+            self._forget_older(generation)
+        return generation
+
+    def etag(self, generation: int, key: Hashable) -> str:
+        """Strong ETag for a normalized query key at a given generation"""
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+        return f'"{self.store.epoch:08x}-{generation}-{digest}"'
+
+    def get(self, generation: int, key: Hashable) -> Optional[Tuple[bytes, dict]]:
+        with self._lock:
+            self._forget_older(generation)
+            entry = self._entries.get((generation, key))
+            if entry is not None:
+                self._entries.move_to_end((generation, key))
+            return entry
+
+    def put(self, generation: int, key: Hashable, body: bytes, headers: dict) -> None:
+        """Cache a serialized body, unless the catalog changed while it was being built"""
+        if generation != self.store.value:
+            return
+        with self._lock:
+            self._forget_older(generation)
+            self._entries[(generation, key)] = (body, headers)
+            self._entries.move_to_end((generation, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class TileCache:
+    """
+    Byte-bounded LRU of hot image tiles, shared by every request of the process.
+
+    Panning clients fetch the same few tiles around the viewport over and over; keeping them
+    in memory saves a disk read per tile. Tiles never change for a given filename, so entries
+    only leave on eviction or when the image is deleted.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, int, int, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int, int, int]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple[str, int, int, int], body: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, filename: str) -> None:
+        """Drop every tile of an image"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == filename]:
+                self.size -= len(self._entries.pop(key))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+catalog_cache = CatalogCache()
+tile_cache = TileCache()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+from . import fits
+from .storage import get_upload_dir, get_upload_path, sharded_path
+
+logger = logging.getLogger(__name__)
+
+# Gallery cards and srcset candidates
+THUMBNAIL_WIDTHS = (160, 320)
+# Expanded view and srcset candidates
+PREVIEW_WIDTHS = (800, 1600)
+
+WEBP_QUALITY = 80
+
+# Formats Pillow can decode, plus FITS through services.fits; videos keep being served as originals only
+DERIVATIVE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', *fits.FITS_EXTENSIONS}
+
+# Euclid mosaics go well beyond Pillow's default decompression bomb limit (89M pixels)
+MAX_SOURCE_PIXELS = 400_000_000
+
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+
+UPLOAD_URL_PREFIX = os.getenv("UPLOAD_URL_PREFIX", "/uploads")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def supports_derivatives(filename: str) -> bool:
+    """Whether thumbnails and previews can be generated for this stored filename"""
+    return Path(filename).suffix.lower() in DERIVATIVE_EXTENSIONS
+
+
+def derivative_filename(filename: str, kind: str, width: int) -> str:
+    """Name of a derivative, stored next to its original: <stem>.<kind>-<width>.webp"""
+    return f"{Path(filename).stem}.{kind}-{width}.webp"
+
+
+def _targets() -> List[tuple]:
+    """Every (width, kind) to render, largest first"""
+    targets = [(width, "thumb") for width in THUMBNAIL_WIDTHS] + [(width, "preview") for width in PREVIEW_WIDTHS]
+    return sorted(targets, reverse=True)
+
+
+def derivative_filenames(filename: str) -> List[str]:
+    """Names of every derivative of a stored filename"""
+    return [derivative_filename(filename, kind, width) for width, kind in _targets()]
+
+
+def derivative_urls(filename: str) -> Dict[str, Dict[str, str]]:
+    """Public URLs of the derivatives of a stored filename, as {"thumbnails": {width: url}, "previews": {...}}"""
+    return {
+        "thumbnails": {
+            str(width): f"{UPLOAD_URL_PREFIX}/{derivative_filename(filename, 'thumb', width)}"
+            for width in THUMBNAIL_WIDTHS
+        },
+        "previews": {
+            str(width): f"{UPLOAD_URL_PREFIX}/{derivative_filename(filename, 'preview', width)}"
+            for width in PREVIEW_WIDTHS
+        },
+    }
+
+
+def render_derivatives(source_path: str, upload_dir: str, filename: str) -> None:
+    """
+    Render every derivative of an image. Runs in a worker process.
+
+    The source is decoded once (JPEGs directly at reduced scale through draft mode), then
+    downscaled step by step from the largest width to the smallest, each step starting from the
+    previous result. Sources narrower than a width are written at their own size, so every
+    derivative name exists once rendering succeeds. Files are written under a temporary name
+    and renamed, so a half-written WebP is never served.
+
+    FITS files are rendered by services.fits instead: an asinh/zscale stretch of the
+    memory-mapped data, block-averaged down to the largest width.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    targets = _targets()
+    largest = targets[0][0]
+
+    if fits.is_fits(filename):
+        image = fits.render_preview(source_path, largest)
+    else:
+        with Image.open(source_path) as source:
+            source.draft("RGB", (largest, max(1, source.height * largest // source.width)))
+            image = ImageOps.exif_transpose(source)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+    for width, kind in targets:
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        output = sharded_path(upload_dir, derivative_filename(filename, kind, width))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp = output.with_name(f".{output.name}.tmp")
+        image.save(temp, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(temp, output)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by the API and the backfill command, created on first use.
+
+    Decoding and resizing are CPU-bound and hold the GIL, so they run in separate processes
+    rather than in the threadpool that serves blocking I/O for the API. Workers are spawned
+    (not forked) so they never inherit the event loop or open database connections.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=DERIVATIVE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the worker processes, if they were started"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def remove_derivatives(filename: str) -> None:
+    """Delete every derivative of a stored filename"""
+    for name in derivative_filenames(filename):
+        get_upload_path(name).unlink(missing_ok=True)
+
+
+async def generate_derivatives(source_path: str, filename: str) -> bool:
+    """
+    Render the derivatives of an upload on the process pool without blocking the event loop.
+
+    `source_path` is where the content can be read right now (it may still be a temporary
+    file); results are named after `filename`. Returns False, leaving nothing behind, when the
+    format is not supported or the image cannot be decoded: the original is still served.
+    """
+    if not supports_derivatives(filename):
+        return False
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(get_executor(), render_derivatives, str(source_path), get_upload_dir(), filename)
+    except Exception:
+        logger.warning("Could not render derivatives of %s", filename, exc_info=True)
+        remove_derivatives(filename)
+        return False
+    return True
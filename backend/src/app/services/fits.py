@@ -0,0 +1,362 @@
+"""
+Minimal FITS reader for ingestion: header cards, memory-mapped image data and display stretches.
+
+Only what Prepix needs is implemented: the first HDU holding a 2-D (or cube) image is located
+by walking the headers, and its data is accessed through np.memmap, so an HDU is never read
+into RAM as a whole: statistics come from a sparse sample, and rendering walks the rows strip by strip.
+"""
+import math
+import re
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+FITS_EXTENSIONS = {'.fits', '.fit', '.fts'}
+
+# Cards that describe the file layout or are free text rather than searchable metadata
+_SKIPPED_KEYWORDS = {"", "COMMENT", "HISTORY", "END", "CONTINUE"}
+
+_BITPIX_DTYPES = {8: ">u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+# Pixels sampled to estimate zscale limits
+ZSCALE_SAMPLES = 10_000
+# Softening of the asinh stretch: smaller values lift faint structure more
+ASINH_SOFTENING = 0.1
+
+_INTEGER = re.compile(r"^[+-]?\d+$")
+_FLOAT = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([EeDd][+-]?\d+)?$")
+# PCi_j matrix keywords; a bare "PC" prefix would also match PCOUNT, present in every extension
+_PC_KEYWORD = re.compile(r"PC\d+_\d+")
+
+
+class FitsError(ValueError):
+    """Raised when a file cannot be read as a FITS image"""
+
+
+@dataclass
+class FitsImage:
+    """Header and data layout of the image HDU of a FITS file"""
+
+    header: Dict[str, Any]
+    data_offset: int
+    # Numpy order: (..., NAXIS2, NAXIS1)
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def width(self) -> int:
+        return self.shape[-1]
+
+    @property
+    def height(self) -> int:
+        return self.shape[-2]
+
+
+def is_fits(filename: str) -> bool:
+    """Whether a stored filename is a FITS file"""
+    return any(filename.lower().endswith(ext) for ext in FITS_EXTENSIONS)
+
+
+def parse_value(text: str) -> Any:
+    """Convert the value field of a card (or a query string) to str, bool, int or float"""
+    text = text.strip()
+    if text.startswith("'"):
+        end = text.rfind("'")
+        return text[1:end if end > 0 else None].replace("''", "'").rstrip()
+    if text in ("T", "F"):
+        return text == "T"
+    if _INTEGER.match(text):
+        return int(text)
+    if _FLOAT.match(text):
+        return float(text.replace("D", "E").replace("d", "e"))
+    return text
+
+
+def _split_card(card: str) -> Tuple[str, Optional[str]]:
+    """Split an 80-character card into its keyword and raw value field (None for commentary cards)"""
+    if card.startswith("HIERARCH ") and "=" in card:
+        keyword, _, rest = card[9:].partition("=")
+        return keyword.strip().upper(), rest
+    keyword = card[:8].strip().upper()
+    if card[8:10] != "= ":
+        return keyword, None
+    return keyword, card[10:]
+
+
+def _strip_comment(field: str) -> str:
+    """Drop the '/ comment' part of a value field, ignoring slashes inside quoted strings"""
+    in_string = False
+    for index, char in enumerate(field):
+        if char == "'":
+            in_string = not in_string
+        elif char == "/" and not in_string:
+            return field[:index]
+    return field
+
+
+def _read_header(f) -> Optional[Dict[str, Any]]:
+    """Read one header from the current position, up to its END card and block padding"""
+    header: Dict[str, Any] = {}
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            return None if not header else header
+        if len(block) < BLOCK_SIZE:
+            raise FitsError("Truncated FITS header")
+        text = block.decode("ascii", errors="replace")
+        for start in range(0, BLOCK_SIZE, CARD_SIZE):
+            keyword, field = _split_card(text[start:start + CARD_SIZE])
+            if keyword == "END":
+                return header
+            if field is None or keyword in _SKIPPED_KEYWORDS or keyword in header:
+                continue
+            header[keyword] = parse_value(_strip_comment(field))
+
+
+def _data_size(header: Dict[str, Any]) -> int:
+    """Bytes of data following a header, padding included"""
+    naxis = int(header.get("NAXIS", 0))
+    if naxis == 0:
+        return 0
+    count = 1
+    for axis in range(1, naxis + 1):
+        count *= int(header.get(f"NAXIS{axis}", 0))
+    size = abs(int(header["BITPIX"])) // 8 * int(header.get("GCOUNT", 1)) * (int(header.get("PCOUNT", 0)) + count)
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+def read_image(path: str) -> FitsImage:
+    """
+    Locate the first HDU holding an image: the primary HDU, or the first IMAGE extension
+    when the primary one has no data (the usual layout of pipeline products).
+    """
+    with open(path, "rb") as f:
+        first = f.read(CARD_SIZE)
+        if not first.startswith(b"SIMPLE  ="):
+            raise FitsError("Not a FITS file")
+        f.seek(0)
+
+        primary: Optional[Dict[str, Any]] = None
+        while True:
+            offset_before = f.tell()
+            header = _read_header(f)
+            if header is None:
+                raise FitsError("No image HDU found in FITS file")
+            if primary is None:
+                primary = header
+            data_offset = f.tell()
+
+            is_image = "SIMPLE" in header or header.get("XTENSION") == "IMAGE"
+            naxis = int(header.get("NAXIS", 0))
+            if is_image and naxis >= 2 and "BITPIX" in header:
+                bitpix = int(header["BITPIX"])
+                if bitpix not in _BITPIX_DTYPES:
+                    raise FitsError(f"Unsupported BITPIX: {bitpix}")
+                shape = tuple(int(header[f"NAXIS{axis}"]) for axis in range(naxis, 0, -1))
+                if header is not primary:
+                    # Extension headers inherit the primary keywords (OBJECT, TELESCOP, ...)
+                    header = {**primary, **header}
+                return FitsImage(header=header, data_offset=data_offset, shape=shape, dtype=_BITPIX_DTYPES[bitpix])
+
+            f.seek(data_offset + _data_size(header))
+            if f.tell() <= offset_before:
+                raise FitsError("Malformed FITS file")
+
+
+def open_data(path: str, image: FitsImage) -> np.ndarray:
+    """Memory-map the image as a (NAXIS2, NAXIS1) array; cubes are reduced to their first plane"""
+    data = np.memmap(path, dtype=image.dtype, mode="r", offset=image.data_offset, shape=image.shape)
+    while data.ndim > 2:
+        data = data[0]
+    return data
+
+
+def _physical(raw: np.ndarray, header: Dict[str, Any]) -> np.ndarray:
+    """Apply BLANK, BSCALE and BZERO to raw samples, as float32 with NaN for missing pixels"""
+    values = raw.astype(np.float32)
+    if "BLANK" in header and raw.dtype.kind in "iu":
+        values[raw == header["BLANK"]] = np.nan
+    bscale, bzero = header.get("BSCALE", 1), header.get("BZERO", 0)
+    if bscale != 1:
+        values *= bscale
+    if bzero != 0:
+        values += bzero
+    return values
+
+
+def sample(data: np.ndarray, header: Dict[str, Any], count: int = ZSCALE_SAMPLES) -> np.ndarray:
+    """Finite pixel values on a regular grid: only the sampled rows are paged in from the memmap"""
+    side = max(1, int(math.sqrt(count)))
+    rows = np.unique(np.linspace(0, data.shape[0] - 1, min(side, data.shape[0])).astype(int))
+    columns = np.unique(np.linspace(0, data.shape[1] - 1, min(side, data.shape[1])).astype(int))
+    values = _physical(data[rows][:, columns], header).ravel()
+    return values[np.isfinite(values)]
+
+
+def zscale(samples: np.ndarray, contrast: float = 0.25, max_reject: float = 0.5, krej: float = 2.5, max_iterations: int = 5) -> Tuple[float, float]:
+    """
+    IRAF zscale display limits: fit a line to the sorted samples with iterative sigma
+    rejection, and spread its slope (divided by `contrast`) around the median.
+    """
+    if samples.size == 0:
+        return 0.0, 1.0
+    samples = np.sort(samples)
+    count = samples.size
+    vmin, vmax = float(samples[0]), float(samples[-1])
+    center = count // 2
+    median = float(samples[center]) if count % 2 else float((samples[center - 1] + samples[center]) / 2)
+
+    min_pixels = max(5, int(count * max_reject))
+    grow = max(1, int(count * 0.01))
+    x = np.arange(count)
+    good = np.ones(count, dtype=bool)
+    slope = 0.0
+    for _ in range(max_iterations):
+        if good.sum() < min_pixels:
+            break
+        slope, intercept = np.polyfit(x[good], samples[good], 1)
+        residuals = samples - (slope * x + intercept)
+        sigma = residuals[good].std()
+        rejected = np.abs(residuals) > krej * sigma
+        # Also reject the neighbours of rejected samples
+        rejected = np.convolve(rejected, np.ones(2 * grow + 1), mode="same") > 0
+        if (~rejected).sum() == good.sum():
+            break
+        good = ~rejected
+
+    if good.sum() < min_pixels:
+        return vmin, vmax
+    slope /= contrast
+    return max(vmin, median - (center - 1) * slope), min(vmax, median + (count - center) * slope)
+
+
+def asinh_stretch(values: np.ndarray, limits: Tuple[float, float], softening: float = ASINH_SOFTENING) -> np.ndarray:
+    """Map physical values to 8-bit display levels: clip to the limits, then an asinh curve"""
+    low, high = limits
+    scaled = (values - low) / (high - low if high > low else 1.0)
+    np.clip(scaled, 0.0, 1.0, out=scaled)
+    np.nan_to_num(scaled, copy=False, nan=0.0)
+    stretched = np.arcsinh(scaled / softening) / np.arcsinh(1.0 / softening)
+    return (stretched * 255 + 0.5).astype(np.uint8)
+
+
+def iter_display_strips(path: str, strip_height: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+    """
+    Stretched 8-bit rows of a FITS image, top to bottom, `strip_height` rows at a time.
+
+    Returns (width, height, strips) like tiles.open_strips. FITS images are stored bottom row
+    first, so the memmap is walked backwards; zscale limits come from a sparse sample first.
+    """
+    image = read_image(path)
+    data = open_data(path, image)
+    limits = zscale(sample(data, image.header))
+    height = data.shape[0]
+
+    def strips() -> Iterator[np.ndarray]:
+        for top in range(0, height, strip_height):
+            rows = data[max(0, height - top - strip_height):height - top][::-1]
+            yield asinh_stretch(_physical(rows, image.header), limits)[..., np.newaxis]
+
+    return data.shape[1], height, strips()
+
+
+def render_preview(path: str, max_width: int) -> Image.Image:
+    """
+    Render a stretched grayscale preview at most `max_width` pixels wide.
+
+    Rows are read in bands of `factor` rows and block-averaged on the fly, so memory holds one
+    band of the source plus the reduced preview.
+    """
+    image = read_image(path)
+    data = open_data(path, image)
+    limits = zscale(sample(data, image.header))
+    height, width = data.shape
+    factor = max(1, -(-width // max_width))
+    out_width = width // factor
+
+    reduced = []
+    for top in range(0, height - factor + 1, factor):
+        band = _physical(data[top:top + factor, :out_width * factor], image.header)
+        with warnings.catch_warnings():
+            # Blocks made only of blank pixels average to NaN, drawn black by the stretch
+            warnings.simplefilter("ignore", RuntimeWarning)
+            blocks = np.nanmean(band.reshape(factor, out_width, factor), axis=(0, 2)) if factor > 1 else band[0]
+        reduced.append(blocks)
+    if not reduced:
+        raise FitsError("Image too small to preview")
+    return Image.fromarray(asinh_stretch(np.stack(reduced)[::-1], limits), mode="L")
+
+
+def _sexagesimal(value: float, hours: bool) -> str:
+    sign = "-" if value < 0 else "+"
+    value = abs(value) / 15 if hours else abs(value)
+    whole = int(value)
+    minutes = int((value - whole) * 60)
+    seconds = ((value - whole) * 60 - minutes) * 60
+    if round(seconds, 1) >= 60:
+        seconds, minutes = 0.0, minutes + 1
+    if minutes >= 60:
+        minutes, whole = 0, whole + 1
+    if hours:
+        return f"{whole % 24:02d}h{minutes:02d}m{seconds:04.1f}s"
+    return f"{sign}{whole:02d}°{minutes:02d}'{seconds:04.1f}\""
+
+
+def wcs_center(header: Dict[str, Any], width: int, height: int) -> Optional[Tuple[float, float]]:
+    """
+    (RA, Dec) in degrees of the image center from the celestial WCS keywords, or None.
+
+    Gnomonic (TAN) projections are inverted exactly; other projections fall back to a linear
+    approximation around CRVAL, which is close enough to label an image.
+    """
+    ctype1, ctype2 = str(header.get("CTYPE1", "")), str(header.get("CTYPE2", ""))
+    if not (ctype1.startswith("RA") and ctype2.startswith("DEC")):
+        return None
+    try:
+        ra0, dec0 = float(header["CRVAL1"]), float(header["CRVAL2"])
+        dx = (width + 1) / 2 - float(header.get("CRPIX1", (width + 1) / 2))
+        dy = (height + 1) / 2 - float(header.get("CRPIX2", (height + 1) / 2))
+        if "CD1_1" in header:
+            cd = np.array([[header.get("CD1_1", 0.0), header.get("CD1_2", 0.0)],
+                           [header.get("CD2_1", 0.0), header.get("CD2_2", 0.0)]], dtype=float)
+        else:
+            cdelt1, cdelt2 = float(header.get("CDELT1", 1.0)), float(header.get("CDELT2", 1.0))
+            if "CROTA2" in header and not any(_PC_KEYWORD.fullmatch(key) for key in header):
+                # Calabretta & Greisen (2002), eq. 189: the rotation mixes in the *other* axis' scale
+                angle = math.radians(float(header["CROTA2"]))
+                cd = np.array([[cdelt1 * math.cos(angle), -cdelt2 * math.sin(angle)],
+                               [cdelt1 * math.sin(angle), cdelt2 * math.cos(angle)]])
+            else:
+                pc = np.array([[header.get("PC1_1", 1.0), header.get("PC1_2", 0.0)],
+                               [header.get("PC2_1", 0.0), header.get("PC2_2", 1.0)]], dtype=float)
+                cd = np.diag([cdelt1, cdelt2]) @ pc
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    xi, eta = np.radians(cd @ np.array([dx, dy]))
+    if ctype1.endswith("-TAN"):
+        ra0_rad, dec0_rad = math.radians(ra0), math.radians(dec0)
+        denominator = math.cos(dec0_rad) - eta * math.sin(dec0_rad)
+        ra = ra0_rad + math.atan2(xi, denominator)
+        dec = math.atan2(math.sin(dec0_rad) + eta * math.cos(dec0_rad), math.hypot(xi, denominator))
+        return math.degrees(ra) % 360, math.degrees(dec)
+    cos_dec = math.cos(math.radians(dec0)) or 1.0
+    return (ra0 + math.degrees(xi) / cos_dec) % 360, max(-90.0, min(90.0, dec0 + math.degrees(eta)))
+
+
+def format_coordinates(ra: float, dec: float) -> str:
+    """Format a position like the coordinates typed in the upload form"""
+    return f"RA: {_sexagesimal(ra, hours=True)}, DEC: {_sexagesimal(dec, hours=False)}"
+
+
+def describe(path: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Header of the image HDU, and the coordinates of its center when it has a celestial WCS"""
+    image = read_image(path)
+    center = wcs_center(image.header, image.width, image.height)
+    return image.header, format_coordinates(*center) if center else None
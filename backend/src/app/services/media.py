@@ -0,0 +1,128 @@
+"""
+Access control and delivery of the uploaded files (originals and their WebP derivatives).
+
+nginx no longer serves the upload directory as is: /uploads/<name> is proxied to GET /media/<name>,
+which looks up the visibility of the image on the unique filename index and then either
+
+  - hands the transfer back to nginx with an X-Accel-Redirect to an `internal` location aliasing
+    the upload directory (MEDIA_ACCEL_PREFIX), so the bytes still go out through sendfile with
+    nginx's Range and conditional request handling; or
+  - without MEDIA_ACCEL_PREFIX (development, tests), streams the file itself with a
+    FileResponse, which answers Range requests too, so videos can be seeked.
+
+Public images are readable by anyone. Private ones need the X-Admin-Token header or a
+short-lived signed URL (`?expires=<unix time>&signature=<hmac>`, see sign_media_path), keyed with
+SECRET_KEY; anything else gets the same 404 as a missing file. Signed URLs are only issued to
+admins: by /admin/media/{name}/signed-url, and in listings requested with the admin token
+(sign_url, listing_expiry), whose private rows otherwise come without file URLs.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import time
+from typing import List, Optional
+from urllib.parse import quote, unquote
+
+from .derivatives import DERIVATIVE_EXTENSIONS, UPLOAD_URL_PREFIX
+from .storage import ALLOWED_EXTENSIONS
+
+# Internal nginx location aliasing the upload directory, e.g. "/_media/"; empty to serve from Python
+ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "")
+
+SIGNED_URL_TTL = int(os.getenv("MEDIA_SIGNED_URL_TTL", "300"))
+MAX_SIGNED_URL_TTL = 24 * 3600
+
+PUBLIC_CACHE_CONTROL = f"public, max-age={int(os.getenv('MEDIA_PUBLIC_MAX_AGE', '3600'))}"
+PRIVATE_CACHE_CONTROL = "private, no-store"
+
+# Stored names are generated (uuid + extension): anything else, e.g. the .blobs directory, is not media
+_MEDIA_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*(\.[A-Za-z0-9_-]+)*$")
+_DERIVATIVE_NAME = re.compile(r"^(?P<stem>.+)\.(thumb|preview)-\d+\.webp$")
+
+
+class InvalidSignatureError(ValueError):
+    """Raised when a signed media URL is malformed, expired or does not match"""
+
+
+def is_media_name(name: str) -> bool:
+    """Whether `name` can be a stored upload or derivative name (no path, no hidden entry)"""
+    return len(name) <= 255 and _MEDIA_NAME.match(name) is not None
+
+
+def candidate_originals(name: str) -> List[str]:
+    """
+    Stored filenames whose visibility governs `name`.
+
+    An original governs itself. A derivative (<stem>.thumb-160.webp) does not record the
+    extension of its original, so every extension derivatives are rendered for is tried: still a
+    single IN lookup on the unique filename index.
+    """
+    match = _DERIVATIVE_NAME.match(name)
+    if match is None:
+        return [name] if os.path.splitext(name)[1].lower() in ALLOWED_EXTENSIONS else []
+    stem = match.group("stem")
+    return [f"{stem}{extension}" for extension in sorted(DERIVATIVE_EXTENSIONS)]
+
+
+def _signing_key() -> bytes:
+    key = os.environ.get("SECRET_KEY")
+    if not key:
+        raise InvalidSignatureError("Signed media URLs need SECRET_KEY")
+    return key.encode()
+
+
+def _signature(name: str, expires: int) -> str:
+    digest = hmac.new(_signing_key(), f"{name}\n{expires}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_media_path(name: str, ttl: int = SIGNED_URL_TTL, now: Optional[float] = None) -> str:
+    """Public path of `name` (under UPLOAD_URL_PREFIX), valid for `ttl` seconds whatever the visibility of the image"""
+    expires = int((time.time() if now is None else now) + ttl)
+    return sign_url(f"{UPLOAD_URL_PREFIX}/{quote(name)}", expires)
+
+
+def sign_url(url: str, expires: int) -> str:
+    """Add a signature valid until `expires` to the public URL of a stored file (`<prefix>/<name>`)"""
+    name = unquote(url.rsplit("/", 1)[-1])
+    return f"{url}?expires={expires}&signature={_signature(name, expires)}"
+
+
+def signing_enabled() -> bool:
+    return bool(os.environ.get("SECRET_KEY"))
+
+
+def listing_window(now: Optional[float] = None) -> int:
+    """Index of the SIGNED_URL_TTL-long period `now` falls in; part of the cache key of listings"""
+    return int((time.time() if now is None else now) // SIGNED_URL_TTL)
+
+
+def listing_expiry(now: Optional[float] = None) -> int:
+    """
+    Expiry of the signed URLs put in listings: the end of the window after the current one.
+
+    Every listing built within a window signs with the same expiry, so a body cached (or
+    revalidated with a 304) for the rest of the window still has URLs valid for at least a TTL.
+    """
+    return (listing_window(now) + 2) * SIGNED_URL_TTL
+
+
+def verify_signature(name: str, expires: Optional[str], signature: Optional[str], now: Optional[float] = None) -> None:
+    """Check the signed URL parameters of a request for `name`; raises InvalidSignatureError"""
+    if not expires or not signature:
+        raise InvalidSignatureError("Missing signature")
+    try:
+        deadline = int(expires)
+    except ValueError:
+        raise InvalidSignatureError("Invalid expiry")
+    if deadline < (time.time() if now is None else now):
+        raise InvalidSignatureError("Signed URL expired")
+    if not hmac.compare_digest(signature, _signature(name, deadline)):
+        raise InvalidSignatureError("Invalid signature")
+
+
+def accel_redirect_path(relative_path: str) -> str:
+    """X-Accel-Redirect target of a stored file, from its path relative to the upload dir"""
+    return f"{ACCEL_PREFIX.rstrip('/')}/{quote(relative_path)}"
@@ -0,0 +1,167 @@
+"""
+Prometheus metrics of the API process, served on /metrics.
+
+Everything here is cheap enough to leave on in production: a request costs one histogram
+observation, a SQL statement two event hooks and one observation, and gauges that depend on
+live state (pool, threadpool) are only read when /metrics is scraped. We run a single uvicorn
+worker per container, so the default in-process registry is complete.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Fast API calls sit in the low milliseconds, uploads with derivatives in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+STATEMENT_TYPES = ("select", "insert", "update", "delete")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "prepix_http_request_duration_seconds",
+    "Time to serve a request, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("prepix_http_requests_in_progress", "Requests being served")
+
+DB_STATEMENT_DURATION = Histogram(
+    "prepix_db_statement_duration_seconds",
+    "Time spent executing SQL statements, by engine and statement type",
+    ["engine", "statement"],
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "prepix_db_pool_checkout_seconds",
+    "Time waited for a pooled database connection",
+    ["engine"],
+    buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge("prepix_db_pool_connections_in_use", "Pooled connections checked out", ["engine"])
+DB_POOL_SIZE = Gauge("prepix_db_pool_size", "Configured pool size", ["engine"])
+
+UPLOAD_BYTES = Counter("prepix_upload_bytes_total", "Upload bytes received and written to storage")
+UPLOAD_STAGE_DURATION = Histogram(
+    "prepix_upload_stage_seconds",
+    "Time spent in each stage of an upload",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+THREADPOOL_BUSY = Gauge("prepix_threadpool_busy_threads", "Worker threads running blocking calls (run_in_threadpool)")
+THREADPOOL_CAPACITY = Gauge("prepix_threadpool_capacity", "Worker threads available to run_in_threadpool")
+THREADPOOL_WAITING = Gauge("prepix_threadpool_queued_tasks", "Blocking calls waiting for a free worker thread")
+
+_engines = {}
+
+
+@contextmanager
+def time_upload_stage(stage: str) -> Iterator[None]:
+    """Record the duration of an upload stage (validate_mime, write_upload, receive_stream, derivatives, publish, store)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        UPLOAD_STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+def _statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return keyword if keyword in STATEMENT_TYPES else "other"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Time every statement and pool checkout of an engine (for an AsyncEngine, pass .sync_engine).
+
+    Statement timings come from the cursor execute events; the checkout wait is measured around
+    Pool.connect(), which is where a session blocks when every pooled connection is in use.
+    """
+    if _engines.get(name) is engine:
+        return
+    _engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("prepix_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("prepix_query_start")
+        if starts:
+            DB_STATEMENT_DURATION.labels(name, _statement_type(statement)).observe(time.perf_counter() - starts.pop())
+
+    pool = engine.pool
+    connect = pool.connect
+    checkout = DB_POOL_CHECKOUT_DURATION.labels(name)
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            checkout.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.labels(name).set_function(pool.checkedout)
+        DB_POOL_SIZE.labels(name).set(pool.size())
+
+
+def _update_threadpool_gauges() -> None:
+    """Read the anyio limiter behind run_in_threadpool; left untouched outside the event loop"""
+    from anyio import to_thread
+
+    try:
+        limiter = to_thread.current_default_thread_limiter()
+    except RuntimeError:
+        return
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_CAPACITY.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+
+
+def render_latest() -> bytes:
+    """Current metrics in the Prometheus text format"""
+    _update_threadpool_gauges()
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request.
+
+    Requests are labelled with the route template (/images/{filename}/tiles/{z}/{x}/{y}), not
+    the raw path, so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
@@ -0,0 +1,256 @@
+"""
+Where uploaded content is kept for serving: the local upload directory or an S3-compatible bucket.
+
+The API always receives, hashes and renders uploads in its local UPLOAD_PATH (derivatives and
+tile pyramids are built from there). A StorageBackend decides where the served copies live:
+
+  - LocalStorageBackend (STORAGE_BACKEND=local, the default): the upload directory itself, in
+    the sharded layout of services.storage; /media answers with X-Accel-Redirect or a
+    FileResponse.
+  - S3StorageBackend (STORAGE_BACKEND=s3): a bucket shared by every API node (AWS S3, MinIO, ...).
+    Blobs and derivatives are published there before the metadata row is committed, large files
+    as multipart uploads whose parts are sent in parallel, and /media redirects to a presigned
+    GET URL, so the bytes never go through the API workers. Needs boto3 (the `s3` extra).
+
+Object keys follow the local layout: `ab/cd/<name>` for derivatives and `.blobs/ab/cd/<sha256>`
+for original contents, which are stored once whatever the number of filenames sharing them.
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from .derivatives import derivative_filenames
+from .storage import BLOB_DIR_NAME, get_upload_dir, get_upload_path, shard_dirs
+
+# S3 limits: parts of at least 5 MiB (except the last one), at most 10000 per upload
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+
+PART_SIZE = int(os.getenv("S3_PART_SIZE_MB", "16")) * 1024 * 1024
+MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+
+_backend: Optional["StorageBackend"] = None
+
+
+def upload_key(name: str) -> str:
+    """Key of an upload or derivative filename"""
+    return "/".join((*shard_dirs(name), name))
+
+
+def blob_key(sha256: str) -> str:
+    """Key of the content-addressed copy of a file"""
+    return "/".join((BLOB_DIR_NAME, *shard_dirs(sha256), sha256))
+
+
+def media_key(name: str, sha256: Optional[str], is_original: bool) -> str:
+    """Key serving `name`: the blob of an original when it has one, the file itself otherwise"""
+    return blob_key(sha256) if is_original and sha256 else upload_key(name)
+
+
+class StorageBackend:
+    """Interface of the stores of served content; keys are `/`-separated relative paths"""
+
+    # Whether the objects are the files of the local upload directory (nothing to publish)
+    local = False
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None) -> None:
+        """Store the content of a local file under `key`, replacing any previous object"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove an object; missing objects are ignored"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires_in: int) -> Optional[str]:
+        """Time-limited URL reading `key` directly from the store, None when it must be served by the API"""
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    """The sharded upload directory (UPLOAD_PATH unless `root` is given)"""
+
+    local = True
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    def path(self, key: str) -> Path:
+        return Path(self._root or get_upload_dir(), *key.split("/"))
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None) -> None:
+        target = self.path(key)
+        if target.exists() and os.path.samefile(source_path, target):
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{target.name}.tmp")
+        try:
+            os.link(source_path, temp)
+        except OSError:
+            with open(source_path, "rb") as src, open(temp, "wb") as dst:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+        os.replace(temp, target)
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    A bucket of an S3-compatible service.
+
+    `client` is a boto3 S3 client (built from S3_ENDPOINT_URL, S3_REGION and the usual AWS_*
+    credentials when omitted). Files up to `part_size` are sent with one PUT; larger ones as a
+    multipart upload whose parts are read from disk and sent by `max_concurrency` threads, so
+    at most that many parts are in memory. A failed multipart upload is aborted, leaving no
+    billed parts behind.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        client=None,
+        prefix: str = "",
+        part_size: int = PART_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max(1, max_concurrency)
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("S3 storage needs boto3: pip install 'euclid-backend[s3]'")
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+                region_name=os.getenv("S3_REGION") or None,
+            )
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None) -> None:
+        size = os.path.getsize(source_path)
+        extra = {"ContentType": content_type} if content_type else {}
+        if size <= self.part_size:
+            with open(source_path, "rb") as f:
+                self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=f, **extra)
+            return
+        self._put_multipart(source_path, key, size, extra)
+
+    def _put_multipart(self, source_path: str, key: str, size: int, extra: dict) -> None:
+        part_size = max(self.part_size, math.ceil(size / MAX_PARTS))
+        count = math.ceil(size / part_size)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self._key(key), **extra)["UploadId"]
+        fd = os.open(source_path, os.O_RDONLY)
+
+        def send(number: int) -> dict:
+            body = os.pread(fd, part_size, (number - 1) * part_size)
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self._key(key), UploadId=upload_id, PartNumber=number, Body=body
+            )
+            return {"ETag": response["ETag"], "PartNumber": number}
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, count)) as pool:
+                parts: List[dict] = list(pool.map(send, range(1, count + 1)))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self._key(key), UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id)
+            raise
+        finally:
+            os.close(fd)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def presigned_url(self, key: str, expires_in: int) -> Optional[str]:
+        # Signed locally with the credentials: no round trip to the store
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._key(key)}, ExpiresIn=expires_in
+        )
+
+
+def create_backend() -> StorageBackend:
+    """Backend selected by STORAGE_BACKEND: "local" (default) or "s3" (with S3_BUCKET)"""
+    kind = os.getenv("STORAGE_BACKEND", "local")
+    if kind == "local":
+        return LocalStorageBackend()
+    if kind == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not bucket:
+            raise ValueError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        return S3StorageBackend(bucket, prefix=os.getenv("S3_PREFIX", ""))
+    raise ValueError(f"Unknown STORAGE_BACKEND {kind!r}, expected 'local' or 's3'")
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend of the process, created on first use"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def set_storage_backend(backend: Optional[StorageBackend]) -> None:
+    """Replace the backend of the process (None: back to STORAGE_BACKEND on next use)"""
+    global _backend
+    _backend = backend
+
+
+def publish_upload(source_path: str, sha256: str, mime: Optional[str], filename: Optional[str] = None) -> None:
+    """
+    Copy a finished upload to a remote backend: its content (skipped when the blob is already
+    there) and, given the stored `filename`, the derivatives rendered for it. Blocking.
+    """
+    backend = get_storage_backend()
+    if backend.local:
+        return
+    if not backend.exists(blob_key(sha256)):
+        backend.put_file(source_path, blob_key(sha256), mime)
+    if filename is not None:
+        for name in derivative_filenames(filename):
+            backend.put_file(str(get_upload_path(name)), upload_key(name), "image/webp")
+
+
+def unpublish(filename: str, sha256: Optional[str] = None) -> None:
+    """Remove the derivatives of `filename`, and the blob `sha256` when given, from a remote backend. Blocking."""
+    backend = get_storage_backend()
+    if backend.local:
+        return
+    for name in derivative_filenames(filename):
+        backend.delete(upload_key(name))
+    if sha256 is not None:
+        backend.delete(blob_key(sha256))
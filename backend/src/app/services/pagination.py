@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor that was not produced by encode_cursor"""
+
+
+def _encode(position: list) -> str:
+    payload = json.dumps(position, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(upload_date: datetime, image_id: int) -> str:
+    """
+    Encode an (upload_date, id) keyset position as an opaque, URL-safe cursor.
+
+    Clients must treat the value as opaque: it is only meant to be sent back as `cursor`.
+    """
+    return _encode([upload_date.isoformat(), image_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor back into its (upload_date, id) position"""
+    try:
+        upload_date, image_id = _decode(cursor)
+        return datetime.fromisoformat(upload_date), int(image_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """
+    Encode a result offset as an opaque cursor.
+
+    Used by relevance-ranked search, whose ordering has no stable keyset to seek on.
+    """
+    return _encode(["offset", offset])
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """Decode a cursor produced by encode_offset_cursor back into its offset"""
+    try:
+        kind, offset = _decode(cursor)
+        if kind != "offset" or int(offset) < 0:
+            raise ValueError(kind)
+        return int(offset)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,268 @@
+"""
+Token-bucket rate limiting shared by every worker process.
+
+Each client gets one bucket per budget: "read" for GET/HEAD requests, "media" for the files
+behind /uploads/ (a gallery page alone loads dozens of thumbnails) and "write" for uploads and
+other modifications, which cost far more to serve. A bucket holds up to `burst` tokens and refills
+at `rate` tokens per second; a request takes one token or is answered 429 with a Retry-After.
+
+Buckets live in a fixed-size hash table in a memory-mapped file (SharedMemoryBucketStore, under
+/dev/shm by default), so all uvicorn workers of a host share them. Taking a token is a hash, at
+most PROBE_LIMIT slot reads and one write under a file lock: constant time whatever the number of
+clients. MemoryBucketStore is the single-process stand-in; any object with the same `take()` can
+replace them (e.g. a Redis-backed store across hosts).
+
+Behind nginx every connection comes from the proxy, so the client address is resolved from
+X-Forwarded-For, trusting only the hops in RATE_LIMIT_TRUSTED_PROXIES. Requests carrying
+`X-RateLimit-Bypass: <RATE_LIMIT_BYPASS_TOKEN>` skip the limits (load tests); without
+RATE_LIMIT_BYPASS_TOKEN the header is ignored.
+"""
+import fcntl
+import hashlib
+import ipaddress
+import json
+import math
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+BYPASS_HEADER = b"x-ratelimit-bypass"
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+
+# Budgets as "<requests>/<second|minute|hour>[ burst <n>]"; the burst defaults to the request count
+DEFAULT_BUDGETS = {
+    "read": os.getenv("RATE_LIMIT_READ", "240/minute"),
+    "write": os.getenv("RATE_LIMIT_WRITE", "20/minute"),
+    "media": os.getenv("RATE_LIMIT_MEDIA", "1200/minute"),
+}
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+EXEMPT_PATHS = {"/metrics"}
+MEDIA_PATH_PREFIX = "/media/"
+
+# The compose network and loopback: nginx reaches the backend from there
+DEFAULT_TRUSTED_PROXIES = "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+
+SLOT = struct.Struct("<Qdd")  # key hash (0 = empty), tokens, last refill (unix time)
+DEFAULT_SLOTS = 1 << 16
+PROBE_LIMIT = 8
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class Budget(NamedTuple):
+    rate: float  # tokens per second
+    burst: float  # bucket capacity
+
+
+def parse_budget(text: str) -> Budget:
+    """`20/minute` or `20/minute burst 5` -> Budget; the burst defaults to the per-period count"""
+    limit, _, burst = text.partition("burst")
+    count, _, period = limit.strip().partition("/")
+    seconds = _PERIODS.get(period.strip().rstrip("s"))
+    if not count.strip() or seconds is None:
+        raise ValueError(f"Invalid rate limit {text!r}, expected e.g. '20/minute'")
+    count = float(count)
+    return Budget(count / seconds, float(burst) if burst.strip() else count)
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+def _refill(tokens: float, updated: float, now: float, budget: Budget) -> float:
+    return min(budget.burst, tokens + max(0.0, now - updated) * budget.rate)
+
+
+def _take(tokens: float, budget: Budget, cost: float) -> Tuple[bool, float, float]:
+    """(allowed, tokens left, seconds until `cost` tokens are available)"""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / budget.rate
+
+
+class MemoryBucketStore:
+    """Buckets in a dict of this process: for a single worker, or as a test stand-in"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, budget: Budget, cost: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take `cost` tokens from the bucket of `key`; returns (allowed, retry after seconds)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (budget.burst, now))
+            allowed, tokens, retry_after = _take(_refill(tokens, updated, now, budget), budget, cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SharedMemoryBucketStore:
+    """
+    Buckets in an open-addressing hash table of a memory-mapped file, shared by every process
+    mapping the same path.
+
+    A zero-filled file is an empty table, so the first worker to start creates it and the others
+    simply map it. Updates are serialized with flock (across processes) and a thread lock (within
+    one). When the PROBE_LIMIT slots of a key all hold other keys, the least recently used of them
+    is recycled: an idle bucket is full again anyway, so only very active clients could lose state.
+    """
+
+    def __init__(self, path: str, slots: int = DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        size = slots * SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def _find_slot(self, key_hash: int) -> int:
+        """Slot holding key_hash, else the first empty one, else the least recently updated"""
+        start = key_hash % self.slots
+        victim, victim_updated = start, math.inf
+        for probe in range(PROBE_LIMIT):
+            index = (start + probe) % self.slots
+            stored, _, updated = SLOT.unpack_from(self._map, index * SLOT.size)
+            if stored == key_hash or stored == 0:
+                return index
+            if updated < victim_updated:
+                victim, victim_updated = index, updated
+        return victim
+
+    def take(self, key: str, budget: Budget, cost: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take `cost` tokens from the bucket of `key`; returns (allowed, retry after seconds)"""
+        now = time.time() if now is None else now
+        key_hash = _key_hash(key)
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                index = self._find_slot(key_hash)
+                stored, tokens, updated = SLOT.unpack_from(self._map, index * SLOT.size)
+                if stored != key_hash:
+                    tokens, updated = budget.burst, now
+                allowed, tokens, retry_after = _take(_refill(tokens, updated, now, budget), budget, cost)
+                SLOT.pack_into(self._map, index * SLOT.size, key_hash, tokens, now)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return allowed, retry_after
+
+
+def default_store_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "prepix-ratelimit")
+
+
+def create_store():
+    """Store selected by RATE_LIMIT_STORE: "shared" (default) or "memory" """
+    if os.getenv("RATE_LIMIT_STORE", "shared") == "memory":
+        return MemoryBucketStore()
+    return SharedMemoryBucketStore(
+        os.getenv("RATE_LIMIT_SHM_PATH") or default_store_path(),
+        int(os.getenv("RATE_LIMIT_SLOTS", str(DEFAULT_SLOTS))),
+    )
+
+
+def parse_networks(text: str) -> tuple:
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in text.split(",") if item.strip())
+
+
+@lru_cache(maxsize=4096)
+def _is_trusted(address: str, networks: tuple) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_address(scope, trusted_proxies: tuple) -> str:
+    """
+    Address of the client behind any trusted proxies.
+
+    X-Forwarded-For is read right to left, since only the entries appended by our own proxies
+    can be trusted: the first address that is not a trusted proxy is the client. A request not
+    coming from a trusted proxy is identified by its peer address, whatever it sends.
+    """
+    peer = scope["client"][0] if scope.get("client") else "unknown"
+    if not _is_trusted(peer, trusted_proxies):
+        return peer
+    forwarded = [
+        value.decode("latin-1") for name, value in scope.get("headers", ()) if name == FORWARDED_FOR_HEADER
+    ]
+    hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    return hops[0] if hops else peer
+
+
+def bypass_requested(scope) -> bool:
+    token = os.environ.get("RATE_LIMIT_BYPASS_TOKEN")
+    if not token:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == BYPASS_HEADER:
+            return secrets.compare_digest(value, token.encode())
+    return False
+
+
+def budget_name(method: str, path: str) -> Optional[str]:
+    """Budget a request draws from, None when it is not limited"""
+    if path in EXEMPT_PATHS:
+        return None
+    if method not in READ_METHODS:
+        return "write"
+    return "media" if path.startswith(MEDIA_PATH_PREFIX) else "read"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 + Retry-After once the client's bucket for the route is empty"""
+
+    def __init__(self, app, store=None, budgets: Optional[Dict[str, str]] = None, trusted_proxies: Optional[str] = None):
+        self.app = app
+        self.store = store if store is not None else create_store()
+        self.budgets = {name: parse_budget(text) for name, text in (budgets or DEFAULT_BUDGETS).items()}
+        self.trusted_proxies = parse_networks(
+            trusted_proxies if trusted_proxies is not None
+            else os.getenv("RATE_LIMIT_TRUSTED_PROXIES", DEFAULT_TRUSTED_PROXIES)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or bypass_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        name = budget_name(scope["method"], scope["path"])
+        budget = self.budgets.get(name)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = self.store.take(f"{name}:{client_address(scope, self.trusted_proxies)}", budget)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": f"Rate limit exceeded ({name} budget)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
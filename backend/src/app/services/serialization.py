@@ -0,0 +1,58 @@
+from typing import Any, Dict, Iterable, Optional
+
+from pydantic_core import to_json
+
+from . import media
+from .derivatives import UPLOAD_URL_PREFIX, derivative_urls
+
+
+def _signed(urls: Optional[Dict[str, str]], expires: int) -> Optional[Dict[str, str]]:
+    return {width: media.sign_url(url, expires) for width, url in urls.items()} if urls else urls
+
+
+def image_to_dict(image: Any, sign_private: bool = False) -> dict:
+    """
+    Convert an image row to its camelCase API representation (the ImageMetadataResponse shape).
+
+    Accepts ORM objects as well as rows from the crud.LISTING_COLUMNS projection. The data comes from
+    our own database, so it is not re-validated through pydantic. /uploads/ answers 404 for the
+    files of private images, so their `url`, `thumbnails` and `previews` are null, unless the
+    caller is authorized (`sign_private`, the admin token): then they are signed URLs (see
+    media.listing_expiry).
+    """
+    urls = derivative_urls(image.filename) if image.has_derivatives else {}
+    url: Optional[str] = f"{UPLOAD_URL_PREFIX}/{image.filename}"
+    thumbnails, previews = urls.get("thumbnails"), urls.get("previews")
+    if not image.is_public:
+        if not sign_private:
+            url = thumbnails = previews = None
+        elif media.signing_enabled():
+            expires = media.listing_expiry()
+            url = media.sign_url(url, expires)
+            thumbnails, previews = _signed(thumbnails, expires), _signed(previews, expires)
+    return {
+        "filename": image.filename,
+        "source": image.source,
+        "copyright": image.copyright,
+        "datasetRelease": image.dataset_release,
+        "description": image.description,
+        "dataProcessingStages": image.data_processing_stages,
+        "coordinates": image.coordinates,
+        "ra": image.ra,
+        "dec": image.dec,
+        "isPublic": image.is_public,
+        "uploadDate": image.upload_date.isoformat(),
+        "url": url,
+        "thumbnails": thumbnails,
+        "previews": previews,
+    }
+
+
+def encode_image(image: Any, sign_private: bool = False) -> bytes:
+    """Encode one image row as camelCase JSON bytes"""
+    return to_json(image_to_dict(image, sign_private))
+
+
+def encode_images(images: Iterable[Any], sign_private: bool = False) -> bytes:
+    """Encode image rows as a camelCase JSON array in one pass"""
+    return to_json([image_to_dict(image, sign_private) for image in images])
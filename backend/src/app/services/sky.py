@@ -0,0 +1,123 @@
+"""
+Sky positions of images: parsing of the free-text `coordinates` field and cone-search geometry.
+
+Positions are indexed with the zones scheme used for SDSS cross-matching: the sky is cut into
+declination bands of ZONE_HEIGHT degrees, and the (sky_cell, ra) index turns a cone into one
+short range scan per band. Candidates are then refined with an exact, vectorized angular distance.
+"""
+import math
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Height of a declination band; a cone of radius r spans about 2r / ZONE_HEIGHT + 1 bands
+ZONE_HEIGHT = 0.5
+ZONE_COUNT = int(180 / ZONE_HEIGHT)
+
+# Largest cone radius served, in degrees
+MAX_CONE_RADIUS = 10.0
+
+_RA_LABEL = re.compile(r"^\s*(?:RA|R\.A\.|ALPHA)\s*[:=]?\s*", re.IGNORECASE)
+_DEC_LABEL = re.compile(r"\b(?:DECL?|DELTA)\b\s*[:=]?\s*", re.IGNORECASE)
+_ANGLE = re.compile(r"^[+\-−]?[\d.\s:hmsd°'\"′″]+$", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+(?:\.\d*)?|\.\d+")
+
+
+def _parse_angle(text: str, is_ra: bool) -> Optional[float]:
+    """
+    Parse one angle in degrees: sexagesimal (10h20m30s, 10:20:30, +45°12'34", 45 12 34)
+    or decimal degrees. RA is read in hours when sexagesimal, in degrees when a single number.
+    """
+    text = text.strip().strip(",;").strip()
+    if not text or not _ANGLE.match(text):
+        return None
+    parts = [float(part) for part in _NUMBER.findall(text)]
+    if not parts or len(parts) > 3 or any(part >= 60 for part in parts[1:]):
+        return None
+
+    value = sum(part / 60 ** index for index, part in enumerate(parts))
+    if text[0] in "-−":
+        value = -value
+    if is_ra:
+        if len(parts) > 1 or "h" in text.lower():
+            value *= 15
+        return value if 0 <= value < 360 else None
+    return value if -90 <= value <= 90 else None
+
+
+def _split_ra_dec(text: str) -> Optional[Tuple[str, str]]:
+    """Split a position into its RA and Dec parts, from labels or separators"""
+    labeled = _DEC_LABEL.search(text)
+    if labeled:
+        return _RA_LABEL.sub("", text[:labeled.start()]), text[labeled.end():]
+    text = _RA_LABEL.sub("", text)
+    if "," in text:
+        parts = text.split(",")
+        return (parts[0], parts[1]) if len(parts) == 2 else None
+    tokens = text.split()
+    if not tokens or len(tokens) % 2:
+        return None
+    half = len(tokens) // 2
+    return " ".join(tokens[:half]), " ".join(tokens[half:])
+
+
+def parse_coordinates(text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    (RA, Dec) in degrees from a `coordinates` field, or None when it is not a position
+    (tile names and other free text are kept as text only).
+
+    Accepts the form used by the upload UI (RA: 00h42m44s, DEC: +41°16'09"), colon or space
+    separated sexagesimal (00:42:44 +41:16:09) and decimal degrees (10.68, 41.27).
+    """
+    if not text:
+        return None
+    parts = _split_ra_dec(text)
+    if parts is None:
+        return None
+    ra, dec = _parse_angle(parts[0], is_ra=True), _parse_angle(parts[1], is_ra=False)
+    if ra is None or dec is None:
+        return None
+    return ra, dec
+
+
+def sky_cell(dec: float) -> int:
+    """Declination band of a position"""
+    return min(int((dec + 90) // ZONE_HEIGHT), ZONE_COUNT - 1)
+
+
+def _ra_half_width(dec: float, radius: float) -> float:
+    """Half-width in RA of the box bounding a cone: it widens towards the poles"""
+    if abs(dec) + radius >= 89.99:
+        return 180.0
+    d, r = math.radians(dec), math.radians(radius)
+    return math.degrees(math.atan(math.sin(r) / math.sqrt(abs(math.cos(d - r) * math.cos(d + r)))))
+
+
+def cone_bounds(ra: float, dec: float, radius: float) -> Tuple[List[int], Tuple[float, float], List[Tuple[float, float]]]:
+    """
+    Index ranges covering a cone: (bands, (dec_min, dec_max), RA intervals).
+
+    The RA box is split in two intervals when it crosses RA = 0.
+    """
+    dec_min, dec_max = max(-90.0, dec - radius), min(90.0, dec + radius)
+    cells = list(range(sky_cell(dec_min), sky_cell(dec_max) + 1))
+    alpha = _ra_half_width(dec, radius)
+    if alpha >= 180:
+        return cells, (dec_min, dec_max), [(0.0, 360.0)]
+    low, high = ra - alpha, ra + alpha
+    if low < 0:
+        intervals = [(0.0, high), (low + 360, 360.0)]
+    elif high >= 360:
+        intervals = [(low, 360.0), (0.0, high - 360)]
+    else:
+        intervals = [(low, high)]
+    return cells, (dec_min, dec_max), intervals
+
+
+def angular_distance(ra: float, dec: float, ras: Iterable[float], decs: Iterable[float]) -> np.ndarray:
+    """Great-circle distances in degrees from (ra, dec) to arrays of positions (haversine, stable at small angles)"""
+    ra1, dec1 = math.radians(ra), math.radians(dec)
+    ra2, dec2 = np.radians(np.asarray(ras, dtype=float)), np.radians(np.asarray(decs, dtype=float))
+    h = np.sin((dec2 - dec1) / 2) ** 2 + math.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0))))
@@ -0,0 +1,238 @@
+"""
+Slow statement log.
+
+Every statement slower than SLOW_QUERY_MS is written, one JSON object per line, to a rotating
+log: its normalized SQL (literals and placeholders replaced by `?`, IN lists collapsed) with a
+fingerprint grouping identical shapes, the shape of its bound parameters (types and sizes, never
+the values) and, for a sampled fraction of slow SELECTs, the query plan. On PostgreSQL the plan
+is `EXPLAIN (ANALYZE, BUFFERS)`, which runs the statement a second time, hence the sampling; on
+SQLite it is `EXPLAIN QUERY PLAN`.
+
+Two filter combinations of get_filtered_images produce different normalized SQL, so the log tells
+which one is slow.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+# Fraction of slow SELECT statements whose plan is captured
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.jsonl")
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Statement prefixes for each backend's plan; EXPLAIN ANALYZE executes the statement, so only
+# SELECTs are ever explained
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+# pyformat (psycopg2), numeric (asyncpg) and qmark (sqlite3) parameters
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+logger = logging.getLogger("prepix.slow_queries")
+logger.propagate = False
+
+_handler_path: Optional[str] = None
+_instrumented = {}
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement text with literals and bind placeholders as `?` and IN lists as `(...)`"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes, bytearray)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Types and lengths of bound parameters, so the log never holds user data"""
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _get_logger() -> logging.Logger:
+    """Logger writing to SLOW_QUERY_LOG, created on first use and moved when the setting changes"""
+    global _handler_path
+    if _handler_path != SLOW_QUERY_LOG:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        _handler_path = SLOW_QUERY_LOG
+    return logger
+
+
+def explain(dbapi_connection, dialect: str, statement: str, parameters: Any) -> Optional[Any]:
+    """
+    Plan of a statement, run on its own cursor so the pending result of the original is untouched.
+
+    On PostgreSQL a failing EXPLAIN would abort the surrounding transaction, so it runs inside a
+    savepoint.
+    """
+    prefix = EXPLAIN_PREFIXES.get(dialect)
+    if prefix is None:
+        return None
+    cursor = dbapi_connection.cursor()
+    try:
+        if dialect == "postgresql":
+            cursor.execute("SAVEPOINT prepix_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT prepix_explain")
+            return {"error": str(e).strip()}
+        if dialect == "postgresql":
+            cursor.execute("RELEASE SAVEPOINT prepix_explain")
+            # One row holding the JSON plan
+            plan = rows[0][0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        return [" ".join(str(value) for value in row) for row in rows]
+    finally:
+        cursor.close()
+
+
+def record(entry: dict) -> None:
+    _get_logger().info(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Log slow statements of an engine (for an AsyncEngine, pass .sync_engine)"""
+    if _instrumented.get(name) is engine:
+        return
+    _instrumented[name] = engine
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("prepix_slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("prepix_slow_query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if duration_ms < SLOW_QUERY_MS:
+            return
+
+        normalized = normalize_sql(statement)
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "engine": name,
+            "duration_ms": round(duration_ms, 3),
+            "fingerprint": fingerprint(normalized),
+            "statement": normalized,
+            "parameters": parameter_shape(parameters, executemany),
+        }
+        is_select = normalized.split(" ", 1)[0].lower() == "select"
+        if not executemany and is_select and random.random() < SLOW_QUERY_EXPLAIN_RATE:
+            try:
+                entry["plan"] = explain(conn.connection.dbapi_connection, dialect, statement, parameters)
+            except Exception as e:
+                entry["plan"] = {"error": str(e).strip()}
+        try:
+            record(entry)
+        except OSError:
+            # The log is diagnostics only: a full disk must not fail the request
+            pass
+
+
+def _log_files() -> List[str]:
+    """Current log file first, then the rotated ones from newest to oldest"""
+    files = [SLOW_QUERY_LOG] + [f"{SLOW_QUERY_LOG}.{index}" for index in range(1, SLOW_QUERY_LOG_BACKUPS + 1)]
+    return [path for path in files if os.path.exists(path)]
+
+
+def read_entries(
+    limit: int = 100,
+    min_duration_ms: Optional[float] = None,
+    fingerprint: Optional[str] = None,
+    engine: Optional[str] = None,
+) -> List[dict]:
+    """Most recent log entries first, optionally filtered"""
+    found = []
+    for path in _log_files():
+        # Each file is capped by the rotation, and only the last `limit` matches are kept
+        matches = deque(maxlen=limit)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if min_duration_ms is not None and entry.get("duration_ms", 0) < min_duration_ms:
+                    continue
+                if fingerprint is not None and entry.get("fingerprint") != fingerprint:
+                    continue
+                if engine is not None and entry.get("engine") != engine:
+                    continue
+                matches.append(entry)
+        found.extend(reversed(matches))
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+
+def summarize(entries: List[dict]) -> List[dict]:
+    """Entries grouped by fingerprint, slowest total time first"""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"],
+            "statement": entry["statement"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "last_seen": entry["time"],
+        })
+        group["count"] += 1
+        group["total_ms"] = round(group["total_ms"] + entry["duration_ms"], 3)
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+    return sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)
@@ -1,12 +1,37 @@
 import os
+import re
 import uuid
 import shutil
+import hashlib
+import tempfile
+from functools import lru_cache
 from pathlib import Path
-import magic
+from typing import Iterator, Optional, Tuple
 from fastapi import UploadFile
 
+from .metrics import UPLOAD_BYTES, time_upload_stage
+
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
+# Read/write granularity when copying an upload to its final location
+CHUNK_SIZE = 1024 * 1024
+
+# Bytes libmagic needs to identify the formats below
+SNIFF_SIZE = 2048
+
+# Hidden directory of the upload dir holding one file per distinct SHA-256
+BLOB_DIR_NAME = ".blobs"
+
+# Written in the upload dir by scripts.migrate_layout once no file is left in the old flat layout
+LAYOUT_MARKER = ".layout-sharded"
+
+_HEX_PREFIX = re.compile(r"^[0-9a-f]{4}", re.IGNORECASE)
+
+# Upload dirs whose migration is known to be complete (the marker is never removed)
+_migrated_dirs = set()
+
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4', '.webm', '.ogg', '.mov', '.fits', '.fit', '.fts'}
+
 ALLOWED_MIME = {
     "image/png",
     "image/jpeg",
@@ -15,57 +40,279 @@ ALLOWED_MIME = {
     "video/mp4",
     "video/webm",
     "video/ogg",
-    "video/quicktime"
+    "video/quicktime",
+    "image/fits"
 }
 
 
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_FILE_SIZE"""
+
+
+class InvalidFileTypeError(ValueError):
+    """Raised when the sniffed MIME type of an upload is not allowed"""
+
+
 def get_upload_dir():
     """Get upload directory from environment or use default"""
     return os.getenv("UPLOAD_PATH", "/storage/uploads")
 
 
+def get_file_extension(filename: str) -> str:
+    """Lowercased extension of a client filename, including the dot ('' when there is none)"""
+    return Path(filename).suffix.lower()
+
+
+def shard_dirs(name: str) -> Tuple[str, str]:
+    """
+    The two fan-out directory levels of a stored name: `ab/cd` for `abcd1234-....png`.
+
+    Stored names are a uuid4 (uploads, and derivatives named after their original) or a SHA-256
+    (blobs), whose first hex digits are uniformly spread: 65536 directories keep each one small
+    up to hundreds of millions of files. Other names (imported catalogs) are spread by the MD5 of
+    their stem instead. Either way, derivatives land next to their original.
+    """
+    stem = name.split(".", 1)[0]
+    prefix = stem[:4].lower() if _HEX_PREFIX.match(stem) else hashlib.md5(stem.encode()).hexdigest()[:4]
+    return prefix[:2], prefix[2:]
+
+
+def sharded_path(root, name: str) -> Path:
+    """Location of `name` under `root` in the sharded layout: root/ab/cd/name"""
+    return Path(root).joinpath(*shard_dirs(name), name)
+
+
+def layout_migrated(upload_dir=None) -> bool:
+    """Whether scripts.migrate_layout has finished for the upload dir, so old flat paths need no lookup"""
+    upload_dir = str(upload_dir or get_upload_dir())
+    if upload_dir not in _migrated_dirs and os.path.exists(os.path.join(upload_dir, LAYOUT_MARKER)):
+        _migrated_dirs.add(upload_dir)
+    return upload_dir in _migrated_dirs
+
+
+def resolve_path(root, name: str, upload_dir=None) -> Path:
+    """
+    Where `name` lives under `root` (the upload dir, the blob store or the tile store).
+
+    New files always go to the sharded location. Until the layout migration completes, a name
+    missing there is looked up at its old flat location too; the sharded path is returned when
+    neither exists, so a file moved by the migration in the meantime is still found.
+    """
+    path = sharded_path(root, name)
+    if not layout_migrated(upload_dir) and not path.exists():
+        legacy = Path(root) / name
+        if legacy.exists():
+            return legacy
+    return path
+
+
+def get_upload_path(filename: str) -> Path:
+    """Location of an upload or derivative filename"""
+    return resolve_path(get_upload_dir(), filename)
+
+
+def get_blob_path(sha256: str) -> Path:
+    """Location of the content-addressed copy of a file in the blob store"""
+    return resolve_path(Path(get_upload_dir()) / BLOB_DIR_NAME, sha256, get_upload_dir())
+
+
+def iter_upload_names(upload_dir=None) -> Iterator[str]:
+    """Names of the uploads and derivatives stored in either layout (hidden entries excluded)"""
+    root = Path(upload_dir or get_upload_dir())
+    for entry in os.scandir(root):
+        if entry.name.startswith("."):
+            continue
+        if entry.is_file():
+            yield entry.name
+        elif entry.is_dir() and len(entry.name) == 2:
+            for sub in os.scandir(entry.path):
+                if not (sub.is_dir() and len(sub.name) == 2):
+                    continue
+                for leaf in os.scandir(sub.path):
+                    if leaf.is_file() and not leaf.name.startswith("."):
+                        yield leaf.name
+
+
+def link_blob(sha256: str, filename: str) -> None:
+    """
+    Make a stored blob available under an upload filename.
+
+    The name is a hard link to the blob, so every upload of the same content shares one copy
+    on disk; filesystems without hard links fall back to a plain copy.
+    """
+    blob_path = get_blob_path(sha256)
+    file_path = get_upload_path(filename)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(blob_path, file_path)
+    except FileExistsError:
+        raise ValueError("Collision detected")
+    except OSError:
+        shutil.copyfile(blob_path, file_path)
+
+
+def remove_file(filename: str) -> None:
+    """Remove an upload filename (the blob behind it stays until its last reference goes)"""
+    get_upload_path(filename).unlink(missing_ok=True)
+
+
+def remove_blob(sha256: str) -> None:
+    """Free a blob nothing references anymore"""
+    get_blob_path(sha256).unlink(missing_ok=True)
+
+
 def generate_safe_filename(original_filename: str):
-    ext = Path(original_filename).suffix.lower()
+    ext = get_file_extension(original_filename)
     return f"{uuid.uuid4()}{ext}"
 
 
-def validate_file(file: UploadFile):
-
-    # Validate size
-    file.file.seek(0, 2)
-    size = file.file.tell()
-    file.file.seek(0)
+@lru_cache(maxsize=None)
+def _magic():
+    """libmagic, loaded on the first upload rather than at import (it maps the whole magic database)"""
+    import magic
 
-    if size > MAX_FILE_SIZE:
-        raise ValueError("File too large")
+    return magic.Magic(mime=True)
 
-    # Validate mime
-    mime = magic.from_buffer(file.file.read(2048), mime=True)
-    file.file.seek(0)
 
+def validate_mime(head: bytes) -> str:
+    """Identify the MIME type from the first bytes of a file and check it is allowed"""
+    with time_upload_stage("validate_mime"):
+        mime = _magic().from_buffer(head)
     if mime not in ALLOWED_MIME:
-        raise ValueError(f"Invalid MIME type: {mime}")
-    
-def save_file(file: UploadFile) -> str:
+        raise InvalidFileTypeError(f"Invalid MIME type: {mime}")
+    return mime
+
+
+class StreamingFileWriter:
     """
-    Save uploaded file.
-    
-    Args:
-        file: UploadFile object from FastAPI
+    Write an upload to its final location in a single pass.
+
+    Chunks go to a hidden temporary file inside the upload directory, which is renamed into
+    place on commit(), so readers never see a partial file. In the same pass the writer sniffs
+    the MIME type from the first SNIFF_SIZE bytes (before anything touches the disk), enforces
+    MAX_FILE_SIZE on a running byte count, and computes the SHA-256 of the content.
+
+    Use as a context manager: leaving the block without commit() or commit_blob() removes the
+    temporary file.
     """
 
-    validate_file(file)
+    def __init__(self, original_filename: str, expected_size: Optional[int] = None, max_size: Optional[int] = None):
+        if max_size is None:
+            max_size = MAX_FILE_SIZE
+        if expected_size is not None and expected_size > max_size:
+            raise FileTooLargeError("File too large")
 
-    upload_dir = Path(get_upload_dir())
-    upload_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.original_filename = original_filename
+        self.filename = generate_safe_filename(original_filename)
+        self.size = 0
+        self.mime: Optional[str] = None
+        self._head = bytearray()
+        self._sha256 = hashlib.sha256()
+        self._upload_dir = Path(get_upload_dir())
+        self._upload_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp = tempfile.NamedTemporaryFile(dir=self._upload_dir, prefix=".upload-", delete=False)
+        self._committed = False
 
-    safe_filename = generate_safe_filename(file.filename)
-    file_path = upload_dir / safe_filename
+    @property
+    def path(self) -> str:
+        """Temporary location of the content until it is committed"""
+        return self._tmp.name
 
-    if file_path.exists():
-        raise ValueError("Collision detected")
+    @property
+    def sha256(self) -> str:
+        """Hex SHA-256 of the bytes written so far (the whole file once committed)"""
+        return self._sha256.hexdigest()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise FileTooLargeError("File too large")
+        self._sha256.update(chunk)
+        UPLOAD_BYTES.inc(len(chunk))
+
+        if self.mime is None:
+            # Hold the first bytes back until they are enough to identify the file
+            self._head.extend(chunk)
+            if len(self._head) < SNIFF_SIZE:
+                return
+            self.mime = validate_mime(bytes(self._head[:SNIFF_SIZE]))
+            chunk, self._head = bytes(self._head), bytearray()
+
+        self._tmp.write(chunk)
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    def finish(self) -> None:
+        """Complete the upload once every chunk is written: the MIME type and sha256 are final after this"""
+        if self._tmp.closed:
+            return
+        if self.mime is None:
+            # Files smaller than SNIFF_SIZE are sniffed (and written) here
+            self.mime = validate_mime(bytes(self._head))
+            self._tmp.write(self._head)
+            self._head = bytearray()
+        self._tmp.close()
 
-    return safe_filename
\ No newline at end of file
+    def commit(self) -> str:
+        """Move the completed upload into place and return its stored filename"""
+        self.finish()
+        file_path = get_upload_path(self.filename)
+        if file_path.exists():
+            raise ValueError("Collision detected")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp.name, file_path)
+        self._committed = True
+        return self.filename
+
+    def commit_blob(self) -> Path:
+        """Move the completed upload into the blob store, under its SHA-256, and return the blob path"""
+        self.finish()
+        blob_path = get_blob_path(self.sha256)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp.name, blob_path)
+        self._committed = True
+        return blob_path
+
+    def abort(self) -> None:
+        """Discard the upload"""
+        if not self._committed:
+            self._tmp.close()
+            Path(self._tmp.name).unlink(missing_ok=True)
+
+    def __enter__(self) -> "StreamingFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.abort()
+
+
+def write_upload(file: UploadFile) -> StreamingFileWriter:
+    """
+    Copy a spooled UploadFile through a StreamingFileWriter.
+
+    The upload is read once, in chunks, while it is validated and hashed. The returned writer is
+    finished but not committed: the caller decides where the content goes.
+    """
+    file.file.seek(0)
+    with time_upload_stage("write_upload"):
+        writer = StreamingFileWriter(file.filename, expected_size=file.size)
+        try:
+            for chunk in iter(lambda: file.file.read(CHUNK_SIZE), b""):
+                writer.write(chunk)
+            writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+    return writer
+
+
+def save_file(file: UploadFile) -> str:
+    """
+    Save uploaded file.
+
+    The spooled upload is read once, in chunks, while it is validated and copied into place.
+    
+    Args:
+        file: UploadFile object from FastAPI
+    """
+    with write_upload(file) as writer:
+        return writer.commit()
@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from .storage import MAX_FILE_SIZE, FileTooLargeError, StreamingFileWriter
+
+# Room for the metadata fields and multipart framing on top of the file itself
+MAX_FORM_OVERHEAD = 256 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+MAX_FIELDS = 50
+
+
+class MultipartStreamError(ValueError):
+    """Raised when the request body is not a well-formed single-file multipart form"""
+
+
+class _MultipartUploadReader:
+    """
+    Callback target for python-multipart's push parser.
+
+    Text fields are collected in memory (bounded); the single file part is handed to a
+    StreamingFileWriter chunk by chunk instead of being spooled to a temporary file first.
+    """
+
+    def __init__(self, charset: str, file_field: str):
+        self.charset = charset
+        self.file_field = file_field
+        self.fields: Dict[str, str] = {}
+        self.writer: Optional[StreamingFileWriter] = None
+        self.pending_filename: Optional[str] = None
+        self.pending_data: List[bytes] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_name: Optional[str] = None
+        self._field_data = bytearray()
+        self._is_file = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+        self._field_name = None
+        self._field_data = bytearray()
+        self._is_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise MultipartStreamError('The Content-Disposition header field "name" must be provided.')
+        self._field_name = options[b"name"].decode(self.charset, errors="replace")
+
+        if b"filename" in options:
+            if self._field_name != self.file_field or self.writer is not None or self.pending_filename is not None:
+                raise MultipartStreamError(f"Exactly one file is expected, in the '{self.file_field}' field")
+            self._is_file = True
+            self.pending_filename = options[b"filename"].decode(self.charset, errors="replace")
+        elif len(self.fields) >= MAX_FIELDS:
+            raise MultipartStreamError(f"Too many fields. Maximum number of fields is {MAX_FIELDS}.")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.pending_data.append(data[start:end])
+            return
+        self._field_data.extend(data[start:end])
+        if len(self._field_data) > MAX_FIELD_SIZE:
+            raise MultipartStreamError(f"Field '{self._field_name}' exceeds {MAX_FIELD_SIZE // 1024}KB")
+
+    def on_part_end(self) -> None:
+        if not self._is_file:
+            self.fields[self._field_name] = self._field_data.decode(self.charset, errors="replace")
+
+
+async def receive_streaming_upload(request: Request, file_field: str = "file") -> Tuple[Dict[str, str], StreamingFileWriter]:
+    """
+    Read a multipart/form-data request body straight into final storage.
+
+    The body is consumed as it arrives: form fields are returned as strings, and the file part
+    goes through a StreamingFileWriter, which sniffs, size-checks and hashes it in the same pass.
+    Oversized requests are rejected from Content-Length before any byte is read.
+
+    The returned writer is not committed yet, so the caller can still validate the metadata;
+    it must commit() or abort() it (for instance with `with writer:`).
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MAX_FORM_OVERHEAD:
+        raise FileTooLargeError("File too large")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise MultipartStreamError("Expected a multipart/form-data body")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+
+    reader = _MultipartUploadReader(charset, file_field)
+    parser = MultipartParser(params[b"boundary"], reader.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if reader.pending_filename is not None and reader.writer is None:
+                reader.writer = await run_in_threadpool(StreamingFileWriter, reader.pending_filename)
+            if reader.pending_data:
+                data, reader.pending_data = b"".join(reader.pending_data), []
+                await run_in_threadpool(reader.writer.write, data)
+        parser.finalize()
+    except BaseException as e:
+        if reader.writer is not None:
+            await run_in_threadpool(reader.writer.abort)
+        if isinstance(e, MultipartParseError):
+            raise MultipartStreamError(f"Malformed multipart body: {e}") from e
+        raise
+
+    if reader.writer is None:
+        raise MultipartStreamError(f"Missing file in the '{file_field}' field")
+    return reader.fields, reader.writer
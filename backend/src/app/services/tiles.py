@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+
+from .cache import tile_cache
+from . import fits
+from .derivatives import get_executor, supports_derivatives
+from .storage import get_upload_dir, get_upload_path, resolve_path
+
+TILE_SIZE = 256
+TILE_FORMAT = "webp"
+TILE_QUALITY = 80
+
+# Hidden directory of the upload dir holding one pyramid per image: .tiles/<filename>/<z>/<x>_<y>.webp
+TILES_DIR_NAME = ".tiles"
+PYRAMID_INFO = "pyramid.json"
+
+_builds: Dict[str, asyncio.Future] = {}
+
+
+def supports_tiles(filename: str) -> bool:
+    """Whether a tile pyramid can be built for this stored filename"""
+    return supports_derivatives(filename)
+
+
+def get_tiles_dir(filename: str) -> Path:
+    """Directory of the tile pyramid of a stored filename"""
+    return resolve_path(Path(get_upload_dir()) / TILES_DIR_NAME, filename, get_upload_dir())
+
+
+def level_size(info: dict, level: int) -> Tuple[int, int]:
+    """Size in pixels of a pyramid level; the top level is the full image and each level below halves it"""
+    scale = 2 ** (info["maxLevel"] - level)
+    return -(-info["width"] // scale), -(-info["height"] // scale)
+
+
+def tile_grid(info: dict, level: int) -> Tuple[int, int]:
+    """Number of (columns, rows) of tiles in a pyramid level"""
+    width, height = level_size(info, level)
+    return -(-width // TILE_SIZE), -(-height // TILE_SIZE)
+
+
+def open_strips(source_path: str, strip_height: int) -> Tuple[int, int, Iterator[np.ndarray]]:
+    """
+    Open an image for top-to-bottom decoding, `strip_height` rows at a time.
+
+    Returns (width, height, strips), strips being (rows, width, bands) uint8 arrays. pyvips
+    decodes in sequential mode, so only the rows of the current strip are ever in memory,
+    even for formats like PNG that cannot be read out of order. FITS files are stretched
+    strip by strip from their memory-mapped data.
+    """
+    if fits.is_fits(source_path):
+        return fits.iter_display_strips(source_path, strip_height)
+
+    import pyvips
+
+    image = pyvips.Image.new_from_file(source_path, access="sequential")
+    if image.format == "ushort":
+        image = image.cast("uchar", shift=True)
+    elif image.format != "uchar":
+        raise ValueError(f"Unsupported sample format: {image.format}")
+
+    def strips() -> Iterator[np.ndarray]:
+        for top in range(0, image.height, strip_height):
+            strip = image.crop(0, top, image.width, min(strip_height, image.height - top)).numpy()
+            yield strip if strip.ndim == 3 else strip[..., np.newaxis]
+
+    return image.width, image.height, strips()
+
+
+def _halve(band: np.ndarray) -> np.ndarray:
+    """2x2 box downsample, rounding odd sizes up by repeating the last row or column"""
+    if band.shape[0] % 2:
+        band = np.concatenate([band, band[-1:]], axis=0)
+    if band.shape[1] % 2:
+        band = np.concatenate([band, band[:, -1:]], axis=1)
+    summed = (
+        band[0::2, 0::2].astype(np.uint16) + band[1::2, 0::2] + band[0::2, 1::2] + band[1::2, 1::2]
+    )
+    return ((summed + 2) // 4).astype(np.uint8)
+
+
+def _save_tile(tile: np.ndarray, path: Path) -> None:
+    image = Image.fromarray(tile[..., 0] if tile.shape[2] == 1 else np.ascontiguousarray(tile))
+    image.save(path, "WEBP", quality=TILE_QUALITY, method=4)
+
+
+class _PyramidLevel:
+    """
+    One level of a pyramid under construction.
+
+    Incoming rows are buffered until they fill a row of tiles, which is written out and then
+    halved into the level below, so every level only ever holds one band of TILE_SIZE rows.
+    """
+
+    def __init__(self, level: int, build_dir: Path, below: Optional["_PyramidLevel"]):
+        self.dir = build_dir / str(level)
+        self.dir.mkdir(parents=True)
+        self.below = below
+        self.pending: Optional[np.ndarray] = None
+        self.tile_row = 0
+
+    def push(self, rows: np.ndarray) -> None:
+        self.pending = rows if self.pending is None else np.concatenate([self.pending, rows])
+        while self.pending.shape[0] >= TILE_SIZE:
+            band, self.pending = self.pending[:TILE_SIZE], self.pending[TILE_SIZE:]
+            self._emit(band)
+
+    def close(self) -> None:
+        if self.pending is not None and self.pending.shape[0]:
+            self._emit(self.pending)
+        self.pending = None
+        if self.below is not None:
+            self.below.close()
+
+    def _emit(self, band: np.ndarray) -> None:
+        for column, left in enumerate(range(0, band.shape[1], TILE_SIZE)):
+            _save_tile(band[:, left:left + TILE_SIZE], self.dir / f"{column}_{self.tile_row}.{TILE_FORMAT}")
+        self.tile_row += 1
+        if self.below is not None:
+            self.below.push(_halve(band))
+
+
+def build_pyramid(source_path: str, tiles_dir: str) -> dict:
+    """
+    Build the Deep Zoom (DZI) tile pyramid of an image. Runs in a worker process.
+
+    Levels follow the DZI convention: level 0 is a single pixel, level maxLevel the full image,
+    tiles are TILE_SIZE pixels square without overlap. The image is decoded strip by strip and
+    every level is cut as the strips flow down, so memory stays at a few bands of rows whatever
+    the image size. The pyramid is built in a scratch directory and renamed into place, so a
+    reader sees either no pyramid or a complete one. Returns the pyramid description.
+    """
+    tiles_path = Path(tiles_dir)
+    tiles_path.parent.mkdir(parents=True, exist_ok=True)
+    build_dir = tiles_path.with_name(f".{tiles_path.name}.{uuid.uuid4().hex}")
+
+    try:
+        width, height, strips = open_strips(source_path, TILE_SIZE)
+        max_level = (max(width, height) - 1).bit_length()
+
+        top = None
+        for level in range(max_level + 1):
+            top = _PyramidLevel(level, build_dir, below=top)
+        for strip in strips:
+            top.push(strip)
+        top.close()
+
+        info = {
+            "width": width,
+            "height": height,
+            "tileSize": TILE_SIZE,
+            "overlap": 0,
+            "format": TILE_FORMAT,
+            "maxLevel": max_level,
+        }
+        (build_dir / PYRAMID_INFO).write_text(json.dumps(info))
+        try:
+            os.rename(build_dir, tiles_path)
+        except OSError:
+            # Another build of the same image was published first
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return info
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+
+def _read_info(filename: str) -> Optional[dict]:
+    try:
+        return json.loads((get_tiles_dir(filename) / PYRAMID_INFO).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _is_stored_name(filename: str) -> bool:
+    """Reject path tricks before a client-supplied filename touches the disk"""
+    return bool(filename) and filename == Path(filename).name and not filename.startswith(".")
+
+
+async def load_pyramid(filename: str) -> Optional[dict]:
+    """Description of the pyramid of an image, or None when it has not been built"""
+    if not _is_stored_name(filename):
+        return None
+    return await run_in_threadpool(_read_info, filename)
+
+
+async def ensure_pyramid(filename: str) -> dict:
+    """
+    Description of the pyramid of an image, building it on the derivative process pool first
+    if needed. Concurrent requests for the same image share a single build.
+    """
+    info = await load_pyramid(filename)
+    if info is not None:
+        return info
+
+    build = _builds.get(filename)
+    if build is None:
+        loop = asyncio.get_running_loop()
+        source_path = str(get_upload_path(filename))
+        build = loop.run_in_executor(get_executor(), build_pyramid, source_path, str(get_tiles_dir(filename)))
+        _builds[filename] = build
+        build.add_done_callback(lambda _: _builds.pop(filename, None))
+    return await asyncio.shield(build)
+
+
+async def read_tile(filename: str, level: int, x: int, y: int) -> Optional[bytes]:
+    """Encoded tile from the hot tile LRU, falling back to the on-disk pyramid"""
+    key = (filename, level, x, y)
+    body = tile_cache.get(key)
+    if body is None:
+        path = get_tiles_dir(filename) / str(level) / f"{x}_{y}.{TILE_FORMAT}"
+        try:
+            body = await run_in_threadpool(path.read_bytes)
+        except FileNotFoundError:
+            return None
+        tile_cache.put(key, body)
+    return body
+
+
+def remove_pyramid(filename: str) -> None:
+    """Delete the pyramid of an image from disk and from the hot tile LRU"""
+    if _is_stored_name(filename):
+        shutil.rmtree(get_tiles_dir(filename), ignore_errors=True)
+    tile_cache.discard(filename)
@@ -7,27 +7,33 @@ from PIL import Image
 from pathlib import Path
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 os.environ["TESTING"] = "1"
-# Use in-memory SQLite database for testing
-TEST_DATABASE_URL = "sqlite:///:memory:"
+# Keep the listing cache generation in process: the shared /dev/shm file belongs to local API instances
+os.environ["CATALOG_CACHE_STORE"] = "memory"
+# Use a throwaway SQLite file, so the sync (crud) and async (API) engines see the same database
+TEST_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='prepix_test_db_'), 'test.db')}"
 os.environ["DATABASE_URL"] = TEST_DATABASE_URL
 os.environ["UPLOAD_PATH"] = "/tmp/prepix_test_uploads"
 
-from src.app.database.database import Base, get_db
+from src.app.database.database import Base, get_db, get_async_db, to_async_url
 from src.app.main import app
+from src.app.services.cache import catalog_cache
 
-# SQlite in-memory database setup
+# SQlite database setup
 test_engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},  
     poolclass=StaticPool,  
 )
+test_async_engine = create_async_engine(to_async_url(TEST_DATABASE_URL), poolclass=NullPool)
 
-# test session factory
+# test session factories
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+TestingAsyncSessionLocal = async_sessionmaker(test_async_engine, autoflush=False, expire_on_commit=False)
 
 
 @pytest.fixture(scope="function")
@@ -35,6 +41,8 @@ def db_session():
     """Create a new database session for a test, with tables created and dropped after"""
     # Create tables
     Base.metadata.create_all(bind=test_engine)
+    # Listings cached for the previous test's database must not leak into this one
+    catalog_cache.bump()
     
     # Create a new session
     session = TestingSessionLocal()
@@ -47,6 +55,13 @@ def db_session():
         Base.metadata.drop_all(bind=test_engine)
 
 
+@pytest.fixture(scope="function")
+async def async_db_session(db_session):
+    """Async session on the same test database as db_session"""
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+
 @pytest.fixture(scope="function")
 def client(db_session, temp_upload_dir, monkeypatch):
     """Create a TestClient with the database session and upload path overridden"""
@@ -60,7 +75,12 @@ def client(db_session, temp_upload_dir, monkeypatch):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     
     with TestClient(app) as test_client:
         yield test_client
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.app.services import admission
+from src.app.services.admission import AdmissionRejected, UploadAdmissionController, UploadAdmissionMiddleware
+
+MB = 1024 * 1024
+
+
+def controller(**limits) -> UploadAdmissionController:
+    settings = {"max_concurrent": 2, "max_inflight_bytes": 100 * MB, "queue_size": 2, "queue_timeout": 1.0,
+                "min_free_bytes": 0}
+    return UploadAdmissionController(**{**settings, **limits})
+
+
+async def test_concurrency_limit_queues_then_rejects():
+    gate = controller()
+    await gate.acquire(MB)
+    await gate.acquire(MB)
+
+    queued = [asyncio.create_task(gate.acquire(MB)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert gate.queue_depth == 2
+    with pytest.raises(AdmissionRejected) as rejected:
+        await gate.acquire(MB)
+    assert rejected.value.reason == "queue_full"
+
+    # Each release admits the head of the queue
+    gate.release(MB)
+    assert await queued[0] == MB
+    assert not queued[1].done()
+    gate.release(MB)
+    assert await queued[1] == MB
+    assert (gate.active, gate.queue_depth) == (2, 0)
+
+
+async def test_byte_budget_is_first_come_first_served():
+    gate = controller(max_concurrent=10)
+    await gate.acquire(80 * MB)
+
+    large = asyncio.create_task(gate.acquire(60 * MB))
+    await asyncio.sleep(0)
+    # Would fit, but must not overtake the large upload waiting ahead of it
+    small = asyncio.create_task(gate.acquire(MB))
+    await asyncio.sleep(0)
+    assert gate.queue_depth == 2
+
+    gate.release(80 * MB)
+    await asyncio.gather(large, small)
+    assert gate.inflight_bytes == 61 * MB
+    gate.release(60 * MB)
+    gate.release(MB)
+    # Larger than the whole budget: charged the budget, so it runs once alone
+    assert await gate.acquire(500 * MB) == 100 * MB
+
+
+async def test_queue_timeout_and_cancellation():
+    gate = controller(max_concurrent=1, queue_timeout=0.05)
+    await gate.acquire(MB)
+    before = admission.ADMISSION_REJECTIONS.labels("timeout")._value.get()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await gate.acquire(MB)
+    assert rejected.value.reason == "timeout"
+    assert admission.ADMISSION_REJECTIONS.labels("timeout")._value.get() == before + 1
+
+    waiting = asyncio.create_task(gate.acquire(MB))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert gate.queue_depth == 0
+    gate.release(MB)
+    assert (gate.active, gate.inflight_bytes) == (0, 0)
+
+
+async def test_disk_full_rejected(monkeypatch):
+    monkeypatch.setattr(admission, "free_disk_bytes", lambda: 1500 * MB)
+    gate = controller(min_free_bytes=1024 * MB)
+    assert await gate.acquire(400 * MB) == 100 * MB
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await gate.acquire(400 * MB)
+    assert rejected.value.reason == "disk_full"
+    assert gate.active == 1
+
+
+def test_middleware_sheds_uploads_but_not_reads():
+    gate = controller(max_concurrent=1, queue_size=0)
+    app = FastAPI()
+    app.add_middleware(UploadAdmissionMiddleware, controller=gate, retry_after=7)
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        await request.body()
+        return {"active": gate.active, "bytes": gate.inflight_bytes}
+
+    @app.get("/images")
+    def images():
+        return []
+
+    client = TestClient(app)
+    assert client.post("/upload", content=b"x" * 1000).json() == {"active": 1, "bytes": 1000}
+    assert (gate.active, gate.inflight_bytes) == (0, 0)
+
+    # Simulate an upload in progress: the next one is shed at once, reads are untouched
+    gate.active = 1
+    response = client.post("/upload", content=b"x" * 1000)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert "queue_full" in response.json()["detail"]
+    assert client.get("/images").status_code == 200
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from benchmarks import bench_startup
+from src.app.database import database
+from src.app.main import create_app
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_has_no_side_effects():
+    """Importing the app needs no DATABASE_URL, creates no engine and leaves libmagic unloaded"""
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    script = (
+        "import json, sys\n"
+        "from src.app.main import app\n"
+        "from src.app.database import database\n"
+        "print(json.dumps([database._engine is None, database._async_engine is None, 'magic' in sys.modules]))\n"
+    )
+
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+
+    assert json.loads(result.stdout) == [True, True, False]
+
+
+def test_lifespan_creates_prewarms_and_disposes_the_pool(db_session):
+    with TestClient(create_app()) as client:
+        engine = database._async_engine
+        assert engine is not None
+        assert engine.pool.checkedin() == database.POOL_PREWARM
+        assert client.get("/").status_code == 200
+
+    assert database._async_engine is None
+
+
+def test_startup_benchmark_reports_phases(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+
+    timings = bench_startup.measure_in_process(env)
+
+    assert set(timings) == {"import_ms", "startup_ms", "first_request_ms", "total_ms"}
+    assert timings["total_ms"] >= timings["import_ms"]
@@ -0,0 +1,26 @@
+from benchmarks import suite
+
+
+def test_suite_smoke_run(tmp_path):
+    report = suite.run_suite([30], f"sqlite:///{tmp_path / 'bench.db'}", repeats=1, writes=3, file_sizes=(4096,))
+
+    results = report["results"]
+    assert "sqlite/30/get_filtered_images/none" in results
+    assert "sqlite/30/get_filtered_images/source=NGC,dataset_release=DR1" in results
+    assert results["sqlite/30/encode_image_ndjson/rows=30"]["rows_per_sec"] > 0
+    assert results["sqlite/30/create_image_metadata"]["runs"] == 3
+    assert results["storage/write_upload/4KiB"]["bytes_per_sec"] > 0
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"meta": {"commit": "a"}, "results": {
+        "x": {"median_ms": 10.0}, "y": {"median_ms": 10.0}, "gone": {"median_ms": 1.0},
+    }}
+    current = {"meta": {"commit": "b"}, "results": {
+        "x": {"median_ms": 11.0}, "y": {"median_ms": 13.0}, "new": {"median_ms": 1.0},
+    }}
+
+    rows = suite.compare(baseline, current, threshold=0.2)
+
+    assert [(name, regressed) for name, _, _, _, regressed in rows] == [("x", False), ("y", True)]
+    assert suite.print_comparison(rows, baseline, current) == 1
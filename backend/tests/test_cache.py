@@ -0,0 +1,69 @@
+import os
+
+from src.app.services.cache import CatalogCache, SharedGeneration, etag_matches
+
+
+def test_bump_changes_etag_and_drops_bodies():
+    cache = CatalogCache()
+    generation = cache.generation
+    cache.put(generation, "key", b"[]", {})
+
+    etag = cache.etag(generation, "key")
+    cache.bump()
+
+    assert cache.get(generation, "key") is None
+    assert cache.etag(cache.generation, "key") != etag
+
+
+def test_put_ignores_bodies_built_before_a_write():
+    cache = CatalogCache()
+    generation = cache.generation
+    cache.bump()
+
+    cache.put(generation, "key", b"[]", {})
+
+    assert cache.get(generation, "key") is None
+
+
+def test_lru_is_bounded():
+    cache = CatalogCache(max_entries=2)
+    generation = cache.generation
+    cache.put(generation, "a", b"a", {})
+    cache.put(generation, "b", b"b", {})
+    cache.get(generation, "a")
+    cache.put(generation, "c", b"c", {})
+
+    assert cache.get(generation, "a") is not None
+    assert cache.get(generation, "b") is None
+    assert cache.get(generation, "c") is not None
+
+
+def test_write_in_another_worker_invalidates_etags_and_bodies(tmp_path):
+    path = str(tmp_path / "generation")
+    worker = CatalogCache(generation_store=SharedGeneration(path))
+    other = CatalogCache(generation_store=SharedGeneration(path))
+    generation = worker.generation
+    worker.put(generation, "key", b"[]", {})
+    etag = worker.etag(generation, "key")
+    assert other.etag(other.generation, "key") == etag
+
+    pid = os.fork()
+    if pid == 0:
+        CatalogCache(generation_store=SharedGeneration(path)).bump()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    other.bump()
+
+    assert worker.generation == other.generation == generation + 2
+    assert worker.etag(worker.generation, "key") != etag
+    assert worker.get(worker.generation, "key") is None
+    worker.put(generation, "key", b"stale", {})
+    assert worker.get(generation, "key") is None
+
+
+def test_etag_matches():
+    assert etag_matches('"x", "y"', '"y"')
+    assert etag_matches('W/"y"', '"y"')
+    assert etag_matches("*", '"y"')
+    assert not etag_matches('"x"', '"y"')
+    assert not etag_matches(None, '"y"')
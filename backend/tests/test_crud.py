@@ -1,13 +1,24 @@
+import os
+from pathlib import Path
+
 import pytest
+from sqlalchemy.exc import IntegrityError
 from src.app.database.crud import (
+    PendingUpload,
+    create_image_from_upload,
+    create_images_from_uploads,
     create_image_metadata,
     get_image_by_filename,
     get_all_images,
+    get_filtered_images,
+    search_images,
     get_public_images,
     update_image_metadata,
     delete_image_metadata,
 )
+from src.app.database.models import ImageBlob
 from src.app.models.schemas import ImageMetadataCreate
+from src.app.services import storage
 
 
 def build_metadata(**overrides):
@@ -74,6 +85,68 @@ def test_get_all_images_pagination(db_session):
     assert len(images) == 2
 
 
+def test_get_filtered_images_keyset(db_session):
+    for i in range(5):
+        create_image_metadata(db_session, f"img_{i}.png", build_metadata())
+
+    first_page = get_filtered_images(db_session, limit=2)
+    last = first_page[-1]
+    second_page = get_filtered_images(db_session, limit=2, after=(last.upload_date, last.id))
+
+    assert [img.filename for img in first_page] == ["img_4.png", "img_3.png"]
+    assert [img.filename for img in second_page] == ["img_2.png", "img_1.png"]
+
+
+def test_get_filtered_images_substring_is_case_insensitive(db_session):
+    create_image_metadata(db_session, "m31.png", build_metadata(source="Andromeda M31"))
+    create_image_metadata(db_session, "m33.png", build_metadata(source="Triangulum M33"))
+
+    images = get_filtered_images(db_session, source="m31")
+
+    assert [img.filename for img in images] == ["m31.png"]
+
+
+def test_get_filtered_images_escapes_wildcards(db_session):
+    create_image_metadata(db_session, "literal.png", build_metadata(description="100% stacked"))
+    create_image_metadata(db_session, "other.png", build_metadata(description="1000 stacked"))
+
+    assert [img.filename for img in get_filtered_images(db_session, description="100%")] == ["literal.png"]
+    assert get_filtered_images(db_session, description="_") == []
+
+
+def test_search_images_ranks_across_fields(db_session):
+    create_image_metadata(db_session, "desc_only.png", build_metadata(source="NGC 6505", description="Near M31 field"))
+    create_image_metadata(db_session, "source.png", build_metadata(source="M31", datasetRelease="DR1"))
+    create_image_metadata(db_session, "other.png", build_metadata(source="M33"))
+
+    images = search_images(db_session, "m31")
+
+    assert [img.filename for img in images] == ["source.png", "desc_only.png"]
+
+
+def test_search_images_requires_every_word(db_session):
+    create_image_metadata(db_session, "hit.png", build_metadata(
+        source="M31", datasetRelease="DR1", dataProcessingStages="Raw → Calibrated → Stacked"
+    ))
+    create_image_metadata(db_session, "miss.png", build_metadata(source="M31", datasetRelease="DR2"))
+
+    images = search_images(db_session, "M31 DR1 stack")
+
+    assert [img.filename for img in images] == ["hit.png"]
+
+
+def test_search_index_follows_updates_and_deletes(db_session):
+    create_image_metadata(db_session, "test.png", build_metadata(source="M31"))
+    update_image_metadata(db_session, "test.png", build_metadata(source="Perseus"))
+
+    assert search_images(db_session, "M31") == []
+    assert [img.filename for img in search_images(db_session, "perseus")] == ["test.png"]
+
+    delete_image_metadata(db_session, "test.png")
+
+    assert search_images(db_session, "perseus") == []
+
+
 def test_get_public_images(db_session):
     create_image_metadata(db_session, "public.png", build_metadata(isPublic=True))
     create_image_metadata(db_session, "private.png", build_metadata(isPublic=False))
@@ -119,3 +192,103 @@ def test_delete_image_metadata(db_session):
 def test_delete_image_metadata_not_found(db_session):
     deleted = delete_image_metadata(db_session, "missing.png")
     assert deleted is False
+
+
+def store_upload(db_session, content, name="mosaic.png"):
+    """Helper function pushing bytes through a StreamingFileWriter into the blob store"""
+    writer = storage.StreamingFileWriter(name)
+    writer.write(content)
+    writer.finish()
+    with writer:
+        return create_image_from_upload(db_session, writer, build_metadata())
+
+
+def test_create_image_from_upload_deduplicates(db_session, sample_image, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    content = sample_image[1].getvalue()
+
+    first = store_upload(db_session, content)
+    second = store_upload(db_session, content)
+
+    assert first.filename != second.filename
+    assert first.sha256 == second.sha256
+    blob = db_session.get(ImageBlob, first.sha256)
+    assert blob.ref_count == 2
+    assert blob.size == len(content)
+    assert blob.mime == "image/png"
+
+    blob_path = storage.get_blob_path(first.sha256)
+    assert os.listdir(blob_path.parent) == [first.sha256]
+    for image in (first, second):
+        assert os.path.samefile(storage.get_upload_path(image.filename), blob_path)
+
+
+def test_delete_image_metadata_frees_blob_with_last_reference(db_session, sample_image, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    content = sample_image[1].getvalue()
+    first = store_upload(db_session, content)
+    second = store_upload(db_session, content)
+    sha256, blob_path = first.sha256, storage.get_blob_path(first.sha256)
+
+    assert delete_image_metadata(db_session, first.filename) is True
+    db_session.expire_all()
+    assert db_session.get(ImageBlob, sha256).ref_count == 1
+    assert not storage.get_upload_path(first.filename).exists()
+    assert blob_path.exists()
+
+    assert delete_image_metadata(db_session, second.filename) is True
+    db_session.expire_all()
+    assert db_session.get(ImageBlob, sha256) is None
+    assert not blob_path.exists()
+    assert list(storage.iter_upload_names()) == []
+    assert not [path for path in Path(temp_upload_dir, storage.BLOB_DIR_NAME).rglob("*") if path.is_file()]
+
+
+def test_create_images_from_uploads_bulk(db_session, sample_image, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    content = sample_image[1].getvalue()
+    store_upload(db_session, content)
+
+    uploads = []
+    for index, payload in enumerate((content, content, b"GIF89a" + bytes(range(64)))):
+        writer = storage.StreamingFileWriter("batch.gif" if index == 2 else "batch.png")
+        writer.write(payload)
+        writer.finish()
+        uploads.append(PendingUpload(writer, build_metadata(source=f"Batch {index}", coordinates="150.0, 2.0")))
+
+    images = create_images_from_uploads(db_session, uploads)
+
+    assert [image.source for image in images] == ["Batch 0", "Batch 1", "Batch 2"]
+    assert all(image.id is not None and image.dec == 2.0 for image in images)
+    # The two PNG copies joined the blob of the earlier upload
+    db_session.expire_all()
+    assert db_session.get(ImageBlob, images[0].sha256).ref_count == 3
+    assert db_session.get(ImageBlob, images[2].sha256).ref_count == 1
+    assert len([path for path in Path(temp_upload_dir, storage.BLOB_DIR_NAME).rglob("*") if path.is_file()]) == 2
+    for image in images:
+        assert os.path.samefile(storage.get_upload_path(image.filename), storage.get_blob_path(image.sha256))
+    assert [image.filename for image in search_images(db_session, "batch")] == [images[2].filename, images[1].filename, images[0].filename]
+
+
+def test_create_images_from_uploads_is_all_or_nothing(db_session, sample_image, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    existing = store_upload(db_session, sample_image[1].getvalue())
+
+    writers = [storage.StreamingFileWriter("a.png"), storage.StreamingFileWriter("b.png")]
+    for writer in writers:
+        writer.write(sample_image[1].getvalue() + b"\0")
+        writer.finish()
+    # Second row collides with an existing filename
+    writers[1].filename = existing.filename
+
+    with pytest.raises(IntegrityError):
+        create_images_from_uploads(db_session, [PendingUpload(writer, build_metadata()) for writer in writers])
+
+    db_session.expire_all()
+    assert len(get_all_images(db_session)) == 1
+    assert db_session.get(ImageBlob, writers[0].sha256) is None
+    # Nothing moved: the writers can still be stored one by one
+    assert all(os.path.exists(writer.path) for writer in writers)
+    with writers[0]:
+        assert create_image_from_upload(db_session, writers[0], build_metadata()).sha256 == writers[0].sha256
+    writers[1].abort()
@@ -0,0 +1,76 @@
+import threading
+
+from src.app.database import crud, crud_async
+from src.app.services import object_storage, storage
+from tests.test_crud import build_metadata
+
+
+async def test_create_and_get_image_metadata(async_db_session):
+    image = await crud_async.create_image_metadata(async_db_session, "test.png", build_metadata())
+
+    result = await crud_async.get_image_by_filename(async_db_session, "test.png")
+
+    assert image.id is not None
+    assert result is not None
+    assert result.source == "Test Source"
+
+
+async def test_get_filtered_image_rows(async_db_session):
+    await crud_async.create_image_metadata(async_db_session, "m31.png", build_metadata(source="M31"))
+    await crud_async.create_image_metadata(async_db_session, "m33.png", build_metadata(source="M33"))
+
+    rows = await crud_async.get_filtered_image_rows(async_db_session, source="M31")
+
+    assert [row.filename for row in rows] == ["m31.png"]
+
+
+async def test_stream_filtered_image_rows(async_db_session):
+    for i in range(3):
+        await crud_async.create_image_metadata(async_db_session, f"img_{i}.png", build_metadata())
+
+    rows = [row async for row in crud_async.stream_filtered_image_rows(async_db_session, batch_size=2)]
+
+    assert [row.filename for row in rows] == ["img_2.png", "img_1.png", "img_0.png"]
+
+
+async def test_update_and_delete_image_metadata(async_db_session):
+    await crud_async.create_image_metadata(async_db_session, "test.png", build_metadata())
+
+    updated = await crud_async.update_image_metadata(async_db_session, "test.png", build_metadata(source="Updated"))
+    deleted = await crud_async.delete_image_metadata(async_db_session, "test.png")
+
+    assert updated.source == "Updated"
+    assert deleted is True
+    assert await crud_async.get_image_by_filename(async_db_session, "test.png") is None
+
+
+async def test_upload_and_delete_file_work_runs_off_the_event_loop(async_db_session, sample_image, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    loop_thread = threading.get_ident()
+    threads = {}
+
+    def recording(name, function):
+        def wrapper(*args, **kwargs):
+            threads.setdefault(name, threading.get_ident())
+            return function(*args, **kwargs)
+        return wrapper
+
+    for name in ("link_blob", "remove_file", "remove_blob"):
+        monkeypatch.setattr(storage, name, recording(name, getattr(storage, name)))
+    monkeypatch.setattr(object_storage, "unpublish", recording("unpublish", object_storage.unpublish))
+
+    writers = []
+    for _ in range(2):
+        writer = storage.StreamingFileWriter("mosaic.png")
+        writer.write(sample_image[1].getvalue())
+        writer.finish()
+        writers.append(writer)
+    image = await crud_async.create_image_from_upload(async_db_session, writers[0], build_metadata())
+    [copy] = await crud_async.create_images_from_uploads(async_db_session, [crud.PendingUpload(writers[1], build_metadata())])
+
+    assert await crud_async.delete_image_metadata(async_db_session, image.filename) is True
+    assert await crud_async.delete_image_metadata(async_db_session, copy.filename) is True
+
+    assert set(threads) == {"link_blob", "remove_file", "remove_blob", "unpublish"}
+    assert loop_thread not in threads.values()
+    assert not storage.get_blob_path(image.sha256).exists()
@@ -0,0 +1,78 @@
+from PIL import Image
+
+from src.app.services import derivatives, storage
+
+
+def test_render_derivatives_downscales_without_upscaling(tmp_path):
+    source = tmp_path / "mosaic.png"
+    Image.new("RGB", (1200, 600), color="blue").save(source)
+
+    derivatives.render_derivatives(str(source), str(tmp_path), "mosaic.png")
+
+    expected = {
+        "mosaic.thumb-160.webp": (160, 80),
+        "mosaic.thumb-320.webp": (320, 160),
+        "mosaic.preview-800.webp": (800, 400),
+        # Narrower sources are kept at their own size
+        "mosaic.preview-1600.webp": (1200, 600),
+    }
+    for name, size in expected.items():
+        with Image.open(storage.sharded_path(tmp_path, name)) as image:
+            assert image.format == "WEBP"
+            assert image.size == size
+    # Next to each other in the shard of their original
+    shard = storage.sharded_path(tmp_path, "mosaic.png").parent
+    assert sorted(path.name for path in shard.iterdir()) == sorted(expected)
+
+
+def test_render_derivatives_keeps_transparency(tmp_path):
+    source = tmp_path / "overlay.png"
+    Image.new("RGBA", (400, 400), color=(255, 0, 0, 0)).save(source)
+
+    derivatives.render_derivatives(str(source), str(tmp_path), "overlay.png")
+
+    with Image.open(storage.sharded_path(tmp_path, "overlay.thumb-160.webp")) as image:
+        assert image.mode == "RGBA"
+
+
+def test_derivative_urls_and_support():
+    urls = derivatives.derivative_urls("abc.png")
+
+    assert urls["thumbnails"]["320"] == "/uploads/abc.thumb-320.webp"
+    assert urls["previews"]["1600"] == "/uploads/abc.preview-1600.webp"
+    assert derivatives.supports_derivatives("abc.JPG")
+    assert not derivatives.supports_derivatives("clip.mp4")
+
+
+def test_backfill_renders_missing_derivatives(db_session, temp_upload_dir, monkeypatch):
+    import os
+
+    from scripts.backfill_derivatives import backfill
+    from src.app.database.crud import create_image_metadata, get_image_by_filename
+    from src.app.models.schemas import ImageMetadataCreate
+
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    metadata = ImageMetadataCreate(
+        source="Euclid",
+        copyright="ESA",
+        datasetRelease="DR1",
+        description="Legacy upload",
+        dataProcessingStages="Raw",
+        coordinates="RA 0 DEC 0",
+        isPublic=True,
+    )
+    Image.new("RGB", (64, 64)).save(os.path.join(temp_upload_dir, "legacy.png"))
+    create_image_metadata(db_session, "legacy.png", metadata)
+    create_image_metadata(db_session, "missing.png", metadata)
+    create_image_metadata(db_session, "clip.mp4", metadata)
+
+    rendered, failed = backfill(db_session, batch_size=2)
+
+    assert (rendered, failed) == (1, 1)
+    db_session.expire_all()
+    assert get_image_by_filename(db_session, "legacy.png").has_derivatives
+    assert not get_image_by_filename(db_session, "missing.png").has_derivatives
+    # The original is still in the flat layout, its derivatives go to the sharded one
+    assert storage.get_upload_path("legacy.thumb-160.webp") == storage.sharded_path(temp_upload_dir, "legacy.thumb-160.webp")
+    assert storage.get_upload_path("legacy.thumb-160.webp").is_file()
+    assert not any(name.startswith("missing.") for name in storage.iter_upload_names())
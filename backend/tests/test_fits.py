@@ -0,0 +1,267 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.app.services import fits, storage, tiles
+
+
+def make_fits(data: np.ndarray, cards: dict = None, bitpix: int = -32, extension: bool = False) -> bytes:
+    """Build a minimal FITS file: the image in the primary HDU, or in an IMAGE extension"""
+
+    def card(keyword: str, value) -> str:
+        if isinstance(value, bool):
+            text = f"{'T' if value else 'F':>20}"
+        elif isinstance(value, str):
+            text = f"'{value:<8}'"
+        else:
+            text = f"{value:>20}"
+        return f"{keyword:<8}= {text}".ljust(fits.CARD_SIZE)
+
+    def header(cards_list) -> bytes:
+        text = "".join(card(keyword, value) for keyword, value in cards_list) + "END".ljust(fits.CARD_SIZE)
+        text += " " * (-len(text) % fits.BLOCK_SIZE)
+        return text.encode("ascii")
+
+    def padded(raw: bytes) -> bytes:
+        return raw + b"\0" * (-len(raw) % fits.BLOCK_SIZE)
+
+    dtype = {-32: ">f4", 16: ">i2"}[bitpix]
+    image_cards = [("BITPIX", bitpix), ("NAXIS", 2), ("NAXIS1", data.shape[1]), ("NAXIS2", data.shape[0])]
+    extra = list((cards or {}).items())
+    body = padded(data.astype(dtype).tobytes())
+
+    if extension:
+        primary = header([("SIMPLE", True), ("BITPIX", 8), ("NAXIS", 0), ("EXTEND", True), ("TELESCOP", "Euclid")])
+        return primary + header([("XTENSION", "IMAGE"), *image_cards, ("PCOUNT", 0), ("GCOUNT", 1), *extra]) + body
+    return header([("SIMPLE", True), *image_cards, *extra]) + body
+
+
+WCS_CARDS = {
+    "CTYPE1": "RA---TAN",
+    "CTYPE2": "DEC--TAN",
+    "CRVAL1": 150.0,
+    "CRVAL2": 2.0,
+    "CRPIX1": 32.5,
+    "CRPIX2": 32.5,
+    "CDELT1": -0.0001,
+    "CDELT2": 0.0001,
+}
+
+
+def gradient(height: int = 64, width: int = 64) -> np.ndarray:
+    return np.add.outer(np.arange(height), np.arange(width)).astype(np.float32)
+
+
+def test_parse_value_types():
+    assert fits.parse_value(" 'Euclid  '  ") == "Euclid"
+    assert fits.parse_value("'O''Brien'") == "O'Brien"
+    assert fits.parse_value("T") is True
+    assert fits.parse_value("42") == 42
+    assert fits.parse_value("1.5D3") == 1500.0
+    assert fits.parse_value("VIS") == "VIS"
+
+
+def test_read_image_in_extension_inherits_primary_cards(tmp_path):
+    path = tmp_path / "mosaic.fits"
+    path.write_bytes(make_fits(gradient(30, 40), {"FILTER": "VIS", "EXPTIME": 560.0}, extension=True))
+
+    image = fits.read_image(str(path))
+
+    assert (image.width, image.height) == (40, 30)
+    assert image.header["TELESCOP"] == "Euclid"
+    assert image.header["FILTER"] == "VIS"
+    assert image.header["EXPTIME"] == 560.0
+    assert fits.open_data(str(path), image)[29, 39] == 68
+
+
+def test_read_image_rejects_other_files(tmp_path):
+    path = tmp_path / "image.fits"
+    path.write_bytes(b"\x89PNG" + b"\0" * 4000)
+
+    with pytest.raises(fits.FitsError):
+        fits.read_image(str(path))
+
+
+def test_zscale_ignores_outliers():
+    rng = np.random.default_rng(0)
+    samples = np.concatenate([rng.normal(100, 5, 10_000), [1e6, 1e7]]).astype(np.float32)
+
+    low, high = fits.zscale(samples)
+
+    assert 70 < low < 100 < high < 130
+
+
+def test_asinh_stretch_clips_and_blanks():
+    values = np.array([-10.0, 0.0, 50.0, 100.0, 1e9, np.nan], dtype=np.float32)
+
+    stretched = fits.asinh_stretch(values, (0.0, 100.0))
+
+    assert stretched.dtype == np.uint8
+    assert list(stretched[[0, 1, 3, 4, 5]]) == [0, 0, 255, 255, 0]
+    # asinh lifts the midtones above a linear ramp
+    assert stretched[2] > 128
+
+
+def test_wcs_center_tan_projection():
+    ra, dec = fits.wcs_center(WCS_CARDS, 64, 64)
+
+    assert ra == pytest.approx(150.0)
+    assert dec == pytest.approx(2.0)
+    assert fits.format_coordinates(ra, dec) == "RA: 10h00m00.0s, DEC: +02°00'00.0\""
+
+
+def test_wcs_center_offset_reference_pixel():
+    header = {**WCS_CARDS, "CRPIX1": 1.0, "CRPIX2": 1.0}
+
+    ra, dec = fits.wcs_center(header, 64, 64)
+
+    # The center is 31.5 pixels east (RA decreases with x) and north of the reference pixel
+    assert ra == pytest.approx(150.0 - 31.5 * 0.0001 / np.cos(np.radians(2.0)), abs=1e-6)
+    assert dec == pytest.approx(2.0 + 31.5 * 0.0001, abs=1e-6)
+
+
+def test_wcs_center_applies_crota2_in_image_extensions(tmp_path):
+    path = tmp_path / "rotated.fits"
+    path.write_bytes(make_fits(gradient(), {**WCS_CARDS, "CRPIX1": 1.0, "CRPIX2": 1.0, "CROTA2": 90.0}, extension=True))
+
+    header, _ = fits.describe(str(path))
+    ra, dec = fits.wcs_center(header, 64, 64)
+
+    # PCOUNT is not a PCi_j keyword. With CDELT1 < 0 and CROTA2 = 90° (Calabretta & Greisen
+    # eq. 189: CD1_2 = -CDELT2 sin, CD2_1 = CDELT1 sin), +x points south and +y west
+    assert "PCOUNT" in header
+    assert ra == pytest.approx(150.0 - 31.5 * 0.0001 / np.cos(np.radians(2.0)), abs=1e-6)
+    assert dec == pytest.approx(2.0 - 31.5 * 0.0001, abs=1e-6)
+    assert (round(ra, 5), round(dec, 5)) == (149.99685, 1.99685)
+
+
+def test_render_preview_is_flipped_and_block_averaged(tmp_path):
+    path = tmp_path / "gradient.fits"
+    data = np.zeros((64, 128), dtype=np.float32)
+    # FITS rows are stored bottom first: the first rows are the bottom of the displayed image
+    data[:32] = 1000.0
+    path.write_bytes(make_fits(data))
+
+    preview = fits.render_preview(str(path), 32)
+
+    assert preview.mode == "L"
+    assert preview.size == (32, 16)
+    assert preview.getpixel((0, 15)) > preview.getpixel((0, 0))
+
+
+def test_display_strips_feed_tile_pyramid(tmp_path):
+    path = tmp_path / "mosaic.fits"
+    path.write_bytes(make_fits(gradient(300, 520).astype(np.int16), bitpix=16))
+
+    info = tiles.build_pyramid(str(path), str(tmp_path / "tiles"))
+
+    assert (info["width"], info["height"]) == (520, 300)
+    assert sorted(os.listdir(tmp_path / "tiles" / str(info["maxLevel"]))) == [
+        "0_0.webp", "0_1.webp", "1_0.webp", "1_1.webp", "2_0.webp", "2_1.webp"
+    ]
+
+
+def _upload_fits(client, content: bytes, coordinates: str = "", endpoint: str = "/upload"):
+    return client.post(
+        endpoint,
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "Q1",
+            "description": "Calibrated VIS frame",
+            "dataProcessingStages": "Calibrated",
+            "coordinates": coordinates,
+            "isPublic": "true"
+        },
+        files={"file": ("frame.fits", io.BytesIO(content), "application/fits")}
+    )
+
+
+def test_upload_fits_fills_coordinates_and_renders_preview(client, temp_upload_dir):
+    content = make_fits(gradient(), {**WCS_CARDS, "TELESCOP": "Euclid", "FILTER": "VIS"})
+
+    response = _upload_fits(client, content)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["coordinates"] == "RA: 10h00m00.0s, DEC: +02°00'00.0\""
+    assert data["thumbnails"] is not None
+    thumbnail = storage.get_upload_path(os.path.basename(data["thumbnails"]["160"]))
+    with Image.open(thumbnail) as image:
+        assert image.size == (64, 64)
+
+    header = client.get(f"/images/{data['filename']}/header").json()["header"]
+    assert header["FILTER"] == "VIS"
+    assert header["CRVAL1"] == 150.0
+
+
+def test_upload_fits_keeps_typed_coordinates(client):
+    content = make_fits(gradient(), WCS_CARDS)
+
+    response = _upload_fits(client, content, coordinates="EDF-North tile 102", endpoint="/upload/stream")
+
+    assert response.status_code == 200
+    assert response.json()["coordinates"] == "EDF-North tile 102"
+
+
+def test_upload_fits_without_wcs_requires_coordinates(client):
+    response = _upload_fits(client, make_fits(gradient()))
+
+    assert response.status_code == 422
+
+
+def test_upload_image_without_coordinates_rejected(client, sample_image):
+    filename, file_bytes, content_type = sample_image
+
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "DR1",
+            "description": "Test description",
+            "dataProcessingStages": "Raw",
+            "coordinates": "",
+            "isPublic": "true"
+        },
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert response.status_code == 422
+
+
+def test_filter_images_by_header_cards(client):
+    _upload_fits(client, make_fits(gradient(), {**WCS_CARDS, "FILTER": "VIS", "EXPTIME": 560.0}))
+    _upload_fits(client, make_fits(gradient(), {**WCS_CARDS, "FILTER": "NISP-Y", "EXPTIME": 87.2}))
+
+    vis = client.get("/images", params={"header": "FILTER=VIS"}).json()
+    both = client.get("/images", params=[("header", "filter=NISP-Y"), ("header", "EXPTIME=87.2")]).json()
+    none = client.get("/images", params=[("header", "FILTER=VIS"), ("header", "EXPTIME=87.2")]).json()
+
+    assert len(vis) == 1
+    assert len(both) == 1 and both[0]["filename"] != vis[0]["filename"]
+    assert none == []
+    assert client.get("/images", params={"header": "FILTER"}).status_code == 400
+
+
+def test_header_endpoint_for_regular_images(client, sample_image):
+    filename, file_bytes, content_type = sample_image
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "DR1",
+            "description": "Test description",
+            "dataProcessingStages": "Raw",
+            "coordinates": "RA: 10h20m30s, DEC: +45°",
+            "isPublic": "true"
+        },
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert client.get(f"/images/{response.json()['filename']}/header").status_code == 404
+    assert client.get("/images/missing.fits/header").status_code == 404
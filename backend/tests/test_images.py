@@ -146,3 +146,159 @@ def test_images_ordering(client, fake_png):
     
     # Order should be consistent
     assert [img["filename"] for img in data1] == [img["filename"] for img in data2]
+
+
+def test_images_cursor_pagination(client, fake_png, sample_metadata):
+    """Test that following X-Next-Cursor walks the whole catalog exactly once"""
+    uploaded = []
+    for i in range(5):
+        response = client.post(
+            "/upload",
+            files={"file": (f"test_{i}.png", fake_png(), "image/png")},
+            data=sample_metadata
+        )
+        uploaded.append(response.json()["filename"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/images", params=params)
+        assert response.status_code == 200
+        seen.extend(img["filename"] for img in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == list(reversed(uploaded))
+
+
+def test_images_invalid_cursor(client):
+    """Test that a tampered cursor is rejected"""
+    response = client.get("/images", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+def test_images_free_text_search(client, fake_png, sample_metadata):
+    """Test that q= searches all metadata fields and pages through relevance-ranked results"""
+    for i in range(3):
+        client.post(
+            "/upload",
+            files={"file": (f"test_{i}.png", fake_png(), "image/png")},
+            data={**sample_metadata, "source": "M31", "datasetRelease": f"DR{i}"}
+        )
+    client.post(
+        "/upload",
+        files={"file": ("other.png", fake_png(), "image/png")},
+        data={**sample_metadata, "source": "M33"}
+    )
+
+    first = client.get("/images", params={"q": "m31", "limit": 2})
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    assert "X-Next-Cursor" in first.headers
+
+    second = client.get("/images", params={"q": "m31", "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+
+    narrowed = client.get("/images", params={"q": "M31 DR1"})
+    assert [img["datasetRelease"] for img in narrowed.json()] == ["DR1"]
+
+
+def test_images_stream_json_array(client, fake_png, sample_metadata):
+    """Test that stream=1 returns every matching image as one streamed JSON array"""
+    for i in range(3):
+        client.post(
+            "/upload",
+            files={"file": (f"test_{i}.png", fake_png(), "image/png")},
+            data=sample_metadata
+        )
+
+    paged = client.get("/images", params={"limit": 1})
+    streamed = client.get("/images", params={"stream": 1, "limit": 1})
+
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"].startswith("application/json")
+    data = streamed.json()
+    assert len(data) == 3
+    assert data[0] == paged.json()[0]
+
+
+def test_images_stream_ndjson(client, fake_png, sample_metadata):
+    """Test that Accept: application/x-ndjson streams one JSON object per line"""
+    import json
+
+    for i in range(2):
+        client.post(
+            "/upload",
+            files={"file": (f"test_{i}.png", fake_png(), "image/png")},
+            data={**sample_metadata, "source": f"Source {i}"}
+        )
+
+    response = client.get(
+        "/images",
+        params={"source": "Source 1"},
+        headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["source"] for line in lines] == ["Source 1"]
+
+
+def test_images_stream_empty(client):
+    """Test that an empty streamed listing is still valid JSON"""
+    response = client.get("/images", params={"stream": "true"})
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_images_listing_matches_upload_response(client, sample_image, sample_metadata):
+    """Test that the fast listing serializer emits exactly what the upload endpoint returns"""
+    filename, file_bytes, content_type = sample_image
+    uploaded = client.post(
+        "/upload",
+        files={"file": (filename, file_bytes, content_type)},
+        data=sample_metadata
+    ).json()
+
+    listed = client.get("/images").json()
+
+    assert listed == [uploaded]
+
+
+def test_images_conditional_get(client, fake_png, sample_metadata):
+    """Test that If-None-Match gets a 304 until the catalog changes"""
+    first = client.get("/images")
+    etag = first.headers["ETag"]
+
+    not_modified = client.get("/images", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    client.post(
+        "/upload",
+        files={"file": ("test.png", fake_png(), "image/png")},
+        data=sample_metadata
+    )
+
+    modified = client.get("/images", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["ETag"] != etag
+    assert len(modified.json()) == 1
+
+
+def test_images_etag_depends_on_query(client):
+    """Test that equivalent queries share an ETag and different ones do not"""
+    a = client.get("/images", params={"source": "M31", "isPublic": "true"})
+    b = client.get("/images", params={"isPublic": "true", "source": "M31", "copyright": ""})
+    c = client.get("/images", params={"source": "M33"})
+
+    assert a.headers["ETag"] == b.headers["ETag"]
+    assert a.headers["ETag"] != c.headers["ETag"]
@@ -0,0 +1,134 @@
+import pytest
+
+from src.app.services import derivatives, media
+
+
+def _upload(client, sample_image, is_public: bool) -> dict:
+    filename, file_bytes, content_type = sample_image
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "DR1",
+            "description": "Test description",
+            "dataProcessingStages": "Raw",
+            "coordinates": "RA: 10h20m30s, DEC: +45°",
+            "isPublic": "true" if is_public else "false",
+        },
+        files={"file": (filename, file_bytes, content_type)},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_public_media_served_with_range_support(client, sample_image):
+    image = _upload(client, sample_image, is_public=True)
+    original = sample_image[1].getvalue()
+
+    response = client.get(f"/media/{image['filename']}")
+    assert response.status_code == 200
+    assert response.content == original
+    assert response.headers["Cache-Control"].startswith("public")
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    partial = client.get(f"/media/{image['filename']}", headers={"Range": "bytes=8-15"})
+    assert partial.status_code == 206
+    assert partial.content == original[8:16]
+    assert partial.headers["Content-Range"] == f"bytes 8-15/{len(original)}"
+
+    thumbnail = image["thumbnails"]["160"].removeprefix("/uploads/")
+    assert client.get(f"/media/{thumbnail}").status_code == 200
+
+
+def test_private_media_needs_admin_token_or_signature(client, sample_image, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("SECRET_KEY", "signing-key")
+    image = _upload(client, sample_image, is_public=False)
+    name = image["filename"]
+    thumbnail = derivatives.derivative_filename(name, "thumb", 320)
+
+    # Same answer as for a file that does not exist, derivatives included
+    assert client.get(f"/media/{name}").status_code == 404
+    assert client.get(f"/media/{thumbnail}").status_code == 404
+    assert client.get("/media/missing.png").status_code == 404
+
+    response = client.get(f"/media/{name}", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == media.PRIVATE_CACHE_CONTROL
+
+    signed = client.get(f"/admin/media/{thumbnail}/signed-url", headers={"X-Admin-Token": "s3cret"}).json()["url"]
+    assert signed.startswith(f"/uploads/{thumbnail}?")
+    assert client.get(signed.replace("/uploads/", "/media/", 1)).status_code == 200
+
+    expired = media.sign_media_path(name, ttl=-1)
+    assert client.get(expired.replace("/uploads/", "/media/", 1)).status_code == 404
+    # A signature is only valid for the file it was issued for
+    query = signed.split("?", 1)[1]
+    assert client.get(f"/media/{name}?{query}").status_code == 404
+
+
+def test_anonymous_listings_yield_no_readable_url_for_private_images(client, sample_image, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("SECRET_KEY", "signing-key")
+    public = _upload(client, sample_image, is_public=True)
+    sample_image[1].seek(0)
+    private = _upload(client, sample_image, is_public=False)
+    assert private["url"] is None and private["thumbnails"] is None and private["previews"] is None
+
+    def listed(**headers):
+        return {image["isPublic"]: image for image in client.get("/images", headers=headers).json()}
+
+    # Admin listing first: its signed body must not be served to anonymous callers from the cache
+    signed = listed(**{"X-Admin-Token": "s3cret"})[False]
+    for url in (signed["url"], signed["thumbnails"]["160"], signed["previews"]["800"]):
+        assert "signature=" in url
+        assert client.get(url.replace("/uploads/", "/media/", 1)).status_code == 200
+
+    anonymous = listed()
+    assert anonymous[True]["url"] == f"/uploads/{public['filename']}"
+    assert "?" not in anonymous[True]["thumbnails"]["160"]
+    assert (anonymous[False]["url"], anonymous[False]["thumbnails"], anonymous[False]["previews"]) == (None, None, None)
+    assert "signature" not in client.get("/images", params={"stream": 1}).text
+    cone = client.get("/images/cone", params={"ra": 155.125, "dec": 45.0, "radius": 1.0}).json()
+    assert len(cone) == 2 and "signature" not in str(cone)
+    assert client.get(f"/media/{private['filename']}").status_code == 404
+
+
+def test_media_handed_to_nginx_with_accel_redirect(client, sample_image, monkeypatch):
+    monkeypatch.setattr(media, "ACCEL_PREFIX", "/_media/")
+    image = _upload(client, sample_image, is_public=True)
+
+    response = client.get(f"/media/{image['filename']}")
+    assert response.status_code == 200
+    name = image["filename"]
+    assert response.headers["X-Accel-Redirect"] == f"/_media/{name[:2]}/{name[2:4]}/{name}"
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("name", [".blobs", "..", "a..png", "image.exe"])
+def test_media_rejects_names_outside_the_catalog(name):
+    assert not media.is_media_name(name) or media.candidate_originals(name) == []
+
+
+def test_verify_signature():
+    with pytest.raises(media.InvalidSignatureError):
+        media.verify_signature("a.png", None, None)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("SECRET_KEY", "k")
+        query = media.sign_media_path("a.png", ttl=60, now=1000).split("?", 1)[1]
+        params = dict(item.split("=", 1) for item in query.split("&"))
+        media.verify_signature("a.png", params["expires"], params["signature"], now=1059)
+        with pytest.raises(media.InvalidSignatureError):
+            media.verify_signature("a.png", params["expires"], params["signature"], now=1061)
+
+
+def test_listing_expiry_outlives_the_window():
+    ttl = media.SIGNED_URL_TTL
+    window_start = 1000 * ttl
+    for now in (window_start, window_start + ttl - 1):
+        assert media.listing_window(now) == 1000
+        assert media.listing_expiry(now) == window_start + 2 * ttl
+        # A body built or revalidated anywhere in the window keeps working for a full TTL
+        assert media.listing_expiry(now) - (window_start + ttl) >= ttl
@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+from scripts.metadata_transfer import detect_format, export_catalog, import_catalog, normalize_record, reconcile
+from src.app.database.crud import create_image_from_upload, create_image_metadata, get_image_by_filename, search_images
+from src.app.database.database import Base
+from src.app.database.models import ImageBlob
+from src.app.models.schemas import ImageMetadataCreate
+from src.app.services import storage
+
+
+def build_metadata(**overrides):
+    data = {
+        "source": "Euclid",
+        "copyright": "© ESA 2026",
+        "datasetRelease": "Q1",
+        "description": "Deep field, \"stacked\"\nsecond line",
+        "dataProcessingStages": "Raw → Stacked",
+        "coordinates": "RA: 10h00m00s, DEC: +02°00'00\"",
+        "isPublic": True,
+    }
+    data.update(overrides)
+    return ImageMetadataCreate(**data)
+
+
+@pytest.fixture
+def catalog(db_session, sample_image, temp_upload_dir, monkeypatch):
+    """Two uploads sharing a blob, one FITS-like row with a header, and a row whose file is gone"""
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    content = sample_image[1].getvalue()
+    stored = []
+    for source in ("M31", "M33"):
+        writer = storage.StreamingFileWriter("mosaic.png")
+        writer.write(content)
+        writer.finish()
+        with writer:
+            stored.append(create_image_from_upload(db_session, writer, build_metadata(source=source)).filename)
+
+    create_image_metadata(db_session, "frame.fits", build_metadata(source="VIS", coordinates="tile_001"),
+                          fits_header={"FILTER": "VIS", "EXPTIME": 560.0, "SIMPLE": True})
+    with open(os.path.join(temp_upload_dir, "frame.fits"), "wb") as f:
+        f.write(b"SIMPLE  =                    T")
+    create_image_metadata(db_session, "gone.png", build_metadata(source="Lost"))
+    return stored
+
+
+def _reset(db_session):
+    db_session.close()
+    Base.metadata.drop_all(bind=db_session.get_bind())
+    Base.metadata.create_all(bind=db_session.get_bind())
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson", "parquet"])
+def test_export_import_round_trip(db_session, catalog, tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"catalog.{fmt}")
+
+    assert export_catalog(db_session, path, detect_format(path), chunk_size=2) == 4
+    _reset(db_session)
+
+    assert import_catalog(db_session, path, fmt, chunk_size=2) == (3, 0, 1)
+
+    first = get_image_by_filename(db_session, catalog[0])
+    assert first.source == "M31"
+    assert first.description == "Deep field, \"stacked\"\nsecond line"
+    assert first.is_public is True
+    assert first.ra == pytest.approx(150.0)
+    assert first.upload_date is not None
+    assert db_session.get(ImageBlob, first.sha256).ref_count == 2
+    assert get_image_by_filename(db_session, "frame.fits").fits_header == {"FILTER": "VIS", "EXPTIME": 560.0, "SIMPLE": True}
+    assert get_image_by_filename(db_session, "gone.png") is None
+    assert [image.source for image in search_images(db_session, "m33")] == ["M33"]
+
+    # Running it again only finds existing rows
+    assert import_catalog(db_session, path, fmt) == (0, 3, 1)
+    db_session.expire_all()
+    assert db_session.get(ImageBlob, first.sha256).ref_count == 2
+
+
+def test_import_keep_missing_and_blob_reconciliation(db_session, catalog, tmp_path, temp_upload_dir):
+    path = str(tmp_path / "catalog.ndjson")
+    export_catalog(db_session, path, "ndjson")
+    _reset(db_session)
+    # The blob store of the target lacks the content: rows are kept without a blob reference
+    os.remove(storage.get_blob_path(json.loads(open(path).readline())["sha256"]))
+
+    assert import_catalog(db_session, path, "ndjson", keep_missing=True) == (4, 0, 0)
+
+    assert get_image_by_filename(db_session, "gone.png") is not None
+    assert get_image_by_filename(db_session, catalog[0]).sha256 is None
+    assert db_session.query(ImageBlob).count() == 0
+
+
+def test_normalize_record_from_postgresql_csv():
+    values = normalize_record({
+        "filename": "a.png", "source": "s", "copyright": "c", "dataset_release": "d", "description": "e",
+        "data_processing_stages": "f", "coordinates": "150.0, 2.0", "is_public": "t",
+        "upload_date": "2026-10-16 12:00:00.5+00", "sha256": "", "has_derivatives": "f",
+        "fits_header": "", "ra": "", "dec": "", "sky_cell": "",
+    })
+
+    assert values["is_public"] is True and values["has_derivatives"] is False
+    assert values["upload_date"].isoformat() == "2026-10-16T12:00:00.500000+00:00"
+    assert values["sha256"] is None and values["fits_header"] is None
+    # Positions missing from the file are parsed from coordinates
+    assert (values["ra"], values["dec"]) == (150.0, 2.0)
+
+
+def test_normalize_record_requires_metadata():
+    with pytest.raises(ValueError):
+        normalize_record({"filename": "a.png", "source": "", "is_public": True})
+
+
+def test_reconcile_reports_both_sides(db_session, catalog, temp_upload_dir):
+    with open(os.path.join(temp_upload_dir, "stray.png"), "wb") as f:
+        f.write(b"x")
+
+    missing_files, orphans = reconcile(db_session)
+
+    assert missing_files == ["gone.png"]
+    assert orphans == ["stray.png"]
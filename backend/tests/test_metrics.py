@@ -0,0 +1,65 @@
+import re
+
+from sqlalchemy import text
+
+from src.app.services import metrics
+
+
+def sample(exposition, name, **labels):
+    """Value of one sample in a Prometheus text exposition, 0 when absent"""
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    series = f"{name}{{{selector}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", exposition, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_label_requests_by_route_template(client):
+    client.get("/images/missing.png/header")
+    client.get("/images/other.png/header")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert sample(text, "prepix_http_request_duration_seconds_count",
+                  method="GET", route="/images/{filename}/header", status="404") >= 2
+    assert "missing.png" not in text
+    assert "prepix_threadpool_capacity" in text
+
+
+def test_metrics_time_statements_by_type(db_session):
+    metrics.instrument_engine(db_session.get_bind(), "test")
+    db_session.execute(text("SELECT 1"))
+
+    exposition = metrics.render_latest().decode()
+
+    assert sample(exposition, "prepix_db_statement_duration_seconds_count", engine="test", statement="select") >= 1
+    assert "prepix_db_pool_checkout_seconds_count" in exposition
+
+
+def test_metrics_count_upload_bytes_and_stages(client, sample_image):
+    filename, file_bytes, content_type = sample_image
+    before = metrics.render_latest().decode()
+
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "Q1",
+            "description": "Field",
+            "dataProcessingStages": "Stacked",
+            "coordinates": "tile_001",
+            "isPublic": "true"
+        },
+        files={"file": (filename, file_bytes, content_type)}
+    )
+    assert response.status_code == 200
+
+    after = client.get("/metrics").text
+    size = len(file_bytes.getvalue())
+    assert sample(after, "prepix_upload_bytes_total") - sample(before, "prepix_upload_bytes_total") == size
+    for stage in ("validate_mime", "write_upload", "derivatives", "store"):
+        assert sample(after, "prepix_upload_stage_seconds_count", stage=stage) > sample(
+            before, "prepix_upload_stage_seconds_count", stage=stage)
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+
+from scripts.migrate_layout import migrate
+from src.app.services import storage, tiles
+
+UPLOAD = "0a1b2c3d-aaaa-4bbb-8ccc-123456789abc.png"
+THUMBNAIL = "0a1b2c3d-aaaa-4bbb-8ccc-123456789abc.thumb-160.webp"
+SHA256 = "f00d" + "0" * 60
+
+
+def _flat_tree(root: Path) -> None:
+    """An upload dir in the old layout: an upload hard-linked to its blob, a derivative and a pyramid"""
+    (root / storage.BLOB_DIR_NAME).mkdir()
+    (root / storage.BLOB_DIR_NAME / SHA256).write_bytes(b"content")
+    os.link(root / storage.BLOB_DIR_NAME / SHA256, root / UPLOAD)
+    (root / THUMBNAIL).write_bytes(b"webp")
+    (root / "legacy name.png").write_bytes(b"imported")
+    pyramid = root / tiles.TILES_DIR_NAME / UPLOAD
+    pyramid.mkdir(parents=True)
+    (pyramid / tiles.PYRAMID_INFO).write_text("{}")
+    # In-flight upload: left alone
+    (root / ".upload-abc").write_bytes(b"partial")
+
+
+def test_shard_dirs():
+    assert storage.shard_dirs(UPLOAD) == ("0a", "1b")
+    assert storage.shard_dirs(THUMBNAIL) == storage.shard_dirs(UPLOAD)
+    assert storage.shard_dirs(SHA256) == ("f0", "0d")
+    # Names without a hex prefix are spread by hash, derivatives still next to their original
+    assert storage.shard_dirs("m31.png") == storage.shard_dirs("m31.thumb-160.webp")
+
+
+def test_lookups_fall_back_to_the_flat_layout_until_migrated(temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    root = Path(temp_upload_dir)
+    _flat_tree(root)
+
+    assert storage.get_upload_path(UPLOAD) == root / UPLOAD
+    assert storage.get_blob_path(SHA256) == root / storage.BLOB_DIR_NAME / SHA256
+    assert tiles.get_tiles_dir(UPLOAD) == root / tiles.TILES_DIR_NAME / UPLOAD
+    # New names go to the sharded layout right away
+    assert storage.get_upload_path("0a1b0000-new.png") == root / "0a" / "1b" / "0a1b0000-new.png"
+
+    assert migrate(rate=0) == (5, 0)
+
+    assert storage.layout_migrated()
+    assert storage.get_upload_path(UPLOAD) == root / "0a" / "1b" / UPLOAD
+    assert storage.get_upload_path(THUMBNAIL).read_bytes() == b"webp"
+    assert storage.get_upload_path("legacy name.png").read_bytes() == b"imported"
+    assert os.path.samefile(storage.get_upload_path(UPLOAD), storage.get_blob_path(SHA256))
+    assert storage.get_blob_path(SHA256) == root / storage.BLOB_DIR_NAME / "f0" / "0d" / SHA256
+    assert (tiles.get_tiles_dir(UPLOAD) / tiles.PYRAMID_INFO).exists()
+    assert (root / ".upload-abc").exists()
+    assert sorted(storage.iter_upload_names()) == sorted([UPLOAD, THUMBNAIL, "legacy name.png"])
+
+    # Nothing left to do on a second run
+    assert migrate(rate=0) == (0, 0)
+
+
+def test_migration_leaves_conflicts_and_is_resumable(temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    root = Path(temp_upload_dir)
+    (root / UPLOAD).write_bytes(b"old")
+    (root / THUMBNAIL).write_bytes(b"webp")
+    conflicting = storage.sharded_path(root, UPLOAD)
+    conflicting.parent.mkdir(parents=True)
+    conflicting.write_bytes(b"other")
+
+    assert migrate(rate=0) == (1, 1)
+    assert not storage.layout_migrated()
+    assert (root / UPLOAD).exists()
+
+    conflicting.unlink()
+    assert migrate(rate=0) == (1, 0)
+    assert storage.layout_migrated()
+    assert storage.get_upload_path(UPLOAD).read_bytes() == b"old"
+
+
+def test_dry_run_moves_nothing(temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("UPLOAD_PATH", temp_upload_dir)
+    root = Path(temp_upload_dir)
+    (root / UPLOAD).write_bytes(b"old")
+
+    assert migrate(rate=0, dry_run=True) == (1, 0)
+    assert (root / UPLOAD).exists()
+    assert not storage.layout_migrated()
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from src.app.services import object_storage
+from src.app.services.object_storage import LocalStorageBackend, S3StorageBackend
+
+MB = 1024 * 1024
+
+
+class FakeClientError(Exception):
+    """Shaped like botocore's ClientError"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3:
+    """
+    In-memory stand-in for an S3-compatible service (the subset of the boto3 client we use), with
+    S3's multipart rules: parts of at least 5 MiB but the last, assembled in part number order.
+    """
+
+    def __init__(self, fail_part=None, part_delay=0.0):
+        self.objects = {}
+        self.content_types = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_part = fail_part
+        self.part_delay = part_delay
+        self.concurrent_parts = self.max_concurrent_parts = 0
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[(Bucket, Key)] = Body.read()
+        self.content_types[(Bucket, Key)] = ContentType
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {"key": (Bucket, Key), "parts": {}, "content_type": ContentType}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.concurrent_parts += 1
+            self.max_concurrent_parts = max(self.max_concurrent_parts, self.concurrent_parts)
+        try:
+            time.sleep(self.part_delay)
+            if PartNumber == self.fail_part:
+                raise FakeClientError("InternalError")
+            self.uploads[UploadId]["parts"][PartNumber] = bytes(Body)
+            return {"ETag": f'"etag-{PartNumber}"'}
+        finally:
+            with self._lock:
+                self.concurrent_parts -= 1
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        assert numbers == sorted(upload["parts"]) == list(range(1, len(numbers) + 1))
+        assert all(part["ETag"] == f'"etag-{part["PartNumber"]}"' for part in MultipartUpload["Parts"])
+        assert all(len(upload["parts"][number]) >= 5 * MB for number in numbers[:-1])
+        self.objects[upload["key"]] = b"".join(upload["parts"][number] for number in numbers)
+        self.content_types[upload["key"]] = upload["content_type"]
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(UploadId)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        assert operation == "get_object"
+        return f"http://minio:9000/{Params['Bucket']}/{Params['Key']}?X-Amz-Expires={ExpiresIn}&X-Amz-Signature=fake"
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    path = tmp_path / "mosaic.fits"
+    path.write_bytes(os.urandom(23 * MB))
+    return path
+
+
+def test_large_files_are_sent_as_parallel_multipart_uploads(large_file):
+    s3 = FakeS3(part_delay=0.02)
+    backend = S3StorageBackend("prepix", client=s3, prefix="media", part_size=5 * MB, max_concurrency=4)
+
+    backend.put_file(str(large_file), "ab/cd/mosaic.fits", "image/fits")
+
+    assert s3.objects[("prepix", "media/ab/cd/mosaic.fits")] == large_file.read_bytes()
+    assert s3.content_types[("prepix", "media/ab/cd/mosaic.fits")] == "image/fits"
+    assert 1 < s3.max_concurrent_parts <= 4
+    assert backend.exists("ab/cd/mosaic.fits")
+    assert not backend.exists("ab/cd/other.fits")
+
+
+def test_failed_multipart_upload_is_aborted(large_file):
+    s3 = FakeS3(fail_part=3)
+    backend = S3StorageBackend("prepix", client=s3, part_size=5 * MB)
+
+    with pytest.raises(FakeClientError):
+        backend.put_file(str(large_file), "ab/cd/mosaic.fits")
+
+    assert s3.aborted == ["upload-0"]
+    assert s3.uploads == {} and s3.objects == {}
+
+
+def test_small_files_take_a_single_put(tmp_path):
+    s3 = FakeS3()
+    backend = S3StorageBackend("prepix", client=s3)
+    path = tmp_path / "thumb.webp"
+    path.write_bytes(b"RIFF....WEBP")
+
+    backend.put_file(str(path), "ab/cd/thumb.webp", "image/webp")
+
+    assert s3.objects == {("prepix", "ab/cd/thumb.webp"): b"RIFF....WEBP"}
+    assert s3.uploads == {}
+    backend.delete("ab/cd/thumb.webp")
+    assert s3.objects == {}
+
+
+def test_local_backend(tmp_path):
+    backend = LocalStorageBackend(str(tmp_path / "uploads"))
+    source = tmp_path / "upload.png"
+    source.write_bytes(b"png")
+
+    key = object_storage.upload_key("0a1b2c3d.png")
+    assert key == "0a/1b/0a1b2c3d.png"
+    backend.put_file(str(source), key)
+    assert backend.path(key).read_bytes() == b"png"
+    assert backend.exists(key) and backend.presigned_url(key, 60) is None
+    backend.delete(key)
+    assert not backend.exists(key)
+
+
+@pytest.fixture
+def s3_backend():
+    s3 = FakeS3()
+    object_storage.set_storage_backend(S3StorageBackend("prepix", client=s3))
+    yield s3
+    object_storage.set_storage_backend(None)
+
+
+def test_uploads_are_published_and_served_through_presigned_urls(client, sample_image, s3_backend):
+    filename, file_bytes, content_type = sample_image
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "DR1",
+            "description": "Test description",
+            "dataProcessingStages": "Raw",
+            "coordinates": "RA: 10h20m30s, DEC: +45°",
+            "isPublic": "true",
+        },
+        files={"file": (filename, file_bytes, content_type)},
+    )
+    assert response.status_code == 200
+    image = response.json()
+
+    blob = ("prepix", object_storage.blob_key(hashlib.sha256(file_bytes.getvalue()).hexdigest()))
+    assert s3_backend.objects[blob] == file_bytes.getvalue()
+    assert s3_backend.content_types[blob] == "image/png"
+    thumbnail = image["thumbnails"]["160"].removeprefix("/uploads/")
+    assert ("prepix", object_storage.upload_key(thumbnail)) in s3_backend.objects
+
+    redirect = client.get(f"/media/{image['filename']}", follow_redirects=False)
+    assert redirect.status_code == 307
+    assert redirect.headers["Location"].startswith(f"http://minio:9000/prepix/{blob[1]}?")
+    redirect = client.get(f"/media/{thumbnail}", follow_redirects=False)
+    assert redirect.headers["Location"].startswith(f"http://minio:9000/prepix/{object_storage.upload_key(thumbnail)}?")
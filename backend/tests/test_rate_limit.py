@@ -0,0 +1,128 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks import bench_rate_limit
+from src.app.services import rate_limit
+from src.app.services.rate_limit import Budget, MemoryBucketStore, RateLimitMiddleware, SharedMemoryBucketStore
+
+
+def test_parse_budget():
+    assert rate_limit.parse_budget("20/minute") == Budget(20 / 60, 20.0)
+    assert rate_limit.parse_budget("10/second burst 50") == Budget(10.0, 50.0)
+    assert rate_limit.parse_budget("100/hours") == Budget(100 / 3600, 100.0)
+    with pytest.raises(ValueError):
+        rate_limit.parse_budget("20 per minute")
+
+
+@pytest.fixture(params=["memory", "shared"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return SharedMemoryBucketStore(str(tmp_path / "buckets"), slots=64)
+
+
+def test_token_bucket_refills(store):
+    budget = Budget(rate=1.0, burst=3.0)
+
+    assert [store.take("a", budget, now=100.0)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = store.take("a", budget, now=100.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    # Other keys have their own bucket
+    assert store.take("b", budget, now=100.0)[0]
+    # 1.5 s later one token is back, half of the next one too
+    assert store.take("a", budget, now=101.5) == (True, 0.0)
+    allowed, retry_after = store.take("a", budget, now=101.5)
+    assert not allowed and retry_after == pytest.approx(0.5)
+
+
+def test_shared_store_recycles_the_least_recent_slot(tmp_path):
+    store = SharedMemoryBucketStore(str(tmp_path / "buckets"), slots=rate_limit.PROBE_LIMIT)
+    budget = Budget(rate=0.001, burst=1.0)
+    for i in range(rate_limit.PROBE_LIMIT):
+        assert store.take(f"client-{i}", budget, now=float(i))[0]
+
+    # The table is full: a new key takes over the slot of client-0, which starts over
+    assert store.take("newcomer", budget, now=100.0)[0]
+    assert store.take("client-0", budget, now=100.0)[0]
+    assert not store.take("client-7", budget, now=100.0)[0]
+
+
+def _drain(path: str) -> int:
+    store = SharedMemoryBucketStore(path, slots=64)
+    budget = Budget(rate=1e-6, burst=20.0)
+    return sum(store.take("shared-client", budget)[0] for _ in range(15))
+
+
+def test_shared_store_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "buckets")
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("fork")) as pool:
+        allowed = sum(pool.map(_drain, [path] * 4))
+
+    # 60 attempts from 4 processes, one bucket of 20
+    assert allowed == 20
+
+
+def _scope(peer: str, forwarded=None):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded or []]
+    return {"client": (peer, 1234), "headers": headers}
+
+
+def test_client_address_from_forwarded_for():
+    trusted = rate_limit.parse_networks("127.0.0.0/8,172.16.0.0/12")
+
+    # Through nginx: the hop nginx appended is the client, whatever the client claimed before it
+    assert rate_limit.client_address(_scope("172.18.0.5", ["6.6.6.6, 203.0.113.7"]), trusted) == "203.0.113.7"
+    assert rate_limit.client_address(_scope("172.18.0.5", ["203.0.113.7", "172.18.0.9"]), trusted) == "203.0.113.7"
+    assert rate_limit.client_address(_scope("172.18.0.5"), trusted) == "172.18.0.5"
+    # Straight from a client: its header is ignored
+    assert rate_limit.client_address(_scope("198.51.100.1", ["203.0.113.7"]), trusted) == "198.51.100.1"
+
+
+def test_middleware_per_route_budgets():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, store=MemoryBucketStore(),
+                       budgets={"read": "5/minute", "write": "1/minute"}, trusted_proxies="127.0.0.1/32")
+
+    @app.get("/images")
+    def images():
+        return []
+
+    @app.post("/upload")
+    def upload():
+        return {}
+
+    @app.get("/metrics")
+    def metrics():
+        return ""
+
+    client = TestClient(app, client=("127.0.0.1", 50000))
+    alice = {"X-Forwarded-For": "203.0.113.1"}
+    bob = {"X-Forwarded-For": "203.0.113.2"}
+
+    assert client.post("/upload", headers=alice).status_code == 200
+    response = client.post("/upload", headers=alice)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 60
+    # Reads have their own budget, and other clients their own buckets
+    assert client.get("/images", headers=alice).status_code == 200
+    assert client.post("/upload", headers=bob).status_code == 200
+    assert [client.get("/metrics", headers=alice).status_code for _ in range(10)] == [200] * 10
+
+
+def test_rate_limit_benchmark_smoke():
+    rows = bench_rate_limit.run([1, 100], 200)
+
+    assert [(name, clients) for name, clients, _, _ in rows] == [
+        ("memory", 1), ("memory", 100), ("shared", 1), ("shared", 100)
+    ]
+
+
+def test_budget_names():
+    assert rate_limit.budget_name("GET", "/images") == "read"
+    assert rate_limit.budget_name("HEAD", "/media/a.png") == "media"
+    assert rate_limit.budget_name("POST", "/upload") == "write"
+    assert rate_limit.budget_name("GET", "/metrics") is None
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from src.app.database import crud
+from src.app.database.models import ImageMetadata
+from src.app.models.schemas import ImageMetadataCreate
+from src.app.services import sky
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("RA: 00h42m44s, DEC: +41°16'09\"", (10.68333, 41.26917)),
+    ("RA: 10h20m30s, DEC: +45°", (155.125, 45.0)),
+    ("RA: 10h00m00.0s, DEC: -02°30'00.0\"", (150.0, -2.5)),
+    ("00:42:44 +41:16:09", (10.68333, 41.26917)),
+    ("23 59 60.0 -00 30 00", None),
+    ("10.6847, 41.2687", (10.6847, 41.2687)),
+    ("RA=150.1 Dec=-2.2", (150.1, -2.2)),
+])
+def test_parse_coordinates(text, expected):
+    position = sky.parse_coordinates(text)
+
+    if expected is None:
+        assert position is None
+    else:
+        assert position == pytest.approx(expected, abs=1e-5)
+
+
+@pytest.mark.parametrize("text", ["tile_001", "EDF-North tile 102", "", "RA: 25h00m00s, DEC: +10°", "400, 10", "10, 95"])
+def test_parse_coordinates_rejects_non_positions(text):
+    assert sky.parse_coordinates(text) is None
+
+
+def test_angular_distance_is_vectorized_and_exact():
+    distances = sky.angular_distance(10.0, 0.0, [10.0, 11.0, 190.0, 10.0], [0.0, 0.0, 0.0, 90.0])
+
+    assert distances == pytest.approx([0.0, 1.0, 180.0, 90.0])
+    # RA differences shrink with cos(dec)
+    assert sky.angular_distance(0.0, 60.0, [2.0], [60.0])[0] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_cone_bounds_wrap_and_poles():
+    cells, (dec_min, dec_max), intervals = sky.cone_bounds(359.5, 0.0, 1.0)
+
+    assert (dec_min, dec_max) == (-1.0, 1.0)
+    assert cells == list(range(sky.sky_cell(-1.0), sky.sky_cell(1.0) + 1))
+    assert intervals == [pytest.approx((358.5, 360.0)), pytest.approx((0.0, 0.5))]
+
+    _, _, polar = sky.cone_bounds(120.0, 89.5, 1.0)
+    assert polar == [(0.0, 360.0)]
+
+
+def _create(db, filename, coordinates):
+    metadata = ImageMetadataCreate(
+        source="Euclid",
+        copyright="© ESA 2026",
+        datasetRelease="Q1",
+        description="Field",
+        dataProcessingStages="Stacked",
+        coordinates=coordinates,
+        isPublic=True,
+    )
+    return crud.create_image_metadata(db, filename, metadata)
+
+
+def test_create_and_update_store_sky_position(db_session):
+    image = _create(db_session, "m31.png", "RA: 00h42m44s, DEC: +41°16'09\"")
+
+    assert image.ra == pytest.approx(10.68333, abs=1e-5)
+    assert image.sky_cell == sky.sky_cell(image.dec)
+
+    metadata = ImageMetadataCreate(
+        source="Euclid",
+        copyright="© ESA 2026",
+        datasetRelease="Q1",
+        description="Field",
+        dataProcessingStages="Stacked",
+        coordinates="tile_001",
+        isPublic=True,
+    )
+    image = crud.update_image_metadata(db_session, "m31.png", metadata)
+    assert (image.ra, image.dec, image.sky_cell) == (None, None, None)
+
+
+def test_cone_search_prunes_then_refines(db_session):
+    _create(db_session, "center.png", "150.0, 2.0")
+    _create(db_session, "near.png", "150.3, 2.0")
+    # Inside the RA/Dec box of the cone but outside the cone itself
+    _create(db_session, "corner.png", "150.45, 2.45")
+    _create(db_session, "far.png", "160.0, 2.0")
+    _create(db_session, "tile.png", "tile_001")
+
+    matches = crud.cone_search(db_session, 150.0, 2.0, 0.5)
+
+    assert [(row.filename, round(distance, 3)) for row, distance in matches] == [("center.png", 0.0), ("near.png", 0.3)]
+    candidates = db_session.execute(crud.build_cone_query(crud.LISTING_COLUMNS, 150.0, 2.0, 0.5)).all()
+    assert {row.filename for row in candidates} == {"center.png", "near.png", "corner.png"}
+
+
+def test_cone_search_fetches_listing_columns_for_the_nearest_only(db_session):
+    for index in range(6):
+        _create(db_session, f"star_{index}.png", f"{150.0 + 0.05 * index}, 2.0")
+
+    matches = crud.cone_search(db_session, 150.0, 2.0, 0.5, limit=3)
+
+    assert [row.filename for row, _ in matches] == ["star_0.png", "star_1.png", "star_2.png"]
+    assert matches[2][0].description == "Field"
+    candidates = db_session.execute(crud.build_cone_query(crud.CONE_CANDIDATE_COLUMNS, 150.0, 2.0, 0.5)).all()
+    assert len(candidates) == 6 and set(candidates[0]._fields) == {"id", "ra", "dec"}
+    nearest = crud.nearest_in_cone(candidates, 150.0, 2.0, 0.5, limit=2)
+    assert [round(distance, 3) for _, distance in nearest] == [0.0, 0.05]
+
+
+def test_cone_search_across_ra_zero(db_session):
+    _create(db_session, "east.png", "359.8, -0.1")
+    _create(db_session, "west.png", "0.1, 0.1")
+
+    matches = crud.cone_search(db_session, 0.0, 0.0, 0.5)
+
+    assert sorted(row.filename for row, _ in matches) == ["east.png", "west.png"]
+
+
+def test_cone_endpoint(client, sample_image):
+    filename, file_bytes, content_type = sample_image
+    for coordinates in ("RA: 10h00m00s, DEC: +02°00'00\"", "RA: 10h00m48s, DEC: +02°00'00\"", "tile_001"):
+        file_bytes.seek(0)
+        response = client.post(
+            "/upload",
+            data={
+                "source": "Euclid",
+                "copyright": "© ESA 2026",
+                "datasetRelease": "Q1",
+                "description": "COSMOS field",
+                "dataProcessingStages": "Stacked",
+                "coordinates": coordinates,
+                "isPublic": "true"
+            },
+            files={"file": (filename, file_bytes, content_type)}
+        )
+        assert response.status_code == 200
+
+    response = client.get("/images/cone", params={"ra": 150.0, "dec": 2.0, "radius": 0.25})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["coordinates"] for item in data] == ["RA: 10h00m00s, DEC: +02°00'00\"", "RA: 10h00m48s, DEC: +02°00'00\""]
+    assert data[0]["ra"] == pytest.approx(150.0)
+    assert data[1]["distance"] == pytest.approx(0.2, abs=1e-3)
+
+    response = client.get("/images/cone", params={"ra": 150.0, "dec": 2.0, "radius": 0.25},
+                          headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+def test_cone_endpoint_validates_parameters(client):
+    assert client.get("/images/cone", params={"ra": 400, "dec": 0, "radius": 1}).status_code == 422
+    assert client.get("/images/cone", params={"ra": 10, "dec": 0, "radius": 0}).status_code == 422
+    assert client.get("/images/cone", params={"ra": 10, "dec": 0, "radius": 45}).status_code == 422
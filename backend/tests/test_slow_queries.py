@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.app.database.crud import get_filtered_images
+from src.app.services import slow_queries
+
+
+@pytest.fixture
+def slow_log(tmp_path, monkeypatch):
+    """Log every statement to a temporary file, with a plan for each SELECT"""
+    path = str(tmp_path / "slow.jsonl")
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_LOG", path)
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_EXPLAIN_RATE", 1.0)
+    return path
+
+
+def test_normalize_sql():
+    statement = """SELECT id FROM image_metadata
+        WHERE source = 'M31' AND ra > 10.5 AND id IN (?, ?, ?) AND sky_cell = %(sky_cell_1)s LIMIT $1"""
+
+    assert slow_queries.normalize_sql(statement) == (
+        "SELECT id FROM image_metadata WHERE source = ? AND ra > ? AND id IN (...) AND sky_cell = ? LIMIT ?"
+    )
+
+
+def test_parameter_shape_hides_values():
+    assert slow_queries.parameter_shape({"source": "secret", "limit": 20, "ids": [1, 2], "x": None}) == {
+        "source": "str[6]", "limit": "int", "ids": "list[2]", "x": "null"
+    }
+    assert slow_queries.parameter_shape([("a", 1), ("bc", 2)], executemany=True) == {"rows": 2, "row": ["str[1]", "int"]}
+
+
+def test_slow_statements_are_logged_with_plan(slow_log, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    slow_queries.instrument_engine(engine, "test-slow")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO t (name) VALUES (:name)"), [{"name": "a"}, {"name": "b"}])
+        rows = conn.execute(text("SELECT name FROM t WHERE id = :id"), {"id": 2}).all()
+    engine.dispose()
+
+    # The plan ran on its own cursor: the statement result is intact
+    assert rows == [("b",)]
+    entries = [json.loads(line) for line in open(slow_log)]
+    insert, select = entries[1], entries[2]
+    assert insert["statement"] == "INSERT INTO t (name) VALUES (?)"
+    assert insert["parameters"] == {"rows": 2, "row": ["str[1]"]}
+    assert "plan" not in insert
+    assert select["statement"] == "SELECT name FROM t WHERE id = ?"
+    assert select["parameters"] == ["int"]
+    assert any("SEARCH t" in step for step in select["plan"])
+
+
+def test_filter_combinations_get_distinct_fingerprints(db_session, slow_log):
+    slow_queries.instrument_engine(db_session.get_bind(), "test-filters")
+    get_filtered_images(db_session, source="m31")
+    get_filtered_images(db_session, source="m33")
+    get_filtered_images(db_session, source="m31", description="deep")
+
+    groups = slow_queries.summarize(slow_queries.read_entries(engine="test-filters"))
+
+    listings = [group for group in groups if "FROM image_metadata" in group["statement"]]
+    assert sorted(group["count"] for group in listings) == [1, 2]
+
+
+def test_admin_endpoint(client, slow_log, monkeypatch):
+    slow_queries.record({"time": "2026-10-17T00:00:00+00:00", "engine": "async", "duration_ms": 900.0,
+                         "fingerprint": "abc", "statement": "SELECT ?", "parameters": ["int"]})
+
+    assert client.get("/admin/slow-queries").status_code == 404
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/slow-queries", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/admin/slow-queries", params={"min_duration_ms": 500},
+                          headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert [entry["fingerprint"] for entry in response.json()] == ["abc"]
+
+    response = client.get("/admin/slow-queries", params={"summary": "true"}, headers={"X-Admin-Token": "s3cret"})
+    assert response.json()[0]["count"] >= 1
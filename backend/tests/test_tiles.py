@@ -0,0 +1,142 @@
+import json
+from io import BytesIO
+
+from PIL import Image
+
+from src.app.services import media, tiles
+from src.app.services.cache import TileCache
+
+
+def test_build_pyramid_levels_and_tiles(tmp_path):
+    source = tmp_path / "mosaic.png"
+    Image.new("RGB", (600, 300), color="green").save(source)
+    tiles_dir = tmp_path / "tiles"
+
+    info = tiles.build_pyramid(str(source), str(tiles_dir))
+
+    assert info == {"width": 600, "height": 300, "tileSize": 256, "overlap": 0, "format": "webp", "maxLevel": 10}
+    assert json.loads((tiles_dir / tiles.PYRAMID_INFO).read_text()) == info
+    for level in range(info["maxLevel"] + 1):
+        columns, rows = tiles.tile_grid(info, level)
+        names = sorted(path.name for path in (tiles_dir / str(level)).iterdir())
+        assert names == sorted(f"{x}_{y}.webp" for x in range(columns) for y in range(rows))
+
+    # Full resolution: 3 x 2 tiles, the last column and row cut to the image edge
+    with Image.open(tiles_dir / "10" / "2_1.webp") as tile:
+        assert tile.size == (600 - 512, 300 - 256)
+        assert tile.convert("RGB").getpixel((0, 0))[1] > 100
+    # Level 9 halves the image, rounding up
+    assert tiles.level_size(info, 9) == (300, 150)
+    with Image.open(tiles_dir / "9" / "1_0.webp") as tile:
+        assert tile.size == (300 - 256, 150)
+    with Image.open(tiles_dir / "0" / "0_0.webp") as tile:
+        assert tile.size == (1, 1)
+    # Nothing left over from the scratch build directory
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["mosaic.png", "tiles"]
+
+
+def test_halve_rounds_odd_sizes_up():
+    import numpy as np
+
+    band = np.arange(3 * 5 * 1, dtype=np.uint8).reshape(3, 5, 1)
+
+    halved = tiles._halve(band)
+
+    assert halved.shape == (2, 3, 1)
+    assert halved[1, 2, 0] == band[2, 4, 0]
+
+
+def test_tile_cache_is_bounded_in_bytes():
+    cache = TileCache(max_bytes=10)
+    cache.put(("a.png", 0, 0, 0), b"12345")
+    cache.put(("a.png", 1, 0, 0), b"12345")
+    cache.get(("a.png", 0, 0, 0))
+    cache.put(("b.png", 0, 0, 0), b"123")
+
+    assert cache.get(("a.png", 1, 0, 0)) is None
+    assert cache.get(("a.png", 0, 0, 0)) == b"12345"
+    assert cache.size == 8
+
+    cache.discard("a.png")
+    assert cache.get(("a.png", 0, 0, 0)) is None
+    assert cache.size == 3
+
+
+def upload_image(client, size, is_public=True):
+    image_bytes = BytesIO()
+    Image.new("RGB", size, color="red").save(image_bytes, format="PNG")
+    image_bytes.seek(0)
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "ESA",
+            "datasetRelease": "DR1",
+            "description": "Mosaic",
+            "dataProcessingStages": "Stacked",
+            "coordinates": "RA 0 DEC 0",
+            "isPublic": "true" if is_public else "false"
+        },
+        files={"file": ("mosaic.png", image_bytes, "image/png")}
+    )
+    assert response.status_code == 200
+    return response.json()["filename"]
+
+
+def test_get_image_tiles(client, temp_upload_dir):
+    filename = upload_image(client, (700, 400))
+
+    response = client.get(f"/images/{filename}/tiles")
+    assert response.status_code == 200
+    info = response.json()
+    assert info["width"] == 700 and info["maxLevel"] == 10
+    assert info["url"] == f"/images/{filename}/tiles/{{z}}/{{x}}/{{y}}"
+
+    response = client.get(f"/images/{filename}/tiles/10/2/1")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    with Image.open(BytesIO(response.content)) as tile:
+        assert tile.size == (700 - 512, 400 - 256)
+
+    assert client.get(f"/images/{filename}/tiles/10/3/0").status_code == 404
+    assert client.get(f"/images/{filename}/tiles/11/0/0").status_code == 404
+
+
+def test_get_image_tile_builds_on_first_request(client, temp_upload_dir):
+    filename = upload_image(client, (64, 64))
+
+    response = client.get(f"/images/{filename}/tiles/6/0/0")
+
+    assert response.status_code == 200
+    assert tiles.tile_cache.get((filename, 6, 0, 0)) == response.content
+
+
+def test_get_image_tiles_unknown_image(client):
+    assert client.get("/images/missing.png/tiles").status_code == 404
+    assert client.get("/images/missing.png/tiles/0/0/0").status_code == 404
+
+
+def test_private_image_tiles_need_admin_token_or_signature(client, temp_upload_dir, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("SECRET_KEY", "signing-key")
+    filename = upload_image(client, (64, 64), is_public=False)
+    admin = {"X-Admin-Token": "s3cret"}
+
+    response = client.get(f"/images/{filename}/tiles/6/0/0", headers=admin)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == media.PRIVATE_CACHE_CONTROL
+    # Cached now, still not served without credentials, like a missing image
+    assert tiles.tile_cache.get((filename, 6, 0, 0)) is not None
+    assert client.get(f"/images/{filename}/tiles/6/0/0").status_code == 404
+    assert client.get(f"/images/{filename}/tiles").status_code == 404
+    assert client.get(f"/images/{filename}/header").status_code == 404
+
+    query = media.sign_media_path(filename).split("?", 1)[1]
+    info = client.get(f"/images/{filename}/tiles?{query}").json()
+    assert info["url"] == f"/images/{filename}/tiles/{{z}}/{{x}}/{{y}}?{query}"
+    tile_url = info["url"].format(z=6, x=0, y=0)
+    assert client.get(tile_url).status_code == 200
+    # A signature only opens the image it was issued for
+    other = upload_image(client, (64, 64), is_public=False)
+    assert client.get(f"/images/{other}/tiles/6/0/0?{query}").status_code == 404
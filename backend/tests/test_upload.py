@@ -1,5 +1,8 @@
 import pytest
 from io import BytesIO
+from pathlib import Path
+
+from src.app.services import derivatives, storage
 
 
 def test_upload_image_success(client, sample_image, temp_upload_dir):
@@ -29,6 +32,35 @@ def test_upload_image_success(client, sample_image, temp_upload_dir):
     assert "uploadDate" in data
 
 
+def test_upload_renders_derivatives(client, sample_image, temp_upload_dir):
+    """Test that thumbnails and previews are rendered next to the original and exposed as URLs"""
+    import os
+
+    filename, file_bytes, content_type = sample_image
+
+    response = client.post(
+        "/upload",
+        data={
+            "source": "Euclid",
+            "copyright": "© ESA 2026",
+            "datasetRelease": "DR1",
+            "description": "Test description",
+            "dataProcessingStages": "Raw → Calibrated",
+            "coordinates": "RA: 10h20m30s, DEC: +45°",
+            "isPublic": "true"
+        },
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["thumbnails"]) == {"160", "320"}
+    assert set(data["previews"]) == {"800", "1600"}
+    for url in [*data["thumbnails"].values(), *data["previews"].values()]:
+        assert url.startswith("/uploads/") and url.endswith(".webp")
+        assert storage.get_upload_path(url.removeprefix("/uploads/")).is_file()
+
+
 def test_upload_invalid_boolean(client, sample_image):
     """Test upload with invalid boolean value"""
     filename, file_bytes, content_type = sample_image
@@ -125,3 +157,200 @@ def test_upload_duplicate_filename(client, sample_image):
     )
     # Duplicates (in terms of filenames) are currently allowed, but this test ensures it doesn't cause an error
     assert response2.status_code == 200  
+
+
+STREAM_METADATA = {
+    "source": "Euclid",
+    "copyright": "© ESA 2026",
+    "datasetRelease": "DR1",
+    "description": "Test description",
+    "dataProcessingStages": "Raw → Calibrated",
+    "coordinates": "RA: 10h20m30s, DEC: +45°",
+    "isPublic": "true"
+}
+
+
+def test_upload_stream_success(client, sample_image, temp_upload_dir):
+    """Test single-pass upload: file lands in the upload dir and its digest is returned"""
+    import base64
+    import hashlib
+    import os
+
+    filename, file_bytes, content_type = sample_image
+    content = file_bytes.getvalue()
+
+    response = client.post(
+        "/upload/stream",
+        data=STREAM_METADATA,
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["source"] == "Euclid"
+    assert data["isPublic"] is True
+
+    digest = base64.b64encode(hashlib.sha256(content).digest()).decode()
+    assert response.headers["Repr-Digest"] == f"sha-256=:{digest}:"
+    path = storage.get_upload_path(data["filename"])
+    assert path == storage.sharded_path(temp_upload_dir, data["filename"])
+    assert path.is_file()
+    assert not [name for name in os.listdir(temp_upload_dir) if name.startswith(".upload-")]
+    with open(path, "rb") as f:
+        assert f.read() == content
+
+
+def test_upload_stream_too_large(client, sample_image, temp_upload_dir, monkeypatch):
+    """Test that oversize bodies are rejected and leave nothing behind"""
+    import os
+    from src.app.services import storage, streaming_upload
+
+    monkeypatch.setattr(storage, "MAX_FILE_SIZE", 100)
+    monkeypatch.setattr(streaming_upload, "MAX_FILE_SIZE", 100)
+    filename, file_bytes, content_type = sample_image
+
+    response = client.post(
+        "/upload/stream",
+        data=STREAM_METADATA,
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert response.status_code == 413
+    assert os.listdir(temp_upload_dir) == []
+
+
+def test_upload_stream_invalid_mime(client, temp_upload_dir):
+    """Test that content is sniffed, whatever the extension says"""
+    import os
+
+    response = client.post(
+        "/upload/stream",
+        data=STREAM_METADATA,
+        files={"file": ("fake.png", BytesIO(b"not an image"), "image/png")}
+    )
+
+    assert response.status_code == 415
+    assert os.listdir(temp_upload_dir) == []
+
+
+def test_upload_stream_missing_field(client, sample_image, temp_upload_dir):
+    """Test that invalid metadata is rejected after the body has been streamed, without leftovers"""
+    import os
+
+    filename, file_bytes, content_type = sample_image
+    metadata = {key: value for key, value in STREAM_METADATA.items() if key != "datasetRelease"}
+
+    response = client.post(
+        "/upload/stream",
+        data=metadata,
+        files={"file": (filename, file_bytes, content_type)}
+    )
+
+    assert response.status_code == 422
+    assert os.listdir(temp_upload_dir) == []
+
+
+def test_upload_stream_not_multipart(client):
+    """Test that a non-multipart body is rejected"""
+    response = client.post("/upload/stream", content=b"{}", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+
+
+def test_upload_stream_deduplicates_content(client, sample_image, temp_upload_dir):
+    """Test that the same file uploaded twice is stored once"""
+    import os
+
+    filename, file_bytes, content_type = sample_image
+    filenames = []
+    for _ in range(2):
+        file_bytes.seek(0)
+        response = client.post(
+            "/upload/stream",
+            data=STREAM_METADATA,
+            files={"file": (filename, file_bytes, content_type)}
+        )
+        assert response.status_code == 200
+        filenames.append(response.json()["filename"])
+
+    assert filenames[0] != filenames[1]
+    assert len([path for path in Path(temp_upload_dir, ".blobs").rglob("*") if path.is_file()]) == 1
+    assert os.path.samefile(storage.get_upload_path(filenames[0]), storage.get_upload_path(filenames[1]))
+
+
+def _batch_files(sample_image, names):
+    """Multipart file parts for a batch: the sample PNG under each name, made distinct by a trailing byte"""
+    _, file_bytes, content_type = sample_image
+    content = file_bytes.getvalue()
+    return [("files", (name, BytesIO(content + bytes([index])), content_type)) for index, name in enumerate(names)]
+
+
+def test_upload_batch_shared_metadata(client, sample_image, temp_upload_dir):
+    """Test that a batch stores every file with the shared metadata in request order"""
+    response = client.post(
+        "/upload/batch",
+        data=STREAM_METADATA,
+        files=_batch_files(sample_image, ["a.png", "b.png", "c.png"])
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"], data["atomic"]) == (3, 0, False)
+    assert [item["originalFilename"] for item in data["results"]] == ["a.png", "b.png", "c.png"]
+    assert all(item["status"] == 201 and item["image"]["source"] == "Euclid" for item in data["results"])
+    assert all(item["image"]["thumbnails"] is not None for item in data["results"])
+    assert len(client.get("/images").json()) == 3
+
+
+def test_upload_batch_per_file_metadata_and_partial_failure(client, sample_image, temp_upload_dir):
+    """Test that per-file metadata overrides the shared fields and a failing file spares the others"""
+    import json
+
+    shared = {key: value for key, value in STREAM_METADATA.items() if key != "coordinates"}
+    per_file = [{"coordinates": "150.0, 2.0", "isPublic": False}, {}, {"coordinates": "tile_001"}]
+    response = client.post(
+        "/upload/batch",
+        data={**shared, "metadata": json.dumps(per_file)},
+        files=_batch_files(sample_image, ["a.png", "b.png", "c.exe"])
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == 201
+    assert results[0]["image"]["isPublic"] is False
+    assert results[0]["image"]["ra"] == 150.0
+    assert results[1]["status"] == 422
+    assert results[1]["image"] is None
+    assert results[2]["status"] == 400
+    # Private: the response withholds the file URLs
+    assert results[0]["image"]["url"] is None and results[0]["image"]["thumbnails"] is None
+    # Only the stored file and its derivatives are left behind
+    stored = results[0]["image"]["filename"]
+    assert sorted(storage.iter_upload_names()) == sorted([stored, *derivatives.derivative_filenames(stored)])
+
+
+def test_upload_batch_atomic_stores_nothing_on_failure(client, sample_image, temp_upload_dir):
+    """Test that an atomic batch with one invalid file stores none of them"""
+    import os
+
+    files = _batch_files(sample_image, ["a.png", "b.png"])
+    files.append(("files", ("fake.png", BytesIO(b"not an image at all"), "image/png")))
+    response = client.post("/upload/batch", data={**STREAM_METADATA, "atomic": "true"}, files=files)
+
+    assert response.status_code == 422
+    data = response.json()
+    assert data["created"] == 0
+    assert [item["status"] for item in data["results"]] == [424, 424, 415]
+    assert client.get("/images").json() == []
+    assert [name for name in os.listdir(temp_upload_dir) if name != ".blobs"] == []
+
+
+def test_upload_batch_rejects_mismatched_metadata(client, sample_image):
+    """Test that the per-file metadata array must have one entry per file"""
+    response = client.post(
+        "/upload/batch",
+        data={**STREAM_METADATA, "metadata": "[{}]"},
+        files=_batch_files(sample_image, ["a.png", "b.png"])
+    )
+
+    assert response.status_code == 400
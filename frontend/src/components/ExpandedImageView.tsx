@@ -14,6 +14,7 @@ interface Image {
   coordinates: string;
   uploadDate: string;
   public: boolean;
+  url?: string | null;
 }
 
 /**
@@ -35,6 +36,9 @@ interface ExpandedImageViewProps {
  */
 export function ExpandedImageView({ image, onClose }: ExpandedImageViewProps) {
   const isVideo = image.filename.match(/\.(mp4|webm|ogg|mov)$/i);
+  // Signed by the API for private images listed with the admin token, null when withheld.
+  const isWithheld = image.url === null;
+  const fileUrl = image.url ?? `/uploads/${image.filename}`;
 
   return (
     <motion.div
@@ -48,9 +52,11 @@ export function ExpandedImageView({ image, onClose }: ExpandedImageViewProps) {
       className="relative max-w-4xl w-full p-4 my-8"
       onClick={(e) => e.stopPropagation()}
     >
-      {isVideo ? (
+      {isWithheld ? (
+        <p className="text-white text-center">This image is private.</p>
+      ) : isVideo ? (
         <video
-          src={`/uploads/${image.filename}`}
+          src={fileUrl}
           controls
           autoPlay
           className="w-full h-auto"
@@ -58,7 +64,7 @@ export function ExpandedImageView({ image, onClose }: ExpandedImageViewProps) {
         />
       ) : (
         <img
-          src={`/uploads/${image.filename}`}
+          src={fileUrl}
           alt={image.filename}
           className="w-full h-auto"
           style={{ maxHeight: "80vh" }}
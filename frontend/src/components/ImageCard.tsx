@@ -7,12 +7,17 @@ import { motion } from "framer-motion";
  * @property {string} filename - The name of the media file (image or video).
  * @property {string} source - The source of the media.
  * @property {string} copyright - The copyright information for the media.
+ * @property {string | null} [url] - URL of the file from the API: signed for private images listed with
+ * the admin token, null when a private file is withheld. Defaults to /uploads/<filename>.
+ * @property {Record<string, string> | null} [thumbnails] - Optional WebP thumbnail URLs keyed by width.
  * @property {() => void} [onClick] - Optional click handler.
  */
 interface ImageCardProps {
   filename: string;
   source: string;
   copyright: string;
+  url?: string | null;
+  thumbnails?: Record<string, string> | null;
   onClick?: () => void;
 }
 
@@ -24,9 +29,18 @@ interface ImageCardProps {
  * @param {ImageCardProps} props - The props for the component.
  * @returns {JSX.Element} A card element with the media and its details.
  */
-export function ImageCard({ filename, source, copyright, onClick }: ImageCardProps) {
+export function ImageCard({ filename, source, copyright, url, thumbnails, onClick }: ImageCardProps) {
   // Simple regex to detect common video file extensions.
   const isVideo = filename.match(/\.(mp4|webm|ogg|mov)$/i);
+  // Private files are only served through a signed URL; without one the API lists them with a null url.
+  const isWithheld = url === null;
+  const fileUrl = url ?? `/uploads/${filename}`;
+
+  // Prefer the WebP thumbnails over the full original; the browser picks a width from srcSet.
+  const thumbnailUrls = thumbnails ?? {};
+  const widths = Object.keys(thumbnailUrls).sort((a, b) => Number(a) - Number(b));
+  const src = widths.length > 0 ? thumbnailUrls[widths[widths.length - 1]] : fileUrl;
+  const srcSet = widths.length > 0 ? widths.map((width) => `${thumbnailUrls[width]} ${width}w`).join(", ") : undefined;
 
   return (
     <motion.div
@@ -42,16 +56,26 @@ export function ImageCard({ filename, source, copyright, onClick }: ImageCardPro
           borderColor: 'var(--border-color)'
         }}
       >
-        {/* Conditionally render a <video> or <img> tag. */}
-        {isVideo ? (
+        {/* Conditionally render a placeholder, a <video> or an <img> tag. */}
+        {isWithheld ? (
+          <div
+            className="w-full h-48 flex items-center justify-center text-sm"
+            style={{ color: 'var(--text-secondary)' }}
+          >
+            Private image
+          </div>
+        ) : isVideo ? (
           <video
-            src={`/uploads/${filename}`}
+            src={fileUrl}
             controls
             className="w-full h-48 object-cover"
           />
         ) : (
           <img
-            src={`/uploads/${filename}`}
+            src={src}
+            srcSet={srcSet}
+            sizes={srcSet ? "(min-width: 1024px) 25vw, (min-width: 768px) 33vw, 50vw" : undefined}
+            loading="lazy"
             alt={filename}
             className="w-full h-48 object-cover"
           />
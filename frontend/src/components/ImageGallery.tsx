@@ -10,6 +10,8 @@ interface Image {
   filename: string;
   source: string;
   copyright: string;
+  url?: string | null;
+  thumbnails?: Record<string, string> | null;
 }
 
 /**
@@ -71,6 +73,8 @@ export function ImageGallery({ images, isLoading }: ImageGalleryProps) {
             filename={image.filename}
             source={image.source}
             copyright={image.copyright}
+            url={image.url}
+            thumbnails={image.thumbnails}
             onClick={() => handleImageClick(image)}
           />
         ))}
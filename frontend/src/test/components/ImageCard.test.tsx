@@ -29,6 +29,83 @@ describe('ImageCard Component', () => {
     expect(screen.getByText('Copyright: © 2026')).toBeInTheDocument();
   });
 
+  /**
+   * @description Checks that WebP thumbnails, when available, replace the original
+   * and are offered to the browser through srcset.
+   */
+  it('renders thumbnails when available', () => {
+    render(
+      <ImageCard
+        filename="test.png"
+        source="NASA"
+        copyright="© 2026"
+        thumbnails={{ '160': '/uploads/test.thumb-160.webp', '320': '/uploads/test.thumb-320.webp' }}
+      />
+    );
+
+    const img = screen.getByRole('img');
+    expect(img).toHaveAttribute('src', '/uploads/test.thumb-320.webp');
+    expect(img).toHaveAttribute(
+      'srcset',
+      '/uploads/test.thumb-160.webp 160w, /uploads/test.thumb-320.webp 320w'
+    );
+  });
+
+  /**
+   * @description Checks that a private file withheld by the API (null url) shows a placeholder
+   * instead of requesting /uploads/, which answers 404 for it.
+   */
+  it('renders a placeholder for withheld private files', () => {
+    render(
+      <ImageCard
+        filename="private.png"
+        source="NASA"
+        copyright="© 2026"
+        url={null}
+        thumbnails={null}
+      />
+    );
+
+    expect(screen.queryByRole('img')).toBeNull();
+    expect(screen.getByText('Private image')).toBeInTheDocument();
+  });
+
+  /**
+   * @description Checks that the signed URLs the API lists private files with (admin token)
+   * are used instead of the plain /uploads/ path, which is not served for them.
+   */
+  it('uses the signed URLs of private files', () => {
+    const { unmount } = render(
+      <ImageCard
+        filename="private.png"
+        source="NASA"
+        copyright="© 2026"
+        url="/uploads/private.png?expires=1700000600&signature=abc"
+        thumbnails={{ '160': '/uploads/private.thumb-160.webp?expires=1700000600&signature=def' }}
+      />
+    );
+
+    expect(screen.getByRole('img')).toHaveAttribute(
+      'src',
+      '/uploads/private.thumb-160.webp?expires=1700000600&signature=def'
+    );
+    unmount();
+
+    render(
+      <ImageCard
+        filename="private.mp4"
+        source="ESA"
+        copyright="© ESA"
+        url="/uploads/private.mp4?expires=1700000600&signature=ghi"
+      />
+    );
+
+    expect(document.querySelector('video')).toHaveAttribute(
+      'src',
+      '/uploads/private.mp4?expires=1700000600&signature=ghi'
+    );
+  });
+
   /**
    * @description Checks if the component renders a `<video>` tag for video file types
    * and includes the necessary controls.